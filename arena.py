@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+'''
+CyberSnake - Multi-snake arenas.
+ArenaEngine plays any number of snakes on one board under engine.Engine's
+rules, each steered by a player or a bot through turn(direction, index).
+Every tick all snakes move at once and the collisions are resolved
+together: every tail leaves first, then each new head is looked up in the
+hazards map and in one shared occupancy grid, the per-cell segment counts
+that the SnakeBody of every snake writes into. A head dies on a body,
+its own ('self') or another snake's ('snake'), on an obstacle, in a blast,
+or on a cell another head moves to ('head'), unless it is shielded; two
+heads swapping cells meet each other's neck. No snake is ever checked
+against another snake's body, so a tick costs the same for long snakes as
+for short ones and grows with the number of heads.
+Where the arena differs from the single-snake game:
+  - obstacles and portals are scaled to the board area (Settings gives
+    them per 30 x 30 board), and there are several foods at once, one per
+    snake unless told otherwise
+  - score, combo and shield are per snake; the tick rate stays at the
+    difficulty's base speed for everyone, power food scores double
+    without slowing anyone down
+  - a blast kills only while its mine's explosion lasts
+  - a dead snake's body leaves the board; respawn() puts it back
+step() returns Engine.step()'s events with the index of the snake in
+'snake'; a 'died' event with cause 'snake' names the snake hit in 'by'
+(on a cell shields let several bodies share, the last one to get there).
+Arena games have no get_state(), so no rewinds or replays.
+'''
+import random
+from array import array
+
+from bots import distance, greedy_move
+from engine import DIRECTIONS, OBSTACLE, Engine, FreeCells, Mine, Portal, Settings, Snake, SnakeBody
+
+BOARD_CELLS = 30 * 30  # The board Settings' obstacle and portal counts are for
+
+
+class ArenaSnake(Snake):
+    '''One snake of an arena: its body plus the rule state Engine keeps per game.'''
+    def __init__(self, index, body, direction, elapsed_ms=0.0):
+        self.index = index
+        self.positions = body
+        self.direction = direction
+        self.grow_pending = 2
+        self.shield_active = False
+        self.shield_timer = 0
+        self.alive = True
+        self.death_cause = None
+        self.score = 0
+        self.combo_counter = 0
+        self.combo_timer = 0
+        self.last_direction_change = elapsed_ms
+
+
+class ArenaEngine(Engine):
+    '''
+    snakes boards' worth of rules on one board. counts is the shared
+    occupancy grid (flat y * GRID_W + x, body segments of every snake) and
+    owner holds, for each occupied cell, the index of the snake on top.
+    Only shields and portals let bodies share a cell: layers then keeps the
+    snakes under the top one, a segment each, so that whoever the cell is
+    left to owns it again.
+    alive lists the living snakes in index order; the game is over when
+    none is left.
+    '''
+    snake_class = ArenaSnake
+
+    def __init__(self, snakes=8, difficulty='medium', seed=None, foods=None):
+        self.snake_count = snakes
+        self.food_count = foods or snakes
+        super().__init__(difficulty, seed)
+
+    def reset(self, difficulty=None, seed=None):
+        if difficulty is not None:
+            self.difficulty = difficulty
+        self.seed = seed if seed is not None else random.randrange(1 << 32)
+        self.rng = random.Random(self.seed)
+        width, height = Settings.GRID_W, Settings.GRID_H
+        self.free_cells = FreeCells(width, height)
+        self.counts = bytearray(width * height)
+        self.owner = array('H', bytes(2 * width * height))
+        self.layers = {}  # Shared cell -> indices of the snakes under its owner
+        self.obstacles = []
+        self.mines = []
+        self.portals = []
+        self.hazards = {}
+        self.ticking = {}
+        self.blasts = {}  # Exploding mine -> its cells, while the explosion lasts
+        self.explosion_cells = []
+        self.foods = {}
+        self.tick = 0
+        self.game_over = False
+        self.score = 0
+        self.speed = self.base_speed()  # At score 0, for every snake
+        self.elapsed_ms = 0.0
+
+        self.snakes = [None] * self.snake_count
+        self.alive = []
+        for i in range(self.snake_count):
+            self.respawn(i)
+        scale = max(1, width * height // BOARD_CELLS)
+        self.max_obstacles = 30 * scale
+        for _ in range(Settings.DIFFICULTY_OBSTACLES[self.difficulty] * scale):
+            self.spawn_obstacle()
+        for i in range(Settings.DIFFICULTY_PORTAL_COUNT[self.difficulty] * scale):
+            self.spawn_portal(i)
+        for _ in range(self.food_count):
+            self.spawn_food()
+
+    def respawn(self, index):
+        '''Start snake index over on a free cell; None when the board is full.'''
+        snake = self.snakes[index]
+        if snake is not None and snake.alive:
+            return snake
+        pos = self.free_cells.sample(self.rng)
+        if pos is None:
+            return None
+        body = SnakeBody(Settings.GRID_W, Settings.GRID_H, counts=self.counts)
+        body.attach(self.free_cells)
+        self.enter(body, index, pos)
+        snake = self.snakes[index] = self.snake_class(index, body, self.rng.choice(DIRECTIONS),
+                                                       self.elapsed_ms)
+        self.alive = [s for s in self.snakes if s is not None and s.alive]
+        self.game_over = False
+        return snake
+
+    def enter(self, body, index, pos):
+        # A new head segment of snake index, on top of whatever lies there
+        cell = pos[1] * Settings.GRID_W + pos[0]
+        if self.counts[cell]:
+            self.layers.setdefault(cell, []).append(self.owner[cell])
+        self.owner[cell] = index
+        body.appendleft(pos)
+
+    def leave(self, body, index):
+        # The tail segment of snake index goes; a shared cell falls to the one below
+        x, y = body.pop()
+        cell = y * Settings.GRID_W + x
+        if self.counts[cell]:
+            layers = self.layers[cell]
+            if self.owner[cell] == index:
+                self.owner[cell] = layers.pop()
+            else:
+                layers.remove(index)
+            if not layers:
+                del self.layers[cell]
+
+    def spawn_food(self, power=False, shield=False):
+        food = self.food_class(power=power, shield=shield)
+        if not food.randomize(self.free_cells, self.rng):
+            return None
+        self.foods[food.position] = food
+        return food
+
+    def turn(self, direction, index=0):
+        '''Steer snake index before the next tick.'''
+        snake = self.snakes[index]
+        snake.turn(direction)
+        if self.elapsed_ms - snake.last_direction_change < 500:
+            snake.combo_counter += 1
+            snake.combo_timer = 100
+        else:
+            snake.combo_counter = 1
+        snake.last_direction_change = self.elapsed_ms
+
+    def step(self):
+        events = []
+        if self.game_over:
+            return events
+        self.tick += 1
+
+        # Update mines, and end the blasts of those done exploding
+        if self.ticking:
+            for i, mine in list(self.ticking.items()):
+                mine.update()
+                if not mine.ticking():
+                    del self.ticking[i]
+                if self.blasts and not mine.explosion_timer and mine in self.blasts:
+                    del self.blasts[mine]
+                    self.explosion_cells = [pos for cells in self.blasts.values() for pos in cells]
+
+        # Every tail moves first: a head may take the cell a tail leaves this tick
+        alive = self.alive
+        for snake in alive:
+            if snake.combo_timer > 0:
+                snake.combo_timer -= 1
+            else:
+                snake.combo_counter = 0
+            if snake.grow_pending:
+                snake.grow_pending -= 1
+            else:
+                self.leave(snake.positions, snake.index)
+            if snake.shield_active:
+                snake.shield_timer -= 1
+                if snake.shield_timer <= 0:
+                    snake.shield_active = False
+
+        # Where every head goes; portals and mines act as it arrives
+        width, height = Settings.GRID_W, Settings.GRID_H
+        hazards = self.hazards
+        moves = []
+        heads = {}  # Head cell -> how many heads move there
+        for snake in alive:
+            x, y = snake.positions.head()
+            dx, dy = snake.direction
+            pos = ((x + dx) % width, (y + dy) % height)
+            hazard = hazards.get(pos)
+            if isinstance(hazard, Portal):
+                # Out of the other end, skipping the checks as in Engine
+                pos = hazard.pair_position if pos == hazard.position else hazard.position
+                events.append({'type': 'teleport', 'pos': pos, 'snake': snake.index})
+            elif isinstance(hazard, Mine) and hazard.explosion_timer == 0:
+                if snake.shield_active:
+                    snake.shield_active = False
+                    events.append({'type': 'shield_break', 'pos': pos, 'snake': snake.index})
+                else:
+                    cells = hazard.explode()
+                    self.blasts[hazard] = cells
+                    self.explosion_cells = self.explosion_cells + cells
+                    self.ticking[self.mines.index(hazard)] = hazard
+                    events.append({'type': 'explosion', 'pos': hazard.position, 'cells': cells,
+                                   'snake': snake.index})
+            heads[pos] = heads.get(pos, 0) + 1
+            moves.append((snake, pos, hazard))
+
+        # Every head against the board as it was before any head moved in:
+        # one lookup each in the blast, the occupancy grid and the hazards
+        counts, owner, blast = self.counts, self.owner, self.blast
+        dead = []
+        for snake, pos, hazard in moves:
+            if snake.shield_active or isinstance(hazard, Portal):
+                continue
+            cell = pos[1] * width + pos[0]
+            if pos in blast:
+                cause = 'explosion'
+            elif counts[cell]:
+                cause = 'self' if owner[cell] == snake.index else 'snake'
+            elif hazard is OBSTACLE:
+                cause = 'obstacle'
+            elif heads[pos] > 1:
+                cause = 'head'
+            else:
+                continue
+            snake.alive = False
+            snake.death_cause = cause
+            dead.append((snake, pos, cause, owner[cell]))
+
+        foods = self.foods
+        for snake, pos, hazard in moves:
+            if not snake.alive:
+                continue
+            self.enter(snake.positions, snake.index, pos)
+            food = foods.pop(pos, None)
+            if food is not None:
+                self.eat(snake, food, events)
+
+        if dead:
+            for snake, pos, cause, by in dead:
+                event = {'type': 'died', 'pos': pos, 'cause': cause, 'snake': snake.index}
+                if cause == 'snake':
+                    event['by'] = by
+                events.append(event)
+                # The body leaves the board
+                body = snake.positions
+                while len(body):
+                    self.leave(body, snake.index)
+            self.alive = [snake for snake in alive if snake.alive]
+            self.game_over = not self.alive
+
+        self.elapsed_ms += 1000.0 / self.speed
+        return events
+
+    def eat(self, snake, food, events):
+        snake.grow()
+        base_points = 2 if food.power else 1
+        if food.shield:
+            base_points = 3
+            snake.activate_shield()
+        gained = base_points * min(5, max(1, snake.combo_counter))
+        snake.score += gained
+        events.append({'type': 'ate', 'pos': food.position, 'food': food, 'gained': gained,
+                       'snake': snake.index})
+
+        if snake.score % 5 == 0 and len(self.obstacles) < self.max_obstacles:
+            self.spawn_obstacle()
+        if self.rng.random() < Settings.DIFFICULTY_MINE_CHANCE[self.difficulty]:
+            self.spawn_mine()
+
+        # Its replacement, drawn as Engine draws the next food
+        power = self.rng.random() < 0.15
+        shield = self.rng.random() < 0.1
+        self.free_cells.release(food.position)
+        self.spawn_food(power and not shield, shield)
+
+
+class GreedyBot:
+    '''
+    Steers one arena snake toward the nearest food, picked again once it is
+    gone, by the moves that survive the tick as far as the board shows.
+    '''
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.target = None
+
+    def choose(self, engine, snake):
+        foods = engine.foods
+        if self.target not in foods:
+            head = snake.positions.head()
+            self.target = min(foods, key=lambda pos: distance(head, pos), default=None)
+        return greedy_move(engine, snake, self.target, self.rng)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+'''
+CyberSnake - Pathfinding autopilot for demo mode and soak tests.
+Autopilot.choose(engine) picks the direction for the next tick. It runs an
+A* search over the toroidal board from the head to the food: obstacles,
+mines and explosion cells are walls, portals are one-move jumps to their
+other end, and a body cell becomes walkable on the move the tail leaves
+it. A path is only taken when the snake would still have room to move on
+once it got there (a flood fill at least as big as the snake).
+Work carries over between ticks: the path found is followed for as long
+as the food stays put, and the tick each body cell was entered is kept up
+to date with one write per tick instead of being recomputed.
+Each decision has a budget in microseconds (Settings.AUTOPILOT_BUDGET_US).
+When the search runs out of time the path to the closest cell reached is
+used instead, and failing that the safe neighbour with the most room.
+'''
+import time
+from heapq import heappop, heappush
+
+from engine import DIRECTIONS, Mine, Portal, Settings
+
+CHECK_EVERY = 8  # Cells expanded between clock reads
+
+
+class Autopilot:
+    def __init__(self, budget_us=None):
+        self.budget_us = budget_us or Settings.AUTOPILOT_BUDGET_US
+        # Decisions made, paths searched, moves taken from an earlier path,
+        # searches cut short by the budget, fallback moves
+        self.stats = dict.fromkeys(('decisions', 'searches', 'reused', 'out_of_time', 'fallbacks'), 0)
+        self.reset()
+
+    def reset(self):
+        self.entered = {}  # Body cell -> tick the head entered it
+        self.tick = None  # Engine tick self.entered is up to date with
+        self.plan = []  # Directions still to follow, the next one last
+        self.goal = None  # The food the plan leads to
+        self.at = None  # Where the plan expects the head next
+
+    def sync(self, engine):
+        # One write per tick while the autopilot drives every tick; after a
+        # gap (a new game, a rewind, the player steering) date the body anew
+        body = engine.snake.positions
+        head = body.head()
+        if (self.tick is not None and engine.tick == self.tick + 1
+                and (len(body) == 1 or self.entered.get(body[1]) == self.tick)):
+            self.entered[head] = engine.tick
+        elif engine.tick != self.tick or self.entered.get(head) != engine.tick:
+            self.entered = {pos: engine.tick - i for i, pos in reversed(list(enumerate(body)))}
+            self.plan = []
+        self.tick = engine.tick
+
+    def choose(self, engine):
+        '''The direction to turn to before the next tick.'''
+        budget = self.budget_us / 1e6
+        deadline = time.perf_counter() + budget
+        self.stats['decisions'] += 1
+        self.sync(engine)
+        self.prepare(engine)
+        snake = engine.snake
+        head = snake.head()
+
+        # Keep to the last path while it still leads to the same food
+        if self.plan and self.goal is engine.food and self.at == head:
+            d = self.plan[-1]
+            self.at = self.landing(head, d, 1)
+            if self.at is not None:
+                self.plan.pop()
+                self.stats['reused'] += 1
+                return d
+        self.plan = []
+
+        if engine.food.position is not None:
+            self.stats['searches'] += 1
+            # A quarter of the budget is kept for checking the room at the end
+            path, end, moves = self.search(head, engine.food.position, deadline - budget / 4)
+            if path and self.room(end, moves, set(self.cells), deadline) >= self.need:
+                self.goal = engine.food
+                self.plan = path
+                d = path.pop()
+                self.at = self.landing(head, d, 1)
+                return d
+        self.stats['fallbacks'] += 1
+        return self.fallback(head, engine.food.position, deadline)
+
+    def prepare(self, engine):
+        # The board as the searches below see it, read once per decision
+        snake = engine.snake
+        body = snake.positions
+        self.width, self.height = Settings.GRID_W, Settings.GRID_H
+        self.hazards, self.blast, self.counts = engine.hazards, engine.blast, body.counts
+        self.reverse = (-snake.direction[0], -snake.direction[1])
+        # A body cell is left on move entered - tail + 1, later while growing
+        self.tail = self.entered[body[-1]] - 1 - snake.grow_pending
+        self.shield = snake.shield_timer if snake.shield_active else 0
+        self.need = len(body) + 1
+        self.cells = []
+
+    def landing(self, pos, d, moves):
+        '''Where moving d from pos leaves the head on move number moves, or None if it dies there.'''
+        if moves == 1 and d == self.reverse:
+            return None
+        nxt = ((pos[0] + d[0]) % self.width, (pos[1] + d[1]) % self.height)
+        hazard = self.hazards.get(nxt)
+        if hazard is not None:
+            if isinstance(hazard, Portal):
+                # Going through skips every collision check
+                return hazard.pair_position if nxt == hazard.position else hazard.position
+            if isinstance(hazard, Mine) or moves >= self.shield:
+                return None  # A mine costs the shield, keep it
+            return nxt
+        if moves < self.shield:
+            return nxt
+        if nxt in self.blast:
+            return None
+        if self.counts[nxt[1] * self.width + nxt[0]]:
+            entered = self.entered.get(nxt)
+            if entered is None or entered - self.tail > moves:
+                return None
+        return nxt
+
+    def distance(self, a, b):
+        dx = abs(a[0] - b[0])
+        dy = abs(a[1] - b[1])
+        return min(dx, self.width - dx) + min(dy, self.height - dy)
+
+    def search(self, head, goal, deadline):
+        '''
+        A* from head to goal, cut short at deadline. Returns the directions
+        to follow (the first one last), the cell they end on and their
+        length; short of time, they lead to the cell closest to the goal.
+        Fills self.cells with the cells the path goes through.
+        '''
+        distance, landing = self.distance, self.landing
+        came = {head: None}
+        best = (distance(head, goal), head)
+        frontier = [(best[0], 0, head)]
+        expanded = 0
+        while frontier:
+            _, moves, pos = heappop(frontier)
+            if pos == goal:
+                best = (0, pos)
+                break
+            expanded += 1
+            if expanded % CHECK_EVERY == 0 and time.perf_counter() > deadline:
+                self.stats['out_of_time'] += 1
+                break
+            moves += 1
+            for d in DIRECTIONS:
+                nxt = landing(pos, d, moves)
+                if nxt is None or nxt in came:
+                    continue
+                came[nxt] = (pos, d)
+                h = distance(nxt, goal)
+                if h < best[0]:
+                    best = (h, nxt)
+                heappush(frontier, (moves + h, moves, nxt))
+
+        end = pos = best[1]
+        path = []
+        while came[pos] is not None:
+            self.cells.append(pos)
+            pos, d = came[pos]
+            path.append(d)
+        return path, end, len(path)
+
+    def room(self, start, moves, taken, deadline):
+        '''Cells reachable from start after moves moves, counted up to self.need.'''
+        seen = {start}
+        layer = [start]
+        while layer and len(seen) < self.need:
+            moves += 1
+            nxt_layer = []
+            for i, pos in enumerate(layer):
+                if i % CHECK_EVERY == CHECK_EVERY - 1 and time.perf_counter() > deadline:
+                    return len(seen)
+                for d in DIRECTIONS:
+                    nxt = self.landing(pos, d, moves)  # Never the first move, so any direction
+                    if nxt is not None and nxt not in seen and nxt not in taken:
+                        seen.add(nxt)
+                        nxt_layer.append(nxt)
+            layer = nxt_layer
+        return len(seen)
+
+    def fallback(self, head, goal, deadline):
+        # Every move that survives the tick, the one with the most room first,
+        # then the one closest to the food
+        options = []
+        for d in DIRECTIONS:
+            nxt = self.landing(head, d, 1)
+            if nxt is None:
+                continue
+            room = self.room(nxt, 1, (), deadline) if time.perf_counter() < deadline else 1
+            closer = -self.distance(nxt, goal) if goal is not None else 0
+            options.append((min(room, self.need), closer, d))
+        if not options:
+            return (-self.reverse[0], -self.reverse[1])  # Nowhere safe: carry on
+        return max(options)[2]
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+'''
+CyberSnake - Batched rules engine on NumPy.
+Steps N independent boards in lockstep with one vectorized call, for policy
+training and large-scale balance studies. The rules are the ones of
+engine.Engine: same toroidal wrap, same collision order, same food, power and
+shield scoring. Finished boards are reset automatically.
+Dipendenze: numpy (pip install numpy)
+'''
+import numpy as np
+
+from engine import DIRECTIONS, Settings
+
+# Actions index DIRECTIONS: a turn to the opposite index (d + 2) % 4 is a reverse
+NO_TURN = -1
+
+# Contents of the solid grid
+EMPTY, OBSTACLE, MINE, PORTAL = 0, 1, 2, 3
+
+# Causes of death reported in info['cause']
+ALIVE, EXPLOSION, SELF, WALL = 0, 1, 2, 3
+CAUSES = {EXPLOSION: 'explosion', SELF: 'self', WALL: 'obstacle'}
+
+# Food kinds
+FOOD, POWER, SHIELD = 0, 1, 2
+
+BASE_SPEED = {'easy': (Settings.FPS_EASY, 8),
+              'medium': (Settings.FPS_MEDIUM, 6),
+              'hard': (Settings.FPS_HARD, 4)}
+
+
+class BatchEngine:
+    '''
+    N boards stored as NumPy arrays.
+    Per board: a ring buffer of body cells with a body-count grid, a solid grid
+    for obstacles/mines/portals, head, direction, grow_pending, shield, combo,
+    power and mine timers. Cells are flat indices y * GRID_W + x.
+    step(actions) takes one action per board (an index into DIRECTIONS or
+    NO_TURN) and returns (reward, done, info); reward is the score gained.
+    '''
+    def __init__(self, n, difficulty='medium', seed=None, max_mines=64,
+                 width=None, height=None):
+        self.n = n
+        self.difficulty = difficulty
+        self.w = width or Settings.GRID_W
+        self.h = height or Settings.GRID_H
+        self.cells = self.w * self.h
+        self.rng = np.random.default_rng(seed)
+        self.capacity = self.cells + 8  # Ring buffer size, longer than any legal snake
+        self.max_mines = max_mines
+        self.portal_count = Settings.DIFFICULTY_PORTAL_COUNT[difficulty]
+        self.obstacle_count = Settings.DIFFICULTY_OBSTACLES[difficulty]
+        self.mine_chance = Settings.DIFFICULTY_MINE_CHANCE[difficulty]
+        self.speed_base, self.speed_div = BASE_SPEED[difficulty]
+
+        # Neighbour tables: next cell for each direction, with toroidal wrap
+        xs = np.arange(self.cells) % self.w
+        ys = np.arange(self.cells) // self.w
+        self.neighbour = np.stack([((ys + dy) % self.h) * self.w + (xs + dx) % self.w
+                                   for dx, dy in DIRECTIONS]).astype(np.int32)
+        # Explosion shape of Mine.get_explosion_cells (radius 1)
+        r = 1
+        offsets = [(dx, dy) for dx in range(-r, r + 1) for dy in range(-r, r + 1)
+                   if dx * dx + dy * dy <= r * r + r]
+        self.blast = np.stack([((ys + dy) % self.h) * self.w + (xs + dx) % self.w
+                               for dx, dy in offsets], axis=1).astype(np.int32)
+
+        n, c = self.n, self.cells
+        self.body = np.zeros((n, self.capacity), np.int32)
+        self.body_count = np.zeros((n, c), np.uint8)
+        self.solid = np.zeros((n, c), np.uint8)
+        self.explosion = np.zeros((n, c), bool)
+        self.head_ptr = np.zeros(n, np.int32)
+        self.tail_ptr = np.zeros(n, np.int32)
+        self.length = np.zeros(n, np.int32)
+        self.head = np.zeros(n, np.int32)
+        self.direction = np.zeros(n, np.int8)
+        self.grow_pending = np.zeros(n, np.int32)
+        self.shield_timer = np.zeros(n, np.int32)  # Shield is active while > 0
+        self.obstacles = np.zeros(n, np.int32)
+        self.food = np.zeros(n, np.int32)
+        self.food_kind = np.zeros(n, np.int8)
+        self.portal_a = np.full((n, max(self.portal_count, 1)), -1, np.int32)
+        self.portal_b = np.full((n, max(self.portal_count, 1)), -1, np.int32)
+        self.mine_cell = np.full((n, max_mines), -1, np.int32)
+        self.mine_timer = np.zeros((n, max_mines), np.int32)
+        self.mine_active = np.zeros((n, max_mines), bool)
+        self.mine_expl = np.zeros((n, max_mines), np.int32)
+        self.score = np.zeros(n, np.int32)
+        self.speed = np.zeros(n, np.int32)
+        self.power_timer = np.zeros(n, np.int32)
+        self.combo_counter = np.zeros(n, np.int32)
+        self.combo_timer = np.zeros(n, np.int32)
+        self.elapsed_ms = np.zeros(n, np.float64)  # Game time, advances 1000/speed per tick
+        self.last_turn_ms = np.zeros(n, np.float64)
+        self.ticks = np.zeros(n, np.int32)
+
+        self.reset(np.ones(n, bool))
+
+    @property
+    def shield_active(self):
+        return self.shield_timer > 0
+
+    def base_speed(self, idx):
+        return np.minimum(self.speed_base + self.score[idx] // self.speed_div, Settings.MAX_FPS)
+
+    def is_free(self, idx, cells):
+        return ((self.body_count[idx, cells] == 0) & (self.solid[idx, cells] == EMPTY)
+                & (self.food[idx] != cells))
+
+    def random_free_cells(self, idx, tries=8):
+        '''One uniformly drawn free cell per board in idx, -1 where the board is full.'''
+        # A few rounds of rejection sampling settle almost every board...
+        cells = self.rng.integers(0, self.cells, len(idx)).astype(np.int32)
+        pending = np.flatnonzero(~self.is_free(idx, cells))
+        for _ in range(tries):
+            if not len(pending):
+                return cells
+            cells[pending] = self.rng.integers(0, self.cells, len(pending))
+            pending = pending[~self.is_free(idx[pending], cells[pending])]
+        if not len(pending):
+            return cells
+
+        # ...and crowded boards fall back to a full scan
+        rows = idx[pending]
+        free = (self.body_count[rows] == 0) & (self.solid[rows] == EMPTY)
+        free[np.arange(len(rows)), self.food[rows]] = False
+        keys = self.rng.random(free.shape)
+        keys[~free] = -1.0
+        picked = keys.argmax(axis=1).astype(np.int32)
+        picked[keys[np.arange(len(rows)), picked] < 0] = -1
+        cells[pending] = picked
+        return cells
+
+    def spawn_obstacles(self, idx):
+        cells = self.random_free_cells(idx)
+        ok = cells >= 0
+        self.solid[idx[ok], cells[ok]] = OBSTACLE
+        self.obstacles[idx[ok]] += 1
+
+    def spawn_mines(self, idx):
+        cells = self.random_free_cells(idx)
+        slot = (self.mine_cell[idx] < 0).argmax(axis=1)
+        ok = (cells >= 0) & (self.mine_cell[idx, slot] < 0)
+        idx, cells, slot = idx[ok], cells[ok], slot[ok]
+        self.solid[idx, cells] = MINE
+        self.mine_cell[idx, slot] = cells
+        self.mine_timer[idx, slot] = self.rng.integers(100, 201, len(idx))  # Random timer before activation
+        self.mine_active[idx, slot] = False
+        self.mine_expl[idx, slot] = 0
+
+    def spawn_food(self, idx, kind):
+        cells = self.random_free_cells(idx)
+        ok = cells >= 0
+        self.food[idx[ok]] = cells[ok]
+        self.food_kind[idx] = kind
+
+    def reset(self, mask):
+        idx = np.flatnonzero(mask)
+        if not len(idx):
+            return
+        center = (self.h // 2) * self.w + self.w // 2
+        self.body_count[idx] = 0
+        self.solid[idx] = EMPTY
+        self.explosion[idx] = False
+        self.body[idx, 0] = center
+        self.body_count[idx, center] = 1
+        self.head_ptr[idx] = 0
+        self.tail_ptr[idx] = 0
+        self.length[idx] = 1
+        self.head[idx] = center
+        self.direction[idx] = self.rng.integers(0, 4, len(idx))
+        self.grow_pending[idx] = 2
+        self.shield_timer[idx] = 0
+        self.obstacles[idx] = 0
+        self.mine_cell[idx] = -1
+        self.mine_timer[idx] = 0
+        self.mine_active[idx] = False
+        self.mine_expl[idx] = 0
+        self.portal_a[idx] = -1
+        self.portal_b[idx] = -1
+        self.score[idx] = 0
+        self.speed[idx] = self.base_speed(idx)
+        self.power_timer[idx] = 0
+        self.combo_counter[idx] = 0
+        self.combo_timer[idx] = 0
+        self.elapsed_ms[idx] = 0
+        self.last_turn_ms[idx] = 0
+        self.ticks[idx] = 0
+        # The food slot must not block spawns before the first food exists
+        self.food[idx] = center
+
+        for _ in range(self.obstacle_count):
+            self.spawn_obstacles(idx)
+        for p in range(self.portal_count):
+            for ends in (self.portal_a, self.portal_b):
+                cells = self.random_free_cells(idx)
+                ok = cells >= 0
+                ends[idx[ok], p] = cells[ok]
+                self.solid[idx[ok], cells[ok]] = PORTAL
+        self.spawn_food(idx, FOOD)
+
+    def step(self, actions):
+        n = self.n
+        rows = np.arange(n)
+        actions = np.asarray(actions)
+        reward = np.zeros(n, np.int32)
+        cause = np.zeros(n, np.int8)
+
+        # Turn, exactly like Engine.turn: reverse turns are ignored but still count for combos
+        turning = actions >= 0
+        allowed = turning & (actions != (self.direction + 2) % 4)
+        self.direction[allowed] = actions[allowed]
+        fast = turning & (self.elapsed_ms - self.last_turn_ms < 500)
+        self.combo_counter[fast] += 1
+        self.combo_timer[fast] = 100
+        self.combo_counter[turning & ~fast] = 1
+        self.last_turn_ms[turning] = self.elapsed_ms[turning]
+        self.ticks += 1
+
+        # Update mines
+        mines = self.mine_cell >= 0
+        counting = mines & ~self.mine_active & (self.mine_timer > 0)
+        self.mine_timer[counting] -= 1
+        self.mine_active |= counting & (self.mine_timer <= 0)
+        self.mine_expl[self.mine_expl > 0] -= 1
+
+        # Update combo timer
+        combo_running = self.combo_timer > 0
+        self.combo_timer[combo_running] -= 1
+        self.combo_counter[~combo_running] = 0
+
+        # Move snake
+        new_head = self.neighbour[self.direction, self.head]
+        growing = self.grow_pending > 0
+        self.grow_pending[growing] -= 1
+        shrink = np.flatnonzero(~growing)
+        tail = self.body[shrink, self.tail_ptr[shrink]]
+        self.body_count[shrink, tail] -= 1
+        self.tail_ptr[shrink] = (self.tail_ptr[shrink] + 1) % self.capacity
+        self.length[growing] += 1
+        self.head_ptr = (self.head_ptr + 1) % self.capacity
+        self.body[rows, self.head_ptr] = new_head
+        self.body_count[rows, new_head] += 1
+        self.head = new_head
+        shielded = self.shield_timer > 0
+        self.shield_timer[shielded] -= 1
+
+        # Check portal teleportation
+        hit_a = self.portal_a == self.head[:, None]
+        hit_b = self.portal_b == self.head[:, None]
+        exits = np.where(hit_a, self.portal_b, np.where(hit_b, self.portal_a, -1)).max(axis=1)
+        teleported = exits >= 0
+        tp = np.flatnonzero(teleported)
+        self.body_count[tp, self.head[tp]] -= 1
+        self.body_count[tp, exits[tp]] += 1
+        self.body[tp, self.head_ptr[tp]] = exits[tp]
+        self.head[tp] = exits[tp]
+
+        # Check for collisions with mines
+        on_mine = (self.mine_cell == self.head[:, None]) & (self.mine_expl == 0) & ~teleported[:, None]
+        hit_mine = on_mine.any(axis=1)
+        slot = on_mine.argmax(axis=1)
+        shield_break = hit_mine & (self.shield_timer > 0)
+        self.shield_timer[shield_break] = 0
+        exploded = hit_mine & ~shield_break
+        ex = np.flatnonzero(exploded)
+        self.mine_expl[ex, slot[ex]] = 20  # Duration of explosion animation
+        self.explosion[ex] = False
+        blast = self.blast[self.mine_cell[ex, slot[ex]]]
+        self.explosion[ex[:, None], blast] = True
+        cause[exploded & self.explosion[rows, self.head]] = EXPLOSION
+
+        # Check for collision with explosion cells
+        exposed = ~teleported & (cause == ALIVE) & (self.shield_timer <= 0)
+        cause[exposed & self.explosion[rows, self.head]] = EXPLOSION
+
+        # Check for self collision or obstacle collision
+        exposed &= cause == ALIVE
+        cause[exposed & (self.body_count[rows, self.head] > 1)] = SELF
+        exposed &= cause == ALIVE
+        cause[exposed & (self.solid[rows, self.head] == OBSTACLE)] = WALL
+        died = cause != ALIVE
+
+        # Food collision
+        ate = ~died & (self.head == self.food)
+        idx = np.flatnonzero(ate)
+        if len(idx):
+            self.grow_pending[idx] += 1
+            kind = self.food_kind[idx]
+            base_points = np.where(kind == SHIELD, 3, np.where(kind == POWER, 2, 1))
+            self.shield_timer[idx[kind == SHIELD]] = 150
+            gained = base_points * np.clip(self.combo_counter[idx], 1, 5)
+            self.score[idx] += gained
+            reward[idx] = gained
+
+            # Spawn obstacles based on score
+            wall = idx[(self.score[idx] % 5 == 0) & (self.obstacles[idx] < 30)]
+            if len(wall):
+                self.spawn_obstacles(wall)
+
+            # Maybe spawn a mine based on difficulty
+            mine = idx[self.rng.random(len(idx)) < self.mine_chance]
+            if len(mine):
+                self.spawn_mines(mine)
+
+            self.speed[idx] = self.base_speed(idx)
+
+            # Decide what kind of food to spawn next
+            power = self.rng.random(len(idx)) < 0.15
+            shield = self.rng.random(len(idx)) < 0.1
+            self.spawn_food(idx, np.where(shield, SHIELD, np.where(power, POWER, FOOD)))
+
+            powered = idx[power]
+            self.power_timer[powered] = 120
+            self.speed[powered] = np.maximum(self.speed[powered] - 5, 5)
+
+        # Power timer
+        powered = ~died & (self.power_timer > 0)
+        self.power_timer[powered] -= 1
+        expired = np.flatnonzero(powered & (self.power_timer == 0))
+        self.speed[expired] = self.base_speed(expired)
+        self.elapsed_ms += 1000.0 / self.speed
+
+        info = {
+            'ate': ate,
+            'teleported': teleported,
+            'shield_break': shield_break,
+            'exploded': exploded,
+            'cause': cause,
+            'score': self.score.copy(),
+            'ticks': self.ticks.copy(),
+        }
+        self.reset(died)
+        return reward, died, info
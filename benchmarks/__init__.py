@@ -0,0 +1,16 @@
+'''CyberSnake benchmarks. Run from the repository root, e.g. python -m benchmarks.bench_batch'''
+import os
+import tempfile
+
+from engine import Settings
+
+
+def scratch_files():
+    '''Point the leaderboard, the old high score file and the replays at a
+    temporary directory, before a Game is built: its constructor already
+    reads and writes them.'''
+    directory = tempfile.mkdtemp(prefix='cybersnake-bench-')
+    Settings.LEADERBOARD_FILE = os.path.join(directory, os.path.basename(Settings.LEADERBOARD_FILE))
+    Settings.HIGHSCORE_FILE = os.path.join(directory, os.path.basename(Settings.HIGHSCORE_FILE))
+    Settings.REPLAY_DIR = os.path.join(directory, os.path.basename(Settings.REPLAY_DIR))
+    return directory
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+'''
+Multi-snake arena ticks: bot snakes on a large board, dead ones respawned
+at once, with the engine step (every head resolved against the shared
+occupancy grid) timed apart from the bots' decisions. The same counts run
+again with snakes grown long, to show the step cost follows the number of
+heads and not the cells of the bodies. For scale, "all pairs" times the
+collision test done the other way, every head against every body.
+First the resolution is checked for a few thousand ticks: after each one
+the occupancy grid has to match the bodies cell for cell, each cell's owner
+and the layers under it the snakes lying there, and no living unshielded
+head may sit on a body or on another head.
+Run: python -m benchmarks.bench_arena [--snakes 16 64 256] [--side 256] [--ticks 2000]
+'''
+import argparse
+import statistics
+import time
+from collections import Counter
+
+from arena import ArenaEngine, GreedyBot
+from engine import Portal, Settings
+
+
+def all_pairs(engine):
+    '''Living unshielded heads on a body or another head, found by walking every body.'''
+    hits = []
+    for snake in engine.alive:
+        head = snake.positions.head()
+        if snake.shield_active or isinstance(engine.hazards.get(head), Portal):
+            continue
+        for other in engine.alive:
+            segments = iter(other.positions)
+            if other is snake:
+                next(segments)
+            if head in segments:
+                hits.append(snake.index)
+                break
+    return hits
+
+
+def play(engine, grow=0):
+    events = engine.step()
+    for event in events:
+        if event['type'] == 'died':
+            snake = engine.respawn(event['snake'])
+            if snake is not None:
+                snake.grow_pending += grow
+    return events
+
+
+def steer(engine, bots):
+    for snake in engine.alive:
+        direction = bots[snake.index].choose(engine, snake)
+        if direction != snake.direction:
+            engine.turn(direction, snake.index)
+
+
+def check(snakes, ticks):
+    engine = ArenaEngine(snakes, 'hard', seed=1)
+    bots = [GreedyBot(i) for i in range(snakes)]
+    deaths = Counter()
+    shared = 0
+    for _ in range(ticks):
+        steer(engine, bots)
+        deaths.update(e['cause'] for e in play(engine) if e['type'] == 'died')
+        counts = bytearray(len(engine.counts))
+        lying = {}  # Cell -> the snakes lying there, a segment each
+        for snake in engine.alive:
+            for x, y in snake.positions:
+                cell = y * Settings.GRID_W + x
+                counts[cell] += 1
+                lying.setdefault(cell, Counter())[snake.index] += 1
+        assert counts == engine.counts, f'occupancy grid drifted at tick {engine.tick}'
+        for cell, snakes in lying.items():
+            owners = Counter(engine.layers.get(cell, ()))
+            owners[engine.owner[cell]] += 1
+            assert owners == snakes, f'wrong owners of cell {cell} at tick {engine.tick}'
+        assert len(engine.layers) == sum(sum(s.values()) > 1 for s in lying.values())
+        shared += len(engine.layers)
+        assert not all_pairs(engine), f'unresolved collision at tick {engine.tick}'
+    return deaths, shared
+
+
+def run(snakes, ticks, grow, warmup=200):
+    engine = ArenaEngine(snakes, 'hard', seed=0)
+    bots = [GreedyBot(i) for i in range(snakes)]
+    for snake in engine.alive:
+        snake.grow_pending += grow
+    for _ in range(warmup + grow):
+        steer(engine, bots)
+        play(engine, grow)
+    step_s = bot_s = 0.0
+    cells = []
+    deaths = Counter()
+    clock = time.perf_counter
+    for _ in range(ticks):
+        start = clock()
+        steer(engine, bots)
+        middle = clock()
+        events = play(engine, grow)
+        end = clock()
+        bot_s += middle - start
+        step_s += end - middle
+        deaths.update(e['cause'] for e in events if e['type'] == 'died')
+        cells.append(sum(len(snake.positions) for snake in engine.alive))
+    start = clock()
+    for _ in range(20):
+        all_pairs(engine)
+    pairs_s = (clock() - start) / 20
+    return {'step_us': step_s / ticks * 1e6, 'bots_us': bot_s / ticks * 1e6,
+            'pairs_us': pairs_s * 1e6, 'cells': statistics.mean(cells), 'deaths': deaths}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--snakes', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--side', type=int, default=256)
+    parser.add_argument('--ticks', type=int, default=2000)
+    parser.add_argument('--grow', type=int, default=200, help='extra length of the long snakes')
+    args = parser.parse_args()
+
+    Settings.GRID_W = Settings.GRID_H = args.side
+    deaths, shared = check(64, 2000)
+    print(f'check: 64 snakes, 2000 ticks, grid, owners and heads consistent after every tick '
+          f'({sum(deaths.values())} deaths, {shared} shared cells seen)')
+    print(f'{args.side}x{args.side} board, hard, {args.ticks} ticks per run')
+    print(f"{'snakes':>6} {'length':>7} {'body cells':>10} {'step':>9} {'per head':>9} {'bots':>9} "
+          f"{'all pairs':>10} {'ticks/s':>8}  deaths")
+    for count in args.snakes:
+        for grow in (0, args.grow):
+            s = run(count, args.ticks, grow)
+            deaths = ' '.join(f'{cause} {n}' for cause, n in s['deaths'].most_common())
+            rate = 1e6 / (s['step_us'] + s['bots_us'])
+            print(f"{count:>6} {'long' if grow else 'short':>7} {s['cells']:>10.0f} {s['step_us']:>7.0f}us "
+                  f"{s['step_us'] / count:>7.2f}us {s['bots_us']:>7.0f}us {s['pairs_us']:>8.0f}us "
+                  f"{rate:>8.0f}  {deaths}")
+
+
+if __name__ == '__main__':
+    main()
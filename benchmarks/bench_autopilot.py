@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+'''
+Autopilot soak: whole games per difficulty played by the autopilot and by
+the greedy bot of bench_seek, with the survival, score and death causes of
+each, and the autopilot's decision time against its per-tick budget
+(mean, p99, max and the decisions that went over by more than 10%).
+Games stop at death or --max-ticks. Decisions hinge on the clock, so two
+runs of the same seeds can differ once the budget bites.
+Run: python -m benchmarks.bench_autopilot [--games 10] [--budget-us 2000] [--grid 30]
+'''
+import argparse
+import random
+import time
+from collections import Counter
+
+from autopilot import Autopilot
+from benchmarks.bench_seek import bot_move
+from engine import Engine, Settings
+
+
+def play(engine, choose, max_ticks, times=None):
+    while not engine.game_over and engine.tick < max_ticks:
+        start = time.perf_counter()
+        direction = choose(engine)
+        if times is not None:
+            times.append(time.perf_counter() - start)
+        if direction != engine.snake.direction:
+            engine.turn(direction)
+        engine.step()
+    return engine
+
+
+def summary(name, games):
+    ticks = sorted(e.tick for e in games)
+    deaths = Counter(e.death_cause or 'alive' for e in games)
+    print(f'  {name:<10} ticks median {ticks[len(ticks) // 2]:>6}  min {ticks[0]:>6}   '
+          f'score mean {sum(e.score for e in games) / len(games):>7.1f}   '
+          f'length mean {sum(len(e.snake.positions) for e in games) / len(games):>6.1f}   '
+          + ' '.join(f'{cause} {n}' for cause, n in sorted(deaths.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--games', type=int, default=10, help='games per difficulty')
+    parser.add_argument('--budget-us', type=int, default=Settings.AUTOPILOT_BUDGET_US)
+    parser.add_argument('--max-ticks', type=int, default=20000)
+    parser.add_argument('--grid', type=int, default=30, help='board side')
+    args = parser.parse_args()
+
+    Settings.GRID_W = Settings.GRID_H = args.grid
+    print(f'{args.grid}x{args.grid} board, budget {args.budget_us} us per decision')
+    times = []
+    stats = Counter()
+    for difficulty in ('easy', 'medium', 'hard'):
+        print(difficulty)
+        auto, greedy = [], []
+        for seed in range(args.games):
+            pilot = Autopilot(args.budget_us)
+            auto.append(play(Engine(difficulty, seed), pilot.choose, args.max_ticks, times))
+            stats.update(pilot.stats)
+            rng = random.Random(seed)
+            greedy.append(play(Engine(difficulty, seed), lambda e: bot_move(e, rng, 10 ** 9), args.max_ticks))
+        summary('autopilot', auto)
+        summary('greedy', greedy)
+
+    times.sort()
+    n = len(times)
+    over = sum(t * 1e6 > args.budget_us * 1.1 for t in times)
+    print(f'decisions {n}: mean {sum(times) / n * 1e6:.0f} us  p50 {times[n // 2] * 1e6:.0f} us  '
+          f'p99 {times[int(n * 0.99)] * 1e6:.0f} us  max {times[-1] * 1e6:.0f} us  '
+          f'over budget +10% {over} ({over / n:.2%})')
+    print(f"moves from a kept path {stats['reused'] / n:.1%}, searches {stats['searches']} "
+          f"({stats['out_of_time']} out of time), fallback moves {stats['fallbacks']}")
+
+
+if __name__ == '__main__':
+    main()
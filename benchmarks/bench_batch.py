@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+'''
+Throughput of the batched NumPy engine against the scalar Engine, in board
+steps per second. Both use a random policy that turns on ~40% of ticks.
+Run: python -m benchmarks.bench_batch [--ticks 2000] [--sizes 1 64 1024 4096]
+'''
+import argparse
+import random
+import time
+
+import numpy as np
+
+from batch import BatchEngine, DIRECTIONS
+from engine import Engine
+
+
+def bench_scalar(difficulty, steps):
+    game = Engine(difficulty)
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for i in range(steps):
+        if rng.random() < 0.4:
+            game.turn(rng.choice(DIRECTIONS))
+        game.step()
+        if game.game_over:
+            game.reset()
+    return steps / (time.perf_counter() - start)
+
+
+def bench_batch(difficulty, n, ticks):
+    env = BatchEngine(n, difficulty, seed=0)
+    rng = np.random.default_rng(0)
+    actions = [np.where(rng.random(n) < 0.4, rng.integers(0, 4, n), -1) for _ in range(64)]
+    start = time.perf_counter()
+    for t in range(ticks):
+        env.step(actions[t % 64])
+    return n * ticks / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--difficulty', default='hard', choices=('easy', 'medium', 'hard'))
+    parser.add_argument('--ticks', type=int, default=2000)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 64, 1024, 4096])
+    args = parser.parse_args()
+
+    scalar = bench_scalar(args.difficulty, 50000)
+    print(f'{"scalar Engine":>16}: {scalar:12,.0f} steps/s')
+    for n in args.sizes:
+        ticks = max(50, args.ticks * 64 // max(n, 64))
+        rate = bench_batch(args.difficulty, n, ticks)
+        print(f'{"batch N=" + str(n):>16}: {rate:12,.0f} steps/s  ({rate / scalar:5.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
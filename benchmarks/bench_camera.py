@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+'''
+Frame time on arena boards, with the camera culling and without it.
+Each board holds the same density of entities (obstacles on 5.5% of the
+cells, a tenth as many mines, a snake over 11%, particles everywhere), so
+the view always shows about as much while the board and the entity counts
+grow a thousandfold. "culled" is the game's renderer (chunks under the view,
+the snake body read off its per-cell counts); "walk all" visits every
+entity and only skips drawing the ones out of view.
+Runs on the SDL dummy video and audio drivers.
+Run: python -m benchmarks.bench_camera [--frames 100] [--sides 30 100 300 1000]
+'''
+import argparse
+import os
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from benchmarks import scratch_files
+from engine import Settings
+from particles import create_particle_system
+
+
+def walk_all(game):
+    '''The entities drawn the way the standard board does: every one visited.'''
+    camera, screen, glow = game.camera, game.screen, game.glow
+    game.draw_obstacles()
+    for mine in game.engine.mines:
+        mine.draw(screen, glow, camera)
+    for portal in game.engine.portals:
+        portal.draw(screen, glow, camera)
+    game.engine.food.draw(screen, glow, camera)
+    snake = game.engine.snake
+    for pos in snake.positions[1:]:
+        snake.draw_segment(screen, glow, pos, False, camera)
+    snake.draw_ends(screen, glow, camera, game.motion, game.tick_blend)
+
+
+def populate(game, side):
+    engine = game.engine
+    cells = side * side
+    # A snake trailing back from the head, row after row
+    body = engine.snake.positions
+    hx, hy = body.head()
+    for i in range(1, cells * 11 // 100):
+        c = (hy * side + hx - i) % cells
+        body.append((c % side, c // side))
+    obstacles = cells * 55 // 1000
+    for _ in range(obstacles):
+        engine.spawn_obstacle()
+    for _ in range(obstacles // 10):
+        engine.spawn_mine()
+    game.particles = create_particle_system(Settings.PARTICLE_BUDGET)
+    g = Settings.GRID_SIZE
+    game.particles.emit(Settings.PARTICLE_BUDGET, (0, side * g), (0, side * g),
+                        Settings.COLORS['food'], (1, 4), (10 ** 6, 10 ** 6 + 1))
+    return len(body), obstacles
+
+
+def frame_ms(game, frames):
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(frames):
+            game.render()
+        best = min(best, time.perf_counter() - start)
+    return best / frames * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--sides', type=int, nargs='+', default=[30, 100, 300, 1000])
+    args = parser.parse_args()
+    scratch_files()  # Keep the real leaderboard and replays out of it
+
+    print(f"{'board':>11} {'snake':>7} {'obstacles':>9} {'near view':>9} "
+          f"{'culled ms':>10} {'walk all ms':>12}")
+    for side in args.sides:
+        Settings.GRID_W = Settings.GRID_H = side
+        from gioco import Game  # Reads the board size when a Game is built
+        game = Game()
+        game.record_score = lambda: None
+        game.difficulty = 'hard'
+        game.reset(seed=0)
+        snake, obstacles = populate(game, side)
+        culled = frame_ms(game, args.frames)
+        # Segments and chunk entities the culled renderer visited
+        engine = game.engine
+        if game.camera.scrolling:
+            near = len(engine.snake.visible_segments(game.camera)) + len(game.chunks.query(game.camera))
+        else:
+            near = len(engine.snake.positions) + len(engine.obstacles) + len(engine.mines)
+        game.draw_entities = lambda: walk_all(game)
+        walked = frame_ms(game, args.frames)
+        print(f'{side:>5}x{side:<5} {snake:>7} {obstacles:>9} {near:>9} {culled:>10.2f} {walked:>12.2f}')
+        game.writer.close()
+
+
+if __name__ == '__main__':
+    main()
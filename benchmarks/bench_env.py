@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+'''
+SnakeEnv steps per second with no display, random actions, resetting at
+the end of every episode: the whole board observed, the egocentric window,
+and, for scale, the whole board rebuilt into a fresh array every step.
+Before timing, the in-place observation is checked against a from-scratch
+rebuild at every step of a few thousand.
+Run: python -m benchmarks.bench_env [--steps 20000] [--view 11] [--difficulty hard]
+'''
+import argparse
+import random
+import time
+
+import numpy as np
+
+from env import SnakeEnv
+
+
+def check(env, steps, rng):
+    env.reset(seed=0)
+    for _ in range(steps):
+        _, _, terminated, truncated, _ = env.step(rng.randrange(4))
+        kept = env.grid.copy()
+        env.write_full()
+        assert np.array_equal(kept, env.grid), f'observation drifted at tick {env.engine.tick}'
+        if terminated or truncated:
+            env.reset(seed=rng.randrange(1 << 32))
+
+
+def steps_per_second(env, steps, rng, rebuild=False):
+    env.reset(seed=0)
+    actions = [rng.randrange(4) for _ in range(steps)]
+    start = time.perf_counter()
+    for action in actions:
+        obs, reward, terminated, truncated, info = env.step(action)
+        if rebuild:
+            env.grid = np.zeros_like(env.grid)
+            env.flat = env.grid.reshape(len(env.grid), -1)
+            env.write_full()
+        if terminated or truncated:
+            env.reset()
+    return steps / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--steps', type=int, default=20000)
+    parser.add_argument('--view', type=int, default=11)
+    parser.add_argument('--difficulty', default='hard')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    check(SnakeEnv(args.difficulty), 5000, rng)
+    print(f'{args.difficulty}, {args.steps} steps, in-place observations match a rebuild every step')
+    for name, env, rebuild in (('whole board', SnakeEnv(args.difficulty), False),
+                               (f'{args.view}x{args.view} window', SnakeEnv(args.difficulty, args.view), False),
+                               ('whole board, rebuilt', SnakeEnv(args.difficulty), True)):
+        rate = steps_per_second(env, args.steps, rng, rebuild)
+        print(f'{name:<22} obs {str(env.obs.shape):<14} {rate:>8.0f} steps/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+'''
+Cost of the head collision checks with hundreds of mines and portals on a
+large board: the Engine.hazards lookup against the old scans (every portal,
+every mine, every explosion cell, then the obstacle list), plus the whole
+Engine.step() for scale, once the new mines are armed. Queries hit a random
+cell, which is what the head does almost every tick.
+Run: python -m benchmarks.bench_hazards [--grid 300] [--counts 0 100 500 2000]
+'''
+import argparse
+import random
+import time
+
+from engine import OBSTACLE, Engine, Mine, Portal, Settings
+
+
+def legacy_query(engine, head):
+    for portal in engine.portals:
+        if head == portal.position or head == portal.pair_position:
+            return portal
+    for mine in engine.mines:
+        if head == mine.position and mine.explosion_timer == 0:
+            return mine
+    for cell in engine.explosion_cells:
+        if head == cell:
+            return cell
+    return OBSTACLE if head in engine.obstacles else None
+
+
+def indexed_query(engine, head):
+    hazard = engine.hazards.get(head)
+    if isinstance(hazard, Portal) or hazard is OBSTACLE:
+        return hazard
+    if isinstance(hazard, Mine) and hazard.explosion_timer == 0:
+        return hazard
+    return head if head in engine.blast else None
+
+
+def crowded(count):
+    '''A hard game with count mines, count portal pairs and 30 obstacles, shielded.'''
+    engine = Engine('hard', 0)
+    for _ in range(count):
+        engine.spawn_mine()
+    for i in range(len(engine.portals), count):
+        engine.spawn_portal(i)
+    while len(engine.obstacles) < 30:
+        engine.spawn_obstacle()
+    engine.explosion_cells = engine.mines[0].get_explosion_cells() if engine.mines else []
+    return engine
+
+
+def bench(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--grid', type=int, default=300)
+    parser.add_argument('--counts', type=int, nargs='+', default=[0, 100, 500, 2000])
+    parser.add_argument('--repeat', type=int, default=20000)
+    args = parser.parse_args()
+
+    Settings.GRID_W = Settings.GRID_H = args.grid
+    rng = random.Random(0)
+    cells = [(rng.randrange(args.grid), rng.randrange(args.grid)) for _ in range(1024)]
+    print(f'{args.grid}x{args.grid} board, 30 obstacles')
+    for count in args.counts:
+        engine = crowded(count)
+        for head in cells:
+            assert legacy_query(engine, head) == indexed_query(engine, head)
+        i = iter(range(1 << 62))
+
+        def legacy():
+            legacy_query(engine, cells[next(i) & 1023])
+
+        def indexed():
+            indexed_query(engine, cells[next(i) & 1023])
+
+        t_old = bench(legacy, max(100, args.repeat // (count + 1)))
+        t_new = bench(indexed, args.repeat)
+
+        def step():
+            if not engine.snake.shield_active:  # Stepped through everything, never dying
+                engine.snake.activate_shield(10 ** 9)
+            if rng.random() < 0.2:
+                engine.turn(rng.choice(((1, 0), (-1, 0), (0, 1), (0, -1))))
+            engine.step()
+        for _ in range(250):  # Past the arming timers of the new mines
+            step()
+        t_step = bench(step, 2000)
+        assert not engine.game_over
+        print(f'{len(engine.mines):5} mines, {len(engine.portals):5} portal pairs: scans {t_old:8.2f} us   '
+              f'hazard lookup {t_new:5.2f} us   step {t_step:7.2f} us')
+
+
+if __name__ == '__main__':
+    main()
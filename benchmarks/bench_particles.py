@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+'''
+Per-frame update + draw time of the NumPy ParticleSystem against the
+one-object-per-particle ParticleList, at several live particle counts.
+Runs on the SDL dummy video driver.
+Run: python -m benchmarks.bench_particles [--counts 500 2000 5000]
+'''
+import argparse
+import os
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from engine import Settings
+from particles import ParticleList, ParticleSystem
+
+
+def bench(system, surface, count, frames):
+    # Long-lived particles so the population stays at count during the run
+    system.emit(count, (0, Settings.WIDTH), (0, Settings.HEIGHT), Settings.COLORS['food'],
+                (1, 4), (frames + 10, frames + 20))
+    start = time.perf_counter()
+    for _ in range(frames):
+        system.update()
+        system.draw(surface)
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--counts', type=int, nargs='+', default=[500, 2000, 5000])
+    parser.add_argument('--frames', type=int, default=60)
+    args = parser.parse_args()
+
+    pygame.display.init()
+    screen = pygame.display.set_mode((Settings.WIDTH, Settings.HEIGHT))
+    for count in args.counts:
+        old = bench(ParticleList(count), screen, count, args.frames)
+        new = bench(ParticleSystem(count, seed=0), screen, count, args.frames)
+        print(f'{count:>6} particles: objects {old:7.2f} ms/frame   arrays {new:6.2f} ms/frame')
+
+
+if __name__ == '__main__':
+    main()
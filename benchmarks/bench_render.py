@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+'''
+Gameplay frame time of the full-redraw renderer against the dirty-rectangle
+one, on the same scripted game. Runs on the SDL dummy video and audio drivers.
+Run: python -m benchmarks.bench_render [--frames 600] [--difficulty hard]
+'''
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from benchmarks import scratch_files
+from gioco import Game
+
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def bench(game, mode, frames, difficulty):
+    random.seed(0)
+    game.difficulty = difficulty
+    game.reset()
+    game.render_mode = mode
+    elapsed = 0.0
+    for i in range(frames):
+        if i % 6 == 0:
+            game.engine.turn(random.choice(DIRECTIONS))
+        game.update()
+        game.animate()
+        if game.state == 'gameover':
+            game.reset()
+        start = time.perf_counter()
+        game.render()
+        elapsed += time.perf_counter() - start
+    return elapsed / frames * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--difficulty', default='hard', choices=('easy', 'medium', 'hard'))
+    args = parser.parse_args()
+
+    scratch_files()  # Keep the real leaderboard and replays out of it
+    game = Game()
+    game.record_score = lambda: None
+    for mode in ('full', 'dirty'):
+        print(f'{mode:>5}: {bench(game, mode, args.frames, args.difficulty):6.2f} ms/frame')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+'''
+Seek latency against replay length: Replay.seek() from the nearest keyframe
+against re-simulating from tick 0, on games played by a cautious bot that
+stops eating at a fixed length so it can survive for as long as needed.
+Replays are saved without keyframes (the size shown); the first seek builds
+them, timed on its own as "build".
+Run: python -m benchmarks.bench_seek [--ticks 1000 5000 20000 45000] [--seeks 20]
+'''
+import argparse
+import random
+import time
+
+from bots import survives
+from engine import DIRECTIONS, Engine, Settings
+from replay import Replay
+
+
+def safe(game, pos):
+    return survives(game, game.snake, pos)
+
+
+def bot_move(game, rng, max_length):
+    x, y = game.snake.head()
+    options = []
+    for d in DIRECTIONS:
+        if (-d[0], -d[1]) == game.snake.direction:
+            continue
+        nxt = ((x + d[0]) % Settings.GRID_W, (y + d[1]) % Settings.GRID_H)
+        if not safe(game, nxt):
+            continue
+        room = sum(safe(game, ((nxt[0] + e[0]) % Settings.GRID_W, (nxt[1] + e[1]) % Settings.GRID_H))
+                   for e in DIRECTIONS)
+        hungry = len(game.snake.positions) < max_length
+        on_food = nxt == game.food.position
+        options.append((room > 1, on_food if hungry else not on_food, rng.random(), d))
+    return max(options)[3] if options else game.snake.direction
+
+
+def record(ticks, seed, max_length=20):
+    '''A replay of at least ticks ticks, retrying seeds until the bot survives that long.'''
+    while True:
+        rng = random.Random(seed)
+        game = Engine('medium', seed)
+        replay = Replay(game.seed, game.difficulty)
+        while not game.game_over and game.tick < ticks:
+            d = bot_move(game, rng, max_length)
+            if d != game.snake.direction:
+                replay.record(game.tick, d)
+                game.turn(d)
+            game.step()
+        if game.tick >= ticks:
+            replay.ticks = game.tick
+            return replay
+        seed += 1000
+
+
+def from_start(replay, tick):
+    # What seek() does without keyframes
+    engine = Engine(replay.difficulty, replay.seed)
+    for _ in replay.advance(engine, min(tick, replay.ticks)):
+        pass
+    return engine
+
+
+def time_seeks(seek, targets):
+    times = []
+    for tick in targets:
+        start = time.perf_counter()
+        seek(tick)
+        times.append((time.perf_counter() - start) * 1000)
+    return sum(times) / len(times), max(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ticks', type=int, nargs='+', default=[1000, 5000, 20000, 45000])
+    parser.add_argument('--seeks', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f'keyframe every {Settings.REPLAY_KEYFRAME_TICKS} ticks')
+    print(f"{'ticks':>7} {'size':>9} {'build':>10} {'keyframes mean/max':>20} {'from tick 0 mean/max':>22}")
+    for ticks in args.ticks:
+        replay = record(ticks, seed=ticks)
+        rng = random.Random(0)
+        targets = [rng.randrange(replay.ticks + 1) for _ in range(args.seeks)]
+        size = len(replay.to_bytes())
+        replay = Replay.from_bytes(replay.to_bytes())  # As loaded from disk
+        start = time.perf_counter()
+        replay.seek(0)
+        build = (time.perf_counter() - start) * 1000
+        fast = time_seeks(replay.seek, targets)
+        slow = time_seeks(lambda tick: from_start(replay, tick), targets)
+        print(f'{replay.ticks:>7} {size / 1024:>7.1f}KB {build:>7.0f} ms {fast[0]:>9.2f}/{fast[1]:>6.2f} ms '
+              f'{slow[0]:>11.2f}/{slow[1]:>7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+'''
+Load test of netplay's server: hundreds of headless clients, each a random
+bot restarting after every game over, against a server in its own process
+ticking at Settings.SERVER_TICK_RATE. Reports the time a tick takes on the
+server against the tick period (the headroom left), the ticks that ran
+late, and the bytes per second each client receives.
+First the deltas are checked: a few clients play with the server ticked
+by hand, and after every tick each client's Mirror has to match its
+board on the server exactly.
+Run: python -m benchmarks.bench_server [--clients 100 300] [--seconds 10]
+'''
+import argparse
+import asyncio
+import multiprocessing
+import random
+import statistics
+
+from engine import DIRECTIONS, Settings
+from netplay import Client, Server
+from replay import DIFFICULTIES
+
+
+async def check(clients, ticks):
+    '''Mirrors against the server's boards after every tick; returns (frames, mismatches).'''
+    server = await Server().start()
+    pairs = []
+    for i in range(clients):
+        joined = set(server.players.values())
+        client = await Client().connect('127.0.0.1', server.port, DIFFICULTIES[i % 3])
+        (player,) = set(server.players.values()) - joined
+        pairs.append((client, player))
+    rng = random.Random(0)
+    frames = mismatches = 0
+    for _ in range(ticks):
+        server.tick()
+        for client, player in pairs:
+            if client.mirror.engine.game_over:
+                continue
+            await client.next_tick()
+            frames += 1
+            mismatches += bool(client.mirror.differences(player.engine))
+        for client, player in pairs:
+            if player.engine.game_over:
+                client.restart()
+                await client.next_tick()
+                mismatches += bool(client.mirror.differences(player.engine))
+            elif rng.random() < 0.15:
+                client.turn(rng.choice(DIRECTIONS))
+    for client, _ in pairs:
+        await client.close()
+    await server.close()
+    return frames, mismatches
+
+
+def server_process(conn, tick_rate):
+    async def run():
+        server = await Server('127.0.0.1', 0, tick_rate).start()
+        conn.send(server.port)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, conn.recv)  # Everyone connected
+        ticking = asyncio.ensure_future(server.serve())
+        await loop.run_in_executor(None, conn.recv)  # Time is up
+        ticking.cancel()
+        times = list(server.tick_times)
+        conn.send({'ticks': server.ticks, 'players': len(server.players), 'dropped': server.dropped,
+                   'times': times})
+        await server.close()
+    asyncio.run(run())
+
+
+async def bot(client, rng, running):
+    while running[0]:
+        ops = await client.next_tick()
+        if ops is None:
+            return
+        if client.mirror.engine.game_over:
+            client.restart()
+        elif rng.random() < 0.1:
+            client.turn(rng.choice(DIRECTIONS))
+
+
+async def load(count, seconds, tick_rate):
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=server_process, args=(child, tick_rate))
+    process.start()
+    port = parent.recv()
+    clients = [await Client().connect('127.0.0.1', port, DIFFICULTIES[i % 3]) for i in range(count)]
+    for client in clients:
+        client.bytes_received = 0
+    running = [True]
+    bots = [asyncio.ensure_future(bot(client, random.Random(i), running)) for i, client in enumerate(clients)]
+    parent.send('go')
+    await asyncio.sleep(seconds)
+    parent.send('stop')
+    running[0] = False
+    stats = await asyncio.get_running_loop().run_in_executor(None, parent.recv)
+    for task in bots:
+        task.cancel()
+    await asyncio.gather(*bots, return_exceptions=True)
+    for client in clients:
+        await client.close()
+    process.join()
+    stats['bytes_per_s'] = statistics.mean(c.bytes_received for c in clients) / seconds
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, nargs='+', default=[100, 300])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--tick-rate', type=int, default=Settings.SERVER_TICK_RATE)
+    args = parser.parse_args()
+
+    frames, mismatches = asyncio.run(check(6, 2000))
+    print(f'delta check: {frames} frames, {mismatches} mirrors out of sync')
+    period = 1000 / args.tick_rate
+    print(f'{args.tick_rate} ticks/s ({period:.0f} ms), {args.seconds:.0f} s per run')
+    print(f"{'clients':>7} {'ticks':>6} {'tick mean':>10} {'p99':>8} {'max':>8} {'headroom':>9} "
+          f"{'late':>5} {'dropped':>7} {'B/s per client':>15}")
+    for count in args.clients:
+        s = asyncio.run(load(count, args.seconds, args.tick_rate))
+        times = sorted(t * 1000 for t in s['times'])
+        p99 = times[int(len(times) * 0.99)]
+        late = sum(t > period for t in times)
+        print(f"{count:>7} {s['ticks']:>6} {statistics.mean(times):>8.2f}ms {p99:>6.2f}ms {times[-1]:>6.2f}ms "
+              f"{1 - p99 / period:>9.0%} {late:>5} {s['dropped']:>7} {s['bytes_per_s']:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
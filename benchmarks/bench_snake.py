@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+'''
+Snake.move + Snake.collides_self per tick, and memory per segment, for the
+array-backed SnakeBody against the old deque of tuples.
+Run: python -m benchmarks.bench_snake [--lengths 10 1000 10000]
+'''
+import argparse
+import random
+import sys
+import time
+from collections import deque
+
+from engine import Settings, Snake
+
+
+class DequeSnake(Snake):
+    '''The previous implementation, kept here as the baseline.'''
+    def reset(self, rng=random):
+        super().reset(rng)
+        self.positions = deque(self.positions)
+
+    def head(self):
+        return self.positions[0]
+
+    def collides_self(self):
+        return self.head() in list(self.positions)[1:]
+
+
+def grown(cls, length):
+    snake = cls()
+    snake.direction = (1, 0)
+    snake.grow_pending = length - 1
+    # Lay the snake out in rows so it never runs into itself
+    for i in range(length - 1):
+        snake.direction = (0, 1) if (i + 1) % Settings.GRID_W == 0 else (1, 0)
+        snake.move()
+    snake.direction = (1, 0)
+    return snake
+
+
+def bench_tick(snake, ticks):
+    start = time.perf_counter()
+    for _ in range(ticks):
+        snake.move()
+        snake.collides_self()
+    return (time.perf_counter() - start) / ticks * 1e6
+
+
+def deque_bytes(positions):
+    return sys.getsizeof(positions) + sum(sys.getsizeof(p) for p in positions)
+
+
+def body_bytes(positions):
+    # The per-cell counts are a fixed cost of the board, reported separately
+    return sys.getsizeof(positions.cells)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lengths', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--ticks', type=int, default=2000)
+    args = parser.parse_args()
+
+    # A board big enough for the longest snake
+    side = int(max(args.lengths) ** 0.5) + 2
+    Settings.GRID_W = Settings.GRID_H = max(side, 30)
+
+    for length in args.lengths:
+        old, new = grown(DequeSnake, length), grown(Snake, length)
+        t_old, t_new = bench_tick(old, args.ticks), bench_tick(new, args.ticks)
+        m_old, m_new = deque_bytes(old.positions), body_bytes(new.positions)
+        print(f'length {length:>6}: tick {t_old:8.2f} -> {t_new:6.2f} us   '
+              f'memory {m_old / length:6.1f} -> {m_new / length:5.1f} bytes/segment '
+              f'(+ {sys.getsizeof(new.positions.counts)} bytes of cell counts)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+'''
+Cost of placing food on a board filled with obstacles to 10%, 50% and 95%:
+the FreeCells draw against the old rejection sampling over a rebuilt
+get_occupied_positions() set.
+Run: python -m benchmarks.bench_spawn [--grid 30 100] [--fills 0.1 0.5 0.95]
+'''
+import argparse
+import random
+import time
+
+from engine import Engine, Settings
+
+
+def legacy_randomize(food, occupied):
+    while True:
+        p = (random.randint(0, Settings.GRID_W - 1), random.randint(0, Settings.GRID_H - 1))
+        if p not in occupied:
+            food.position = p
+            break
+
+
+def filled(fill):
+    game = Engine('easy')
+    target = int(Settings.GRID_W * Settings.GRID_H * fill)
+    while Settings.GRID_W * Settings.GRID_H - len(game.free_cells) < target:
+        game.spawn_obstacle()
+    return game
+
+
+def bench(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--grid', type=int, nargs='+', default=[30, 100])
+    parser.add_argument('--fills', type=float, nargs='+', default=[0.1, 0.5, 0.95])
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    for side in args.grid:
+        Settings.GRID_W = Settings.GRID_H = side
+        for fill in args.fills:
+            game = filled(fill)
+            food = game.food
+            game.free_cells.release(food.position)
+
+            def legacy():
+                legacy_randomize(food, game.get_occupied_positions())
+
+            def indexed():
+                food.randomize(game.free_cells)
+                game.free_cells.release(food.position)
+
+            t_old = bench(legacy, max(10, args.repeat // side))
+            t_new = bench(indexed, args.repeat)
+            print(f'{side}x{side} at {fill:4.0%} full: rejection {t_old:10.1f} us   '
+                  f'free-cell index {t_new:5.2f} us')
+
+
+if __name__ == '__main__':
+    main()
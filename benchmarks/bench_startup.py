@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+'''
+Cold start: wall time from launching a fresh Python process to the first
+flipped menu frame, with the lazy startup against loading everything up
+front, plus when the background audio load is done. Each run plays a
+launch of gioco.py in a scratch directory holding generated sound effects,
+on the SDL dummy video and audio drivers.
+Run: python -m benchmarks.bench_startup [--runs 10] [--sound-seconds 2]
+'''
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+from engine import Settings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What `python gioco.py` does up to its first frame, then report and leave
+CHILD = '''
+import time
+from gioco import Game
+start = time.perf_counter()
+game = Game(lazy={lazy})
+assert game.state == 'menu'
+game.pacer.wait()
+game.handle_events()
+game.render()
+print('frame', (time.perf_counter() - start) * 1000, flush=True)
+game.start_loading()
+if game.loader is not None:
+    game.loader.join()
+print('assets', (time.perf_counter() - start) * 1000, flush=True)
+'''
+
+
+def write_sounds(directory, seconds):
+    os.makedirs(os.path.join(directory, 'sounds'))
+    frames = b'\x00\x01' * 2 * 44100 * seconds  # 16-bit stereo
+    for file in Settings.SOUNDS.values():
+        with wave.open(os.path.join(directory, 'sounds', file), 'wb') as w:
+            w.setnchannels(2)
+            w.setsampwidth(2)
+            w.setframerate(44100)
+            w.writeframes(frames)
+
+
+def launch(directory, lazy):
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy', PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    child = subprocess.Popen([sys.executable, '-c', CHILD.format(lazy=lazy)], cwd=directory,
+                             env=env, stdout=subprocess.PIPE, text=True)
+    marks = {}
+    for line in child.stdout:
+        words = line.split()
+        if words and words[0] in ('frame', 'assets'):
+            # Since launch, and since Game() in the child
+            marks[words[0]] = ((time.perf_counter() - start) * 1000, float(words[1]))
+    child.wait()
+    return marks['frame'], marks['assets']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--sound-seconds', type=int, default=2, help='length of each generated WAV')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_sounds(directory, args.sound_seconds)
+        launch(directory, True)  # Warm the OS file cache
+        for lazy in (False, True):
+            runs = [launch(directory, lazy) for _ in range(args.runs)]
+            frame, game_frame = (statistics.median(r[0][i] for r in runs) for i in (0, 1))
+            assets, game_assets = (statistics.median(r[1][i] for r in runs) for i in (0, 1))
+            print(f"{'lazy' if lazy else 'eager':>5}: first frame {frame:6.1f} ms after launch "
+                  f"({game_frame:5.1f} ms after Game()), audio ready {assets:6.1f} ms "
+                  f"({game_assets:5.1f} ms)  median of {args.runs}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+'''
+Replay verification throughput: bot games played to their death, saved
+and re-simulated by verify.verify_dir() on a pool of workers.
+First verify.check() is run on one of the games as saved, which has to
+pass, and on copies that must be rejected: a point more, a tick more, no
+claimed score, and a few bytes that claim a game of 10**12 ticks at score
+0, which a snake driving straight on forever would never contradict.
+Run: python -m benchmarks.bench_verify [--replays 200] [--workers N]
+'''
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_seek import bot_move
+from engine import Engine
+from replay import Replay
+from verify import check, verify_dir
+
+
+def record(seed, max_ticks=50_000):
+    '''A bot game played until it dies, as Game records it; None if it outlives max_ticks.'''
+    rng = random.Random(seed)
+    game = Engine('medium', seed)
+    replay = Replay(game.seed, game.difficulty)
+    while not game.game_over:
+        if game.tick == max_ticks:
+            return None  # Caught looping around the board
+        d = bot_move(game, rng, 10 ** 9)
+        if d != game.snake.direction:
+            replay.record(game.tick, d)
+            game.turn(d)
+        game.step()
+    replay.ticks, replay.score = game.tick, game.score
+    return replay
+
+
+def tampered(replay):
+    '''(what was changed, a copy of replay changed that way)'''
+    def copy(**changes):
+        fields = dict(seed=replay.seed, difficulty=replay.difficulty, turns=replay.turns,
+                      ticks=replay.ticks, score=replay.score)
+        return Replay(**dict(fields, **changes))
+    return [('a point more', copy(score=replay.score + 1)),
+            ('a tick more', copy(ticks=replay.ticks + 1)),
+            ('no claimed score', copy(score=None)),
+            ('endless', Replay(0, 'easy', ticks=10 ** 12, score=0))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--replays', type=int, default=200)
+    parser.add_argument('--workers', type=int, help='processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    replays = []
+    seed = 0
+    while len(replays) < args.replays:
+        replay = record(seed)
+        if replay is not None:
+            replays.append(replay)
+        seed += 1
+    reason, _ = check(replays[0])
+    assert reason is None, reason
+    for change, replay in tampered(replays[0]):
+        start = time.perf_counter()
+        reason, ticks = check(Replay.from_bytes(replay.to_bytes()))
+        assert reason is not None, f'{change}: accepted'
+        print(f'check: {change:<16} rejected after {ticks:>5} ticks, '
+              f'{(time.perf_counter() - start) * 1000:6.1f} ms: {reason}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for i, replay in enumerate(replays):
+            replay.save(os.path.join(directory, f'{i:05}.replay'))
+        results, elapsed = verify_dir(directory, args.workers)
+    rejected = [path for path, reason, _ in results if reason is not None]
+    assert not rejected, rejected
+    ticks = sum(t for _, _, t in results)
+    print(f'{len(results)} replays, {ticks} ticks, {elapsed:.2f} s: {len(results) / elapsed:,.0f} replays/s, '
+          f'{ticks / elapsed:,.0f} ticks/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+'''
+The whole benchmark suite in one run, with results in JSON.
+Microbenchmarks time the hot paths in isolation (best of several repeats,
+per call); scenarios play a full easy, medium and hard game with the bot
+of bench_seek (until it dies or --max-ticks), updating, animating and
+rendering every tick. Runs on the SDL dummy video and audio drivers.
+With --baseline, the results are compared against an earlier JSON file and
+every timing slower by more than --threshold is flagged as a regression
+(exit status 1). --compare OLD NEW compares two files without running.
+Run: python -m benchmarks.suite [--out bench.json] [--baseline old.json] [--threshold 0.10]
+'''
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+from benchmarks import scratch_files
+from benchmarks.bench_seek import bot_move
+from engine import Engine, Settings, Snake
+from particles import create_particle_system
+
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def timed(fn, number, repeat=5):
+    '''Best time per call of fn, in microseconds, over repeat runs of number calls.'''
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best / number * 1e6
+
+
+def long_snake(length):
+    # Laid out in rows, heading into its own body only after a full lap
+    snake = Snake(random.Random(0))
+    snake.grow_pending = length - 1
+    for i in range(length - 1):
+        snake.direction = (0, 1) if (i + 1) % Settings.GRID_W == 0 else (1, 0)
+        snake.move()
+    snake.direction = (1, 0)
+    return snake
+
+
+def micro_engine(scale):
+    results = {}
+    snake = long_snake(200)
+    results['snake.move'] = timed(snake.move, 2000 * scale)
+    results['snake.collides_self'] = timed(snake.collides_self, 5000 * scale)
+
+    game = Engine('hard', 0)
+    for _ in range(20):
+        game.spawn_mine()
+    results['engine.get_occupied_positions'] = timed(game.get_occupied_positions, 200 * scale)
+
+    # Food placement with 95% of the board taken
+    full = Engine('easy', 0)
+    while len(full.free_cells) > Settings.GRID_W * Settings.GRID_H // 20:
+        full.spawn_obstacle()
+    food = full.food
+    full.free_cells.release(food.position)
+
+    def place():
+        food.randomize(full.free_cells, full.rng)
+        full.free_cells.release(food.position)
+    results['food.randomize@95%'] = timed(place, 2000 * scale)
+    return results
+
+
+def crowded(game):
+    '''A fresh game with 20 mines and 4 portal pairs, shielded so it lasts.'''
+    game.difficulty = 'hard'
+    game.reset(seed=0)
+    for _ in range(20):
+        game.engine.spawn_mine()
+    for i in range(len(game.engine.portals), 4):
+        game.engine.spawn_portal(i)
+    game.engine.snake.activate_shield(10 ** 9)
+    game.rewind.reset()
+
+
+def micro_game(game, scale):
+    results = {}
+    random.seed(0)
+    crowded(game)
+    count = [0]
+
+    def update():
+        count[0] += 1
+        if count[0] % 6 == 0:
+            game.steer(random.choice(DIRECTIONS))
+        game.update()
+        if game.state != 'running':
+            crowded(game)
+    results['game.update crowded'] = timed(update, 200 * scale) / 1000
+
+    crowded(game)
+    game.render_mode = 'full'
+    for particles in (0, 500, 5000):
+        game.particles = create_particle_system(max(particles, 1))
+        if particles:
+            # Long-lived, so the count holds while rendering
+            game.particles.emit(particles, (0, Settings.WIDTH), (0, Settings.HEIGHT - 60),
+                                Settings.COLORS['food'], (1, 4), (10 ** 6, 10 ** 6 + 1))
+        results[f'game.render {particles} particles'] = timed(game.render, 10 * scale, 3) / 1000
+    game.particles = create_particle_system()
+
+    game.state = 'menu'
+    results['game.draw_menu'] = timed(game.draw_menu, 10 * scale, 3) / 1000
+    game.state = 'running'
+    return results
+
+
+def scenario(game, difficulty, max_ticks):
+    '''One whole bot game, every tick updated, animated and rendered.'''
+    random.seed(0)
+    rng = random.Random(0)
+    game.difficulty = difficulty
+    game.reset(seed=0)
+    start = time.perf_counter()
+    while game.state == 'running' and game.engine.tick < max_ticks:
+        direction = bot_move(game.engine, rng, 10 ** 9)
+        if direction != game.engine.snake.direction:
+            game.steer(direction)
+        game.update()
+        game.animate()
+        game.render()
+    elapsed = time.perf_counter() - start
+    return {'ms_per_tick': elapsed / max(1, game.engine.tick) * 1000,
+            'ticks': game.engine.tick, 'score': game.engine.score}
+
+
+def run(scale, max_ticks):
+    from gioco import Game  # Opens the (dummy) display
+
+    results = {}
+    results.update(micro_engine(scale))
+    scratch_files()  # Keep the real leaderboard and replays out of it
+    game = Game()
+    game.record_score = lambda: None
+    results.update(micro_game(game, scale))
+    # Engine calls in microseconds, game calls in milliseconds
+    out = {name: {'value': value, 'unit': 'ms' if name.startswith('game.') else 'us'}
+           for name, value in results.items()}
+    for difficulty in ('easy', 'medium', 'hard'):
+        s = scenario(game, difficulty, max_ticks)
+        out[f'scenario.{difficulty}'] = {'value': s.pop('ms_per_tick'), 'unit': 'ms/tick', **s}
+    return out
+
+
+def compare(old, new, threshold):
+    '''Print old against new; returns the names that got slower by more than threshold.'''
+    regressions = []
+    for name, result in new['results'].items():
+        before = old['results'].get(name)
+        if before is None:
+            print(f'{name:<32} {result["value"]:>10.3f} {result["unit"]:<7} (new)')
+            continue
+        change = result['value'] / before['value'] - 1 if before['value'] else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f'{name:<32} {before["value"]:>10.3f} -> {result["value"]:>10.3f} '
+              f'{result["unit"]:<7} {change:+7.1%}{flag}')
+    return regressions
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--out', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare the results against this JSON file')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two result files without running')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='slowdown flagged as a regression (default 0.10 = 10%%)')
+    parser.add_argument('--scale', type=int, default=1, help='multiply the iterations')
+    parser.add_argument('--max-ticks', type=int, default=3000, help='cap on each scenario game')
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(load(args.compare[0]), load(args.compare[1]), args.threshold)
+        return 1 if regressions else 0
+
+    report = {
+        'meta': {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': sys.version.split()[0],
+                 'pygame': pygame.version.ver, 'platform': platform.platform(),
+                 'scale': args.scale, 'max_ticks': args.max_ticks},
+        'results': run(args.scale, args.max_ticks),
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        regressions = compare(load(args.baseline), report, args.threshold)
+        return 1 if regressions else 0
+    for name, result in report['results'].items():
+        extra = ''.join(f'  {k} {v}' for k, v in result.items() if k not in ('value', 'unit'))
+        print(f'{name:<32} {result["value"]:>10.3f} {result["unit"]}{extra}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
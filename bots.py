@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+'''
+CyberSnake - What the simple bots share.
+survives() tells whether a head may move onto a cell next tick, as far as
+the board shows: what other heads are about to do is not known. It reads
+the snake's SnakeBody counts, so on an arena.ArenaEngine board the bodies
+of all the snakes count. greedy_move() takes the surviving move that ends
+nearest a target, the way the tournament's and the arena's greedy bots
+play; bench_seek's cautious bot builds on survives() too.
+'''
+from engine import DIRECTIONS, Portal, Settings
+
+
+def survives(engine, snake, pos):
+    '''Whether snake's head can move onto pos next tick without dying.'''
+    hazard = engine.hazards.get(pos)
+    if isinstance(hazard, Portal) or snake.shield_active:
+        return True  # Portals skip the checks, the shield takes the hit
+    if hazard is not None or pos in engine.blast:
+        return False
+    body = snake.positions
+    segments = body.count(pos)
+    # Its own tail is fine when it leaves this tick, unless other segments lie there too
+    return not segments or (segments == 1 and pos == body[-1] and not snake.grow_pending)
+
+
+def moves(engine, snake):
+    '''(direction, cell) of every move that is not a reverse and survives the tick.'''
+    x, y = snake.positions.head()
+    back = (-snake.direction[0], -snake.direction[1])
+    out = []
+    for d in DIRECTIONS:
+        pos = ((x + d[0]) % Settings.GRID_W, (y + d[1]) % Settings.GRID_H)
+        if d != back and survives(engine, snake, pos):
+            out.append((d, pos))
+    return out
+
+
+def distance(a, b):
+    # Steps between two cells on the wrapping board
+    dx = abs(a[0] - b[0])
+    dy = abs(a[1] - b[1])
+    return min(dx, Settings.GRID_W - dx) + min(dy, Settings.GRID_H - dy)
+
+
+def greedy_move(engine, snake, target, rng):
+    '''
+    The surviving move that ends nearest target (None: any of them), ties
+    broken with rng; straight on when no move survives.
+    '''
+    best, best_key = snake.direction, None
+    for d, pos in moves(engine, snake):
+        key = (distance(pos, target) if target is not None else 0, rng.random())
+        if best_key is None or key < best_key:
+            best, best_key = d, key
+    return best
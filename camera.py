@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+'''
+CyberSnake - Scrolling camera and visible-cell culling.
+The window shows Settings.VIEW_W x Settings.VIEW_H cells of a board that
+can be much bigger (arena mode, up to 1000 x 1000). Camera keeps the view
+centered on the snake head and maps board cells to window pixels across the
+toroidal wrap; anything farther than a margin outside the view maps to None
+and is not drawn. On an axis where the board fits the window the camera
+stays put, so on the standard board it is the identity.
+ChunkGrid buckets entities by 16 x 16 cell chunk so that drawing only visits
+the chunks the view overlaps, however many entities the board holds.
+'''
+
+
+class Camera:
+    '''
+    x, y: the board pixel at the window's top-left corner. margin (in cells)
+    is how far out of view a cell is still drawn, for the glow and the
+    explosions that spill over.
+    '''
+    def __init__(self, view_w, view_h, grid_w, grid_h, cell, margin=2):
+        self.cell = cell
+        self.grid_w, self.grid_h = grid_w, grid_h
+        self.view_w, self.view_h = view_w * cell, view_h * cell
+        self.world_w, self.world_h = grid_w * cell, grid_h * cell
+        self.scroll_x, self.scroll_y = grid_w > view_w, grid_h > view_h
+        self.scrolling = self.scroll_x or self.scroll_y
+        self.margin = margin * cell
+        self.x = self.y = 0
+
+    def follow(self, pos):
+        '''Center the view on cell pos, which may be fractional (a sliding head).'''
+        c = self.cell
+        if self.scroll_x:
+            self.x = round(pos[0] * c + c / 2 - self.view_w / 2) % self.world_w
+        if self.scroll_y:
+            self.y = round(pos[1] * c + c / 2 - self.view_h / 2) % self.world_h
+
+    # Board pixels to window pixels; plain arithmetic, so numpy arrays work too
+    def project_x(self, x):
+        if not self.scroll_x:
+            return x
+        x = (x - self.x) % self.world_w
+        # Past the right margin means just off the left edge, across the wrap
+        return x - self.world_w * (x >= self.view_w + self.margin)
+
+    def project_y(self, y):
+        if not self.scroll_y:
+            return y
+        y = (y - self.y) % self.world_h
+        return y - self.world_h * (y >= self.view_h + self.margin)
+
+    def to_screen(self, pos):
+        '''Window pixel of the top-left corner of cell pos, or None when out of view.'''
+        c = self.cell
+        x = self.project_x(pos[0] * c)
+        y = self.project_y(pos[1] * c)
+        if x <= -self.margin - c or y <= -self.margin - c:
+            return None
+        return round(x), round(y)
+
+    def visible_cells(self):
+        '''(x0, y0, columns, rows): the cells in view and its margin, x0 and y0 wrapped.'''
+        c, m = self.cell, self.margin
+        x0, cols = 0, self.grid_w
+        if self.scroll_x:
+            x0 = (self.x - m) // c % self.grid_w
+            cols = min(self.grid_w, (self.view_w + 2 * m) // c + 2)
+        y0, rows = 0, self.grid_h
+        if self.scroll_y:
+            y0 = (self.y - m) // c % self.grid_h
+            rows = min(self.grid_h, (self.view_h + 2 * m) // c + 2)
+        return x0, y0, cols, rows
+
+
+class ChunkGrid:
+    '''
+    Items bucketed by the chunk of their cell. query(camera) returns the
+    items of every chunk the view overlaps: a superset of the visible ones,
+    still to be culled by Camera.to_screen().
+    '''
+    def __init__(self, grid_w, grid_h, size=16):
+        self.size = size
+        self.grid_w, self.grid_h = grid_w, grid_h
+        self.chunks = {}
+
+    def clear(self):
+        self.chunks = {}
+
+    def add(self, pos, item):
+        key = (pos[0] // self.size, pos[1] // self.size)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            self.chunks[key] = [item]
+        else:
+            chunk.append(item)
+
+    def query(self, camera):
+        x0, y0, cols, rows = camera.visible_cells()
+        size = self.size
+        xs = {(x0 + i) % self.grid_w // size for i in range(cols)}
+        ys = {(y0 + i) % self.grid_h // size for i in range(rows)}
+        items = []
+        for cy in ys:
+            for cx in xs:
+                chunk = self.chunks.get((cx, cy))
+                if chunk:
+                    items.extend(chunk)
+        return items
@@ -0,0 +1,830 @@
+#!/usr/bin/env python3
+'''
+CyberSnake - Headless rules engine.
+Owns the whole game state (snake, food, obstacles, mines, portals, shield,
+combo and power timers) and advances it one tick per Engine.step() call.
+No pygame here: nothing is drawn, played or timed, so the rules can run at
+full CPU speed for soak tests, bots and server-side checks.
+Games are deterministic: every random draw comes from the engine's own
+generator, seeded per game, and rule timing counts ticks, so a seed plus
+the turns and the ticks they came at reproduce a game exactly.
+'''
+import random
+from array import array
+
+OBSTACLE = 'obstacle'  # Engine.hazards value of an obstacle cell
+# Turns as replays, batches, bots and the network number them
+DIRECTIONS = ((0, -1), (1, 0), (0, 1), (-1, 0))  # up, right, down, left
+
+
+class Settings:
+    GRID_SIZE = 20
+    GRID_W = 30  # Board size in cells; --grid sets a bigger one (arena mode)
+    GRID_H = 30
+    VIEW_W = 30  # Cells the window shows; a bigger board scrolls under it
+    VIEW_H = 30
+    ARENA = False  # Set with --grid: replays and records only cover the 30 x 30 board
+    ARENA_MAX = 1000  # Largest board side --grid accepts
+    WIDTH = GRID_SIZE * VIEW_W
+    HEIGHT = GRID_SIZE * VIEW_H + 60  # Space for HUD
+    FPS_EASY = 6
+    FPS_MEDIUM = 8
+    FPS_HARD = 12
+    MAX_FPS = 25
+
+    # Rendering is decoupled from the ticks above
+    RENDER_FPS = 120
+    ANIMATION_FPS = 60  # Fixed rate of particles, stars, effects and menu animations
+    COLORS = {
+        'bg': (10, 10, 25),  # Darker blue background
+        'grid': (20, 35, 45),  # More visible grid
+        'snake_head': (0, 255, 255),
+        'snake_body': (0, 200, 200),
+        'food': (0, 255, 128),
+        'power': (255, 0, 255),
+        'obst': (255, 64, 64),
+        'portal': (128, 0, 255),
+        'mine': (255, 215, 0),
+        'shield': (64, 224, 208),
+        'hud': (200, 200, 200),
+        'menu_bg': (15, 15, 35),
+        'menu_select': (0, 255, 255),
+        'menu_text': (220, 220, 220),
+        'particle': (255, 255, 255, 150),  # Semi-transparent white for particles
+        'bg_glow': (20, 40, 80, 50),  # Background glow effect
+        'title_glow': (0, 180, 255),  # Glowing title effect
+    }
+    FONT_NAME = 'freesansbold.ttf'
+    TEXT_CACHE_SIZE = 1024  # Rendered text surfaces kept, least recently used go first
+    HIGHSCORE_FILE = 'highscore.txt'  # Single score of older versions, imported once
+    LEADERBOARD_FILE = 'leaderboard.json'
+    LEADERBOARD_SIZE = 1000  # Games kept per difficulty
+    REPLAY_DIR = 'replays'  # Every finished game is saved here
+    VERIFY_MAX_TICKS = 500_000  # Longest replay verify.py re-simulates (5.5 h at MAX_FPS, ~3 s of CPU)
+    REPLAY_KEYFRAME_TICKS = 1000  # Ticks between the keyframes seeking builds (seek cost vs ~4.5 KB each)
+    REWIND_SECONDS = 10  # Game time Backspace takes back in practice
+    REWIND_MEMORY_KB = 512  # Cap for the rewind deltas and snapshots
+    REWIND_SNAPSHOT_TICKS = 50  # Ticks between full rewind snapshots
+    AUTOPILOT_BUDGET_US = 2000  # Time an autopilot decision may take (demo mode, soak tests)
+    DEMO_RESTART_MS = 3000  # Game over screen time before demo mode starts the next game
+    SERVER_TICK_RATE = 10  # Ticks per second of netplay.py's server, every board at once
+    SERVER_MAX_BACKLOG = 64 * 1024  # Unsent bytes before the server drops a client
+    DIFFICULTY_OBSTACLES = {
+        'easy': 3,
+        'medium': 8,
+        'hard': 15
+    }
+    DIFFICULTY_MINE_CHANCE = {
+        'easy': 0.0,
+        'medium': 0.1,
+        'hard': 0.2
+    }
+    DIFFICULTY_PORTAL_COUNT = {
+        'easy': 0,
+        'medium': 1,
+        'hard': 2
+    }
+
+    # Sound settings
+    SOUNDS = {
+        'eat': 'eat.wav',
+        'game_over': 'game_over.wav',
+        'teleport': 'teleport.wav',
+        'shield': 'shield.wav',
+        'explosion': 'explosion.wav',
+        'menu_select': 'menu_select.wav',
+        'menu_confirm': 'menu_confirm.wav',
+    }
+    MUSIC = 'background_music.mp3'
+
+    # Visual effects settings
+    PARTICLE_COUNT = 50
+    PARTICLE_SPEED = 1.5
+    PARTICLE_LIFETIME = 200
+    PARTICLE_BUDGET = 3000  # Max live particles, extra emissions are dropped
+
+    # 'full' redraws the whole window every frame, 'dirty' only the cells that
+    # changed (background frozen while playing); F2 switches during a game
+    RENDER_MODE = 'full'
+
+    # Menu animations
+    MENU_PULSE_SPEED = 0.02
+    TITLE_GLOW_SPEED = 0.03
+
+    # Background effects
+    BG_STARS_COUNT = 100
+    BG_NEBULA_COUNT = 3
+
+    # Baked background animations
+    BAKE_AT_STARTUP = True  # False bakes each nebula sprite on first use
+    LAZY_STARTUP = True  # Menu first: audio loads in the background, nothing is baked up front
+    BAKE_MEMORY_MB = 32  # Upper bound for baked nebula sprites
+    NEBULA_RADIUS_STEP = 2  # Nebula radii are quantized to this many pixels
+    GRID_PHASES = 120  # Baked line colors per cycle of the menu grid
+    GLOW_PADDING = 4  # How far a baked glow halo softens past its shape
+
+
+class FreeCells:
+    '''
+    The cells no entity occupies, kept up to date incrementally.
+    Free cells sit in cells[:free] and slot[] maps each cell to its place in
+    cells, so an occupied cell is swapped out past the end of the free run and
+    back in when released. Entities may share a cell (the snake crossing a
+    mine, or its own body under a shield), hence the per-cell counts.
+    sample() is a constant-time uniform draw from rng, or None when the board
+    is full. While log is a list, every change is journaled into it so that
+    undo() can put cells back in exactly the same order.
+    '''
+    __slots__ = ('width', 'cells', 'slot', 'counts', 'free', 'log')
+
+    def __init__(self, width, height):
+        self.width = width
+        self.cells = array('i', range(width * height))
+        self.slot = array('i', range(width * height))
+        self.counts = bytearray(width * height)
+        self.free = width * height
+        self.log = None
+
+    def __len__(self):
+        return self.free
+
+    def __contains__(self, pos):
+        return self.counts[pos[1] * self.width + pos[0]] == 0
+
+    def swap(self, cell, i):
+        # Exchange cell with whatever sits at slot i
+        j = self.slot[cell]
+        other = self.cells[i]
+        self.cells[i], self.cells[j] = cell, other
+        self.slot[cell], self.slot[other] = i, j
+
+    def occupy(self, pos):
+        cell = pos[1] * self.width + pos[0]
+        self.counts[cell] += 1
+        if self.counts[cell] == 1:
+            self.free -= 1
+            if self.log is not None:
+                self.log.append((cell, 1, self.slot[cell], self.free))
+            self.swap(cell, self.free)
+        elif self.log is not None:
+            self.log.append((cell, 1, -1, -1))
+
+    def release(self, pos):
+        cell = pos[1] * self.width + pos[0]
+        self.counts[cell] -= 1
+        if self.counts[cell] == 0:
+            if self.log is not None:
+                self.log.append((cell, -1, self.slot[cell], self.free))
+            self.swap(cell, self.free)
+            self.free += 1
+        elif self.log is not None:
+            self.log.append((cell, -1, -1, -1))
+
+    def undo(self, log):
+        '''Revert the changes journaled in log, newest first.'''
+        cells, slot = self.cells, self.slot
+        for cell, delta, i, j in reversed(log):
+            self.counts[cell] -= delta
+            if i >= 0:
+                # Swap the two slots back
+                a, b = cells[i], cells[j]
+                cells[i], cells[j] = b, a
+                slot[b], slot[a] = i, j
+                self.free += delta
+
+    def sample(self, rng=random):
+        if not self.free:
+            return None
+        cell = self.cells[rng.randrange(self.free)]
+        return (cell % self.width, cell // self.width)
+
+
+class SnakeBody:
+    '''
+    Snake cells from head to tail, with the same API as the deque of (x, y)
+    tuples it replaces (appendleft, pop, append, popleft, [0] = ...,
+    iteration, count, in).
+    Cells are stored as flat indices y * width + x in a growable ring buffer,
+    and a per-cell segment count is kept up to date as cells are added and
+    removed, so membership and self-collision are O(1) and no tuple is kept
+    per segment. Once attach()ed to a FreeCells, every cell entering or
+    leaving the body is registered with it too. Several bodies can share one
+    counts grid (the snakes of an arena.ArenaEngine): membership and count()
+    then cover all of them.
+    '''
+    __slots__ = ('width', 'cells', 'counts', 'start', 'size', 'free_cells')
+
+    def __init__(self, width, height, positions=(), capacity=16, counts=None):
+        self.width = width
+        self.cells = array('i', bytes(4 * capacity))
+        self.counts = bytearray(width * height) if counts is None else counts
+        self.start = 0  # Slot of the head
+        self.size = 0
+        self.free_cells = None
+        for pos in reversed(list(positions)):
+            self.appendleft(pos)
+
+    def attach(self, free_cells):
+        self.free_cells = free_cells
+        for pos in self:
+            free_cells.occupy(pos)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        cells, width, cap = self.cells, self.width, len(self.cells)
+        for i in range(self.start, self.start + self.size):
+            cell = cells[i % cap]
+            yield (cell % width, cell // width)
+
+    def head(self):
+        cell = self.cells[self.start]
+        return (cell % self.width, cell // self.width)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.size))]
+        if i < 0:
+            i += self.size
+        if not 0 <= i < self.size:
+            raise IndexError('snake index out of range')
+        cell = self.cells[(self.start + i) % len(self.cells)]
+        return (cell % self.width, cell // self.width)
+
+    def __setitem__(self, i, pos):
+        if i < 0:
+            i += self.size
+        if not 0 <= i < self.size:
+            raise IndexError('snake index out of range')
+        slot = (self.start + i) % len(self.cells)
+        self.counts[self.cells[slot]] -= 1
+        if self.free_cells is not None:
+            self.free_cells.release(self[i])
+            self.free_cells.occupy(pos)
+        cell = pos[1] * self.width + pos[0]
+        self.cells[slot] = cell
+        self.counts[cell] += 1
+
+    def __contains__(self, pos):
+        return self.counts[pos[1] * self.width + pos[0]] > 0
+
+    def count(self, pos):
+        return self.counts[pos[1] * self.width + pos[0]]
+
+    def grow_buffer(self):
+        # Full: unroll into a buffer twice as big, head at slot 0
+        cap = len(self.cells)
+        cells = array('i', bytes(8 * cap))
+        for i in range(self.size):
+            cells[i] = self.cells[(self.start + i) % cap]
+        self.cells, self.start = cells, 0
+
+    def appendleft(self, pos):
+        if self.size == len(self.cells):
+            self.grow_buffer()
+        self.start = (self.start - 1) % len(self.cells)
+        cell = pos[1] * self.width + pos[0]
+        self.cells[self.start] = cell
+        self.counts[cell] += 1
+        self.size += 1
+        if self.free_cells is not None:
+            self.free_cells.occupy(pos)
+
+    def append(self, pos):
+        # Add a tail segment (to undo a pop())
+        if self.size == len(self.cells):
+            self.grow_buffer()
+        cell = pos[1] * self.width + pos[0]
+        self.cells[(self.start + self.size) % len(self.cells)] = cell
+        self.counts[cell] += 1
+        self.size += 1
+        if self.free_cells is not None:
+            self.free_cells.occupy(pos)
+
+    def popleft(self):
+        if not self.size:
+            raise IndexError('pop from an empty snake')
+        pos = self.head()
+        self.counts[self.cells[self.start]] -= 1
+        self.start = (self.start + 1) % len(self.cells)
+        self.size -= 1
+        if self.free_cells is not None:
+            self.free_cells.release(pos)
+        return pos
+
+    def pop(self):
+        if not self.size:
+            raise IndexError('pop from an empty snake')
+        self.size -= 1
+        cell = self.cells[(self.start + self.size) % len(self.cells)]
+        self.counts[cell] -= 1
+        pos = (cell % self.width, cell // self.width)
+        if self.free_cells is not None:
+            self.free_cells.release(pos)
+        return pos
+
+
+class Snake:
+    def __init__(self, rng=random):
+        self.reset(rng)
+
+    def reset(self, rng=random):
+        self.positions = SnakeBody(Settings.GRID_W, Settings.GRID_H,
+                                   [(Settings.GRID_W // 2, Settings.GRID_H // 2)])
+        self.direction = rng.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
+        self.grow_pending = 2
+        self.shield_active = False
+        self.shield_timer = 0
+
+    def head(self):
+        return self.positions.head()
+
+    def turn(self, dir):
+        # Prevent reverse movement
+        if (dir[0] * -1, dir[1] * -1) == self.direction:
+            return
+        self.direction = dir
+
+    def move(self):
+        x, y = self.head()
+        dx, dy = self.direction
+        new_head = ((x + dx) % Settings.GRID_W, (y + dy) % Settings.GRID_H)
+        if self.grow_pending:
+            self.grow_pending -= 1
+        else:
+            self.positions.pop()
+        self.positions.appendleft(new_head)
+
+        # Update shield timer
+        if self.shield_active:
+            self.shield_timer -= 1
+            if self.shield_timer <= 0:
+                self.shield_active = False
+
+    def grow(self, n=1):
+        self.grow_pending += n
+
+    def activate_shield(self, duration=150):
+        self.shield_active = True
+        self.shield_timer = duration
+
+    def collides_self(self):
+        return self.positions.count(self.head()) > 1
+
+
+class Food:
+    def __init__(self, power=False, shield=False):
+        self.power = power
+        self.shield = shield
+
+        if shield:
+            self.color = Settings.COLORS['shield']
+        elif power:
+            self.color = Settings.COLORS['power']
+        else:
+            self.color = Settings.COLORS['food']
+
+        self.position = (0, 0)
+
+    def randomize(self, free_cells, rng=random):
+        # Place on a free cell and claim it; no position when the board is full
+        self.position = free_cells.sample(rng)
+        if self.position is None:
+            return False
+        free_cells.occupy(self.position)
+        return True
+
+
+class Mine:
+    def __init__(self):
+        self.position = (0, 0)
+        self.timer = 0
+        self.active = False
+        self.explosion_radius = 1
+        self.explosion_timer = 0
+
+    def randomize(self, free_cells, rng=random):
+        p = free_cells.sample(rng)
+        if p is None:
+            return False
+        free_cells.occupy(p)
+        self.position = p
+        self.timer = rng.randint(100, 200)  # Random timer before activation
+        self.active = False
+        self.explosion_timer = 0
+        return True
+
+    def update(self):
+        if not self.active and self.timer > 0:
+            self.timer -= 1
+            if self.timer <= 0:
+                self.active = True
+
+        if self.explosion_timer > 0:
+            self.explosion_timer -= 1
+
+    def ticking(self):
+        # Whether update() still changes anything
+        return (not self.active and self.timer > 0) or self.explosion_timer > 0
+
+    def explode(self):
+        self.explosion_timer = 20  # Duration of explosion animation
+        return self.get_explosion_cells()
+
+    def get_explosion_cells(self):
+        cells = []
+        x, y = self.position
+        radius = self.explosion_radius
+
+        for dx in range(-radius, radius + 1):
+            for dy in range(-radius, radius + 1):
+                if dx * dx + dy * dy <= radius * radius + radius:  # Circle-ish shape
+                    nx, ny = (x + dx) % Settings.GRID_W, (y + dy) % Settings.GRID_H
+                    cells.append((nx, ny))
+
+        return cells
+
+
+class Portal:
+    def __init__(self, id=0):
+        self.id = id
+        self.position = (0, 0)
+        self.pair_position = (0, 0)
+        self.color = Settings.COLORS['portal']
+
+    def randomize(self, free_cells, rng=random):
+        p1 = free_cells.sample(rng)
+        if p1 is None:
+            return False
+        free_cells.occupy(p1)
+        p2 = free_cells.sample(rng)
+        if p2 is None:
+            free_cells.release(p1)
+            return False
+        free_cells.occupy(p2)
+        self.position = p1
+        self.pair_position = p2
+        return True
+
+
+class Engine:
+    '''
+    Game rules as pure state plus a step function.
+    step() advances exactly one tick and returns the list of events that
+    happened during it, as dicts with a 'type' key:
+      'teleport'      pos                   snake went through a portal
+      'shield_break'  pos                   shield absorbed a mine
+      'explosion'     pos, cells            a mine blew up
+      'ate'           pos, food, gained     food eaten (food is the old one)
+      'died'          pos, cause            'explosion', 'self' or 'obstacle'
+    Whoever drives the engine decides what to draw or play for each event.
+    Each reset() starts a game from a seed (a fresh one unless given), kept
+    in self.seed; self.rng is the only source of randomness for the rules.
+    hazards maps every obstacle, mine and portal cell to what is there
+    (OBSTACLE, the Mine or the Portal); entities only spawn on free cells, so
+    there is one per cell and each head collision check is a single lookup.
+    ticking maps the index of every mine whose timers still run to the mine:
+    only those are updated, so a tick costs the same however many mines
+    have settled.
+    '''
+    # Entity classes, so a front-end can plug in subclasses that know how to draw
+    snake_class = Snake
+    food_class = Food
+    mine_class = Mine
+    portal_class = Portal
+
+    def __init__(self, difficulty='medium', seed=None):
+        self.difficulty = difficulty
+        self.reset(seed=seed)
+
+    def reset(self, difficulty=None, seed=None):
+        if difficulty is not None:
+            self.difficulty = difficulty
+        self.seed = seed if seed is not None else random.randrange(1 << 32)
+        self.rng = random.Random(self.seed)
+        # Every entity registers its cells here, so spawns are O(1) draws
+        self.free_cells = FreeCells(Settings.GRID_W, Settings.GRID_H)
+        self.snake = self.snake_class(self.rng)
+        self.snake.positions.attach(self.free_cells)
+        self.obstacles = []
+        self.mines = []
+        self.portals = []
+        self.hazards = {}
+        self.ticking = {}
+        self.explosion_cells = []
+        self.score = 0
+        self.tick = 0
+        self.game_over = False
+        self.death_cause = None
+        self.speed = self.base_speed()
+
+        # Generate initial obstacles based on difficulty
+        for _ in range(Settings.DIFFICULTY_OBSTACLES[self.difficulty]):
+            self.spawn_obstacle()
+
+        # Generate portals based on difficulty
+        for i in range(Settings.DIFFICULTY_PORTAL_COUNT[self.difficulty]):
+            self.spawn_portal(i)
+
+        self.food = self.food_class()
+        self.food.randomize(self.free_cells, self.rng)
+        self.power_timer = 0
+        self.combo_counter = 0
+        self.combo_timer = 0
+        self.elapsed_ms = 0.0  # Game time, advances 1000/speed per tick
+        self.last_direction_change = 0.0
+
+    @property
+    def explosion_cells(self):
+        return self.blast_cells
+
+    @explosion_cells.setter
+    def explosion_cells(self, cells):
+        # The cells of the last explosion, plus a set of them for the head lookup
+        self.blast_cells = cells
+        self.blast = set(cells)
+
+    def base_speed(self):
+        # Speed based on score and difficulty
+        if self.difficulty == 'easy':
+            return min(Settings.FPS_EASY + self.score // 8, Settings.MAX_FPS)
+        elif self.difficulty == 'medium':
+            return min(Settings.FPS_MEDIUM + self.score // 6, Settings.MAX_FPS)
+        else:
+            return min(Settings.FPS_HARD + self.score // 4, Settings.MAX_FPS)
+
+    def get_state(self):
+        '''
+        Everything step() depends on, as plain values: tuples, lists, dicts,
+        the generator state and the free-cell arrays (their order decides
+        future spawns). set_state() on any engine resumes the same game.
+        '''
+        snake = self.snake
+        return {
+            'difficulty': self.difficulty, 'seed': self.seed, 'rng': self.rng.getstate(),
+            'tick': self.tick, 'score': self.score, 'speed': self.speed,
+            'game_over': self.game_over, 'death_cause': self.death_cause,
+            'elapsed_ms': self.elapsed_ms, 'last_direction_change': self.last_direction_change,
+            'combo_counter': self.combo_counter, 'combo_timer': self.combo_timer,
+            'power_timer': self.power_timer,
+            'snake': {'positions': list(snake.positions), 'direction': snake.direction,
+                      'grow_pending': snake.grow_pending, 'shield_active': snake.shield_active,
+                      'shield_timer': snake.shield_timer},
+            'food': {'position': self.food.position, 'power': self.food.power,
+                     'shield': self.food.shield},
+            'obstacles': list(self.obstacles),
+            'mines': [{'position': m.position, 'timer': m.timer, 'active': m.active,
+                       'explosion_radius': m.explosion_radius, 'explosion_timer': m.explosion_timer}
+                      for m in self.mines],
+            'portals': [{'id': p.id, 'position': p.position, 'pair_position': p.pair_position}
+                        for p in self.portals],
+            'explosion_cells': list(self.explosion_cells),
+            'free_cells': (array('i', self.free_cells.cells), bytes(self.free_cells.counts),
+                           self.free_cells.free),
+        }
+
+    def set_state(self, state):
+        # Positions may come back as lists (JSON); the rules compare tuples
+        def cell(p):
+            return None if p is None else tuple(p)
+
+        self.difficulty = state['difficulty']
+        self.seed = state['seed']
+        for key in ('tick', 'score', 'speed', 'game_over', 'death_cause', 'elapsed_ms',
+                    'last_direction_change', 'combo_counter', 'combo_timer', 'power_timer'):
+            setattr(self, key, state[key])
+
+        cells, counts, free = state['free_cells']
+        self.free_cells = free_cells = FreeCells(Settings.GRID_W, Settings.GRID_H)
+        free_cells.cells = array('i', cells)
+        free_cells.counts = bytearray(counts)
+        free_cells.free = free
+        for i, c in enumerate(free_cells.cells):
+            free_cells.slot[c] = i
+
+        s = state['snake']
+        self.snake = self.snake_class(random.Random(0))
+        self.snake.positions = SnakeBody(Settings.GRID_W, Settings.GRID_H,
+                                         [cell(p) for p in s['positions']])
+        self.snake.positions.free_cells = free_cells  # Its cells are already counted
+        self.snake.direction = cell(s['direction'])
+        for key in ('grow_pending', 'shield_active', 'shield_timer'):
+            setattr(self.snake, key, s[key])
+
+        f = state['food']
+        self.food = self.food_class(power=f['power'], shield=f['shield'])
+        self.food.position = cell(f['position'])
+        self.obstacles = [cell(p) for p in state['obstacles']]
+        self.mines = []
+        for m in state['mines']:
+            mine = self.mine_class()
+            mine.position = cell(m['position'])
+            for key in ('timer', 'active', 'explosion_radius', 'explosion_timer'):
+                setattr(mine, key, m[key])
+            self.mines.append(mine)
+        self.portals = []
+        for p in state['portals']:
+            portal = self.portal_class(p['id'])
+            portal.position, portal.pair_position = cell(p['position']), cell(p['pair_position'])
+            self.portals.append(portal)
+        self.explosion_cells = [cell(p) for p in state['explosion_cells']]
+        self.hazards = dict.fromkeys(self.obstacles, OBSTACLE)
+        for mine in self.mines:
+            self.hazards[mine.position] = mine
+        self.ticking = {i: mine for i, mine in enumerate(self.mines) if mine.ticking()}
+        for portal in self.portals:
+            self.hazards[portal.position] = self.hazards[portal.pair_position] = portal
+
+        version, internal, gauss_next = state['rng']
+        self.rng = random.Random()
+        self.rng.setstate((version, tuple(internal), gauss_next))
+
+    def get_occupied_positions(self):
+        occupied = set(self.snake.positions) | set(self.obstacles)
+        for mine in self.mines:
+            occupied.add(mine.position)
+        for portal in self.portals:
+            occupied.add(portal.position)
+            occupied.add(portal.pair_position)
+        if hasattr(self, 'food') and self.food.position is not None:
+            occupied.add(self.food.position)
+        return occupied
+
+    # Spawns return the new entity, or None when no free cell is left
+    def spawn_obstacle(self):
+        p = self.free_cells.sample(self.rng)
+        if p is None:
+            return None
+        self.free_cells.occupy(p)
+        self.obstacles.append(p)
+        self.hazards[p] = OBSTACLE
+        return p
+
+    def spawn_mine(self):
+        mine = self.mine_class()
+        if not mine.randomize(self.free_cells, self.rng):
+            return None
+        self.mines.append(mine)
+        self.hazards[mine.position] = mine
+        self.ticking[len(self.mines) - 1] = mine
+        return mine
+
+    def spawn_portal(self, id=0):
+        portal = self.portal_class(id)
+        if not portal.randomize(self.free_cells, self.rng):
+            return None
+        self.portals.append(portal)
+        self.hazards[portal.position] = self.hazards[portal.pair_position] = portal
+        return portal
+
+    def drop_spawns(self, obstacles, mines):
+        '''
+        Take back the obstacles and mines spawned after there were that many,
+        as a rewind does. Their cells are left to the caller's FreeCells undo.
+        '''
+        for p in self.obstacles[obstacles:]:
+            del self.hazards[p]
+        for i, mine in enumerate(self.mines[mines:], mines):
+            del self.hazards[mine.position]
+            self.ticking.pop(i, None)
+        del self.obstacles[obstacles:]
+        del self.mines[mines:]
+
+    def turn(self, direction):
+        '''Steer the snake before the next tick.'''
+        self.snake.turn(direction)
+        # Combo system: fast direction changes score more
+        if self.elapsed_ms - self.last_direction_change < 500:  # Within 0.5s of game time
+            self.combo_counter += 1
+            self.combo_timer = 100  # Reset combo timer
+        else:
+            self.combo_counter = 1
+        self.last_direction_change = self.elapsed_ms
+
+    def check_portal_collision(self):
+        head = self.snake.head()
+        portal = self.hazards.get(head)
+        if not isinstance(portal, Portal):
+            return None
+        # Teleport to the other end of the pair
+        exit_pos = portal.pair_position if head == portal.position else portal.position
+
+        # Apply snake's direction to new position
+        self.snake.positions[0] = exit_pos
+        return exit_pos
+
+    def die(self, cause, events):
+        self.game_over = True
+        self.death_cause = cause
+        events.append({'type': 'died', 'pos': self.snake.head(), 'cause': cause})
+        return events
+
+    def step(self):
+        events = []
+        if self.game_over:
+            return events
+        self.tick += 1
+
+        # Update mines, the ones whose timers still run
+        if self.ticking:
+            for i, mine in list(self.ticking.items()):
+                mine.update()
+                if not mine.ticking():
+                    del self.ticking[i]
+
+        # Update combo timer
+        if self.combo_timer > 0:
+            self.combo_timer -= 1
+        else:
+            self.combo_counter = 0
+
+        # Move snake
+        self.snake.move()
+
+        # Check portal teleportation
+        exit_pos = self.check_portal_collision()
+        head = self.snake.head()
+        if exit_pos is not None:
+            events.append({'type': 'teleport', 'pos': exit_pos})
+        else:
+            hazard = self.hazards.get(head)
+            # Check for collisions with mines
+            if isinstance(hazard, Mine) and hazard.explosion_timer == 0:
+                mine = hazard
+                if self.snake.shield_active:
+                    # Shield protects from mines
+                    self.snake.shield_active = False
+                    events.append({'type': 'shield_break', 'pos': head})
+                else:
+                    # Mine explosion
+                    self.explosion_cells = mine.explode()
+                    self.ticking[self.mines.index(mine)] = mine  # Rare: it ends the game
+                    events.append({'type': 'explosion', 'pos': mine.position,
+                                   'cells': self.explosion_cells})
+
+                    # Check if snake is in explosion radius
+                    if head in self.blast:
+                        return self.die('explosion', events)
+
+            # Check for collision with explosion cells
+            if head in self.blast and not self.snake.shield_active:
+                return self.die('explosion', events)
+
+            # Check for self collision or obstacle collision
+            if not self.snake.shield_active:
+                if self.snake.collides_self():
+                    return self.die('self', events)
+                if hazard is OBSTACLE:
+                    return self.die('obstacle', events)
+
+        # Food collision
+        if head == self.food.position:
+            self.snake.grow()
+
+            # Calculate score with combo multiplier
+            combo_multiplier = min(5, max(1, self.combo_counter))
+            base_points = 2 if self.food.power else 1
+            if self.food.shield:
+                base_points = 3
+                self.snake.activate_shield()
+
+            gained = base_points * combo_multiplier
+            self.score += gained
+            events.append({'type': 'ate', 'pos': head, 'food': self.food,
+                           'gained': gained})
+
+            # Spawn obstacles based on score
+            if self.score % 5 == 0 and len(self.obstacles) < 30:
+                self.spawn_obstacle()
+
+            # Maybe spawn a mine based on difficulty
+            if self.rng.random() < Settings.DIFFICULTY_MINE_CHANCE[self.difficulty]:
+                self.spawn_mine()
+
+            self.speed = self.base_speed()
+
+            # Decide what kind of food to spawn next
+            power = self.rng.random() < 0.15
+            shield = self.rng.random() < 0.1
+
+            self.free_cells.release(self.food.position)
+            if shield:
+                self.food = self.food_class(power=False, shield=True)
+            else:
+                self.food = self.food_class(power=power, shield=False)
+
+            self.food.randomize(self.free_cells, self.rng)
+
+            if power:
+                self.power_timer = 120  # ~3-4 seconds
+                self.speed = max(self.speed - 5, 5)
+
+        # Power timer
+        if self.power_timer:
+            self.power_timer -= 1
+            if self.power_timer == 0:
+                self.speed = self.base_speed()
+
+        self.elapsed_ms += 1000.0 / self.speed
+        return events
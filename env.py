@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+'''
+CyberSnake - Gym-style environment for training agents.
+SnakeEnv plays one engine.Engine game behind the Gymnasium API:
+reset(seed) -> (obs, info) and step(action) -> (obs, reward, terminated,
+truncated, info). Actions index engine.DIRECTIONS (up, right, down, left),
+as in BatchEngine; a reverse turn is ignored like a player's would be.
+The reward is the score gained by the step.
+Observations are float32 grids, one channel per entry of CHANNELS:
+  body        1 on every snake cell
+  head        1 on the head
+  food        1 food, 2 power food, 3 shield food
+  obstacles   1 on every obstacle
+  mines       1 for an armed mine, plus the arming ticks left / 200
+  portals     pair number + 1 on both ends of each pair
+  explosion   1 on the cells of a blast
+They are written in place into one buffer, only where something changed
+since the last step, and step() returns that same buffer every time: copy
+it to keep it. With view=N the observation is instead the N x N window
+centered on the head (N odd), wrapped around the board's edges.
+render_mode 'human' or 'rgb_array' steps the game through gioco.Game and
+draws it with Game.render(); these games set no records.
+If gymnasium is installed, SnakeEnv is a gymnasium.Env with its spaces.
+Dipendenze: numpy (pip install numpy)
+'''
+import os
+
+import numpy as np
+
+from engine import DIRECTIONS, Engine, Settings
+
+try:
+    import gymnasium
+    from gymnasium import spaces
+except ImportError:  # Same API, no spaces
+    gymnasium = None
+
+CHANNELS = ('body', 'head', 'food', 'obstacles', 'mines', 'portals', 'explosion')
+BODY, HEAD, FOOD, OBSTACLES, MINES, PORTALS, EXPLOSION = range(len(CHANNELS))
+MINE_TIMER = 200  # Longest arming timer of a new mine
+
+
+class SnakeEnv(gymnasium.Env if gymnasium else object):
+    metadata = {'render_modes': ['human', 'rgb_array'], 'render_fps': Settings.MAX_FPS}
+
+    def __init__(self, difficulty='medium', view=None, max_steps=10000, render_mode=None):
+        if view is not None and view % 2 == 0:
+            raise ValueError(f'view must be odd to center the head, got {view}')
+        if render_mode not in (None, 'human', 'rgb_array'):
+            raise ValueError(f'unknown render_mode {render_mode!r}')
+        self.difficulty = difficulty
+        self.view = view
+        self.max_steps = max_steps
+        self.render_mode = render_mode
+        self.width, self.height = Settings.GRID_W, Settings.GRID_H
+        self.grid = np.zeros((len(CHANNELS), self.height, self.width), np.float32)
+        self.flat = self.grid.reshape(len(CHANNELS), -1)  # Same memory, indexed by y * width + x
+        if view is None:
+            self.obs = self.grid
+        else:
+            # Cells of the window: its row starts for each head row, its
+            # columns for each head column, summed once per step
+            offsets = np.arange(view) - view // 2
+            self.window_rows = (np.arange(self.height)[:, None] + offsets) % self.height * self.width
+            self.window_cols = (np.arange(self.width)[:, None] + offsets) % self.width
+            self.window = np.empty((view, view), np.intp)
+            self.obs = np.empty((len(CHANNELS), view, view), np.float32)
+        if gymnasium:
+            side = self.obs.shape[1:]
+            self.observation_space = spaces.Box(0.0, 3.0, (len(CHANNELS), *side), np.float32)
+            self.action_space = spaces.Discrete(len(DIRECTIONS))
+
+        self.game = None
+        if render_mode is not None:
+            if render_mode == 'rgb_array':
+                os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+            from gioco import Game  # Opens the window
+            self.game = Game(lazy=True)
+            self.engine = self.game.engine
+        else:
+            self.engine = Engine(difficulty)
+
+    def reset(self, seed=None, options=None):
+        if self.game is not None:
+            self.game.difficulty = self.difficulty
+            self.game.reset(seed)
+            self.game.practice = True  # Agents set no records
+        else:
+            self.engine.reset(self.difficulty, seed)
+        self.counts = np.frombuffer(self.engine.snake.positions.counts, np.uint8)
+        self.write_full()
+        return self.observe(), self.info()
+
+    def step(self, action):
+        engine = self.engine
+        direction = DIRECTIONS[action]
+        score = engine.score
+        if self.game is not None:
+            if direction != engine.snake.direction:
+                self.game.steer(direction)
+            self.game.update()
+        else:
+            if direction != engine.snake.direction:
+                engine.turn(direction)
+            engine.step()
+        self.write_changes()
+        truncated = engine.tick >= self.max_steps and not engine.game_over
+        return self.observe(), engine.score - score, engine.game_over, truncated, self.info()
+
+    def info(self):
+        engine = self.engine
+        return {'score': engine.score, 'tick': engine.tick, 'length': len(engine.snake.positions),
+                'shield': engine.snake.shield_timer if engine.snake.shield_active else 0,
+                'cause': engine.death_cause}
+
+    def cell(self, pos):
+        return pos[1] * self.width + pos[0]
+
+    def write_full(self):
+        # Every channel from scratch, and what write_changes() compares against
+        engine, flat = self.engine, self.flat
+        self.grid.fill(0)
+        np.minimum(self.counts, 1, out=flat[BODY], casting='unsafe')
+        for pos in engine.obstacles:
+            flat[OBSTACLES, self.cell(pos)] = 1
+        for mine in engine.mines:
+            self.write_mine(mine)
+        self.arming = [mine for mine in engine.mines if not mine.active]
+        for portal in engine.portals:
+            flat[PORTALS, self.cell(portal.position)] = portal.id + 1
+            flat[PORTALS, self.cell(portal.pair_position)] = portal.id + 1
+        for pos in engine.blast:
+            flat[EXPLOSION, self.cell(pos)] = 1
+        self.head = self.cell(engine.snake.head())
+        flat[HEAD, self.head] = 1
+        self.food = engine.food
+        self.write_food(1)
+        self.obstacle_count, self.mine_count = len(engine.obstacles), len(engine.mines)
+        self.blast_cells = engine.explosion_cells
+
+    def write_changes(self):
+        # Obstacles and mines only ever get appended while playing, and only
+        # the mines still arming change value
+        engine, flat = self.engine, self.flat
+        np.minimum(self.counts, 1, out=flat[BODY], casting='unsafe')
+        flat[HEAD, self.head] = 0
+        self.head = self.cell(engine.snake.head())
+        flat[HEAD, self.head] = 1
+        if engine.food is not self.food:
+            self.write_food(0)
+            self.food = engine.food
+            self.write_food(1)
+        for pos in engine.obstacles[self.obstacle_count:]:
+            flat[OBSTACLES, self.cell(pos)] = 1
+        self.obstacle_count = len(engine.obstacles)
+        self.arming.extend(engine.mines[self.mine_count:])
+        self.mine_count = len(engine.mines)
+        if self.arming:
+            for mine in self.arming:
+                self.write_mine(mine)
+            self.arming = [mine for mine in self.arming if not mine.active]
+        if engine.explosion_cells is not self.blast_cells:
+            flat[EXPLOSION].fill(0)
+            for pos in engine.blast:
+                flat[EXPLOSION, self.cell(pos)] = 1
+            self.blast_cells = engine.explosion_cells
+
+    def write_food(self, on):
+        food = self.food
+        if food.position is not None:
+            kind = 3 if food.shield else 2 if food.power else 1
+            self.flat[FOOD, self.cell(food.position)] = kind * on
+
+    def write_mine(self, mine):
+        timer = 0 if mine.active else mine.timer
+        self.flat[MINES, self.cell(mine.position)] = 1 + timer / MINE_TIMER
+
+    def observe(self):
+        if self.view is None:
+            return self.grid
+        # Gather the window around the head straight into the observation buffer
+        hx, hy = self.engine.snake.head()
+        np.add(self.window_rows[hy, :, None], self.window_cols[hx], out=self.window)
+        np.take(self.flat, self.window, axis=1, out=self.obs, mode='wrap')  # Never wraps, buffers less
+        return self.obs
+
+    def render(self):
+        if self.game is None:
+            return None
+        import pygame
+        self.game.animate()
+        self.game.render()
+        if self.render_mode == 'human':
+            pygame.event.pump()  # Keeps the window responsive
+            return None
+        return pygame.surfarray.array3d(self.game.screen).swapaxes(0, 1)
+
+    def close(self):
+        if self.game is not None:
+            import pygame
+            self.game.writer.close()
+            pygame.quit()
+            self.game = None
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+'''
+CyberSnake - Rendering caches.
+Surfaces that are expensive to build and cheap to keep: fonts by size,
+rendered text by (text, size, color), nebula gradient sprites, entity
+glow halos and the line colors of the menu grid animation.
+'''
+import math
+from collections import OrderedDict
+
+import pygame
+
+from engine import Settings
+
+
+class TextCache:
+    '''
+    Fonts keyed by size and rendered text surfaces keyed by (text, size, color).
+    Cached surfaces are shared: callers must not draw on them or change
+    their alpha.
+    '''
+    def __init__(self, font_name=None, max_surfaces=None):
+        self.font_name = font_name or Settings.FONT_NAME
+        self.max_surfaces = max_surfaces or Settings.TEXT_CACHE_SIZE
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.Font(self.font_name, size)
+        return font
+
+    def render(self, text, size, color):
+        key = (text, size, tuple(color))
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surf
+        self.misses += 1
+        surf = self.surfaces[key] = self.font(size).render(text, True, color)
+        if len(self.surfaces) > self.max_surfaces:
+            self.surfaces.popitem(last=False)
+        return surf
+
+
+class GradientSprites:
+    '''
+    Radial gradients (concentric alpha circles 20px apart) baked once per
+    quantized radius and color, then blitted centered where needed.
+    Sprites are evicted least-recently-used first past memory_mb.
+    '''
+    def __init__(self, memory_mb=None, radius_step=None):
+        self.memory_limit = (memory_mb or Settings.BAKE_MEMORY_MB) * 1024 * 1024
+        self.radius_step = radius_step or Settings.NEBULA_RADIUS_STEP
+        self.sprites = OrderedDict()
+        self.memory = 0
+
+    def get(self, radius, color, max_alpha, scale):
+        radius = max(self.radius_step, round(radius / self.radius_step) * self.radius_step)
+        key = (radius, tuple(color[:3]), max_alpha, scale)
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            return sprite
+        sprite = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+        for r in range(radius, 0, -20):
+            alpha = max(0, min(max_alpha, int(scale * (r / radius))))
+            pygame.draw.circle(sprite, (*color[:3], alpha), (radius, radius), r)
+        self.sprites[key] = sprite
+        self.memory += radius * radius * 16
+        while self.memory > self.memory_limit and len(self.sprites) > 1:
+            (old_radius, *_), _ = self.sprites.popitem(last=False)
+            self.memory -= old_radius * old_radius * 16
+        return sprite
+
+    def draw(self, target, center, radius, color, max_alpha, scale):
+        sprite = self.get(radius, color, max_alpha, scale)
+        half = sprite.get_width() // 2
+        target.blit(sprite, (center[0] - half, center[1] - half))
+
+
+class GlowSprites:
+    '''
+    Soft glow halos, baked once per shape, size and color and queued for one
+    additive (BLEND_RGB_ADD) batch blit. Entities queue their glow while
+    drawing; flush() adds it onto the target. Glow adds up where halos
+    overlap and never spreads more than Settings.GLOW_PADDING pixels past its shape.
+    '''
+    def __init__(self, padding=None):
+        self.padding = padding if padding is not None else Settings.GLOW_PADDING
+        self.sprites = {}  # Few distinct shapes are ever drawn: no eviction
+        self.queue = []
+
+    def rect(self, rect, color, width=0, border_radius=8):
+        key = ('rect', rect.width, rect.height, width, border_radius, tuple(color[:3]))
+        self.queue_sprite(key, rect.center, rect.size, pygame.draw.rect, color,
+                          pygame.Rect(self.padding, self.padding, *rect.size),
+                          width, border_radius=border_radius)
+
+    def circle(self, center, radius, color, width=0):
+        if radius < 1:
+            return
+        key = ('circle', radius, width, tuple(color[:3]))
+        r = radius + self.padding
+        self.queue_sprite(key, center, (radius * 2, radius * 2), pygame.draw.circle,
+                          color, (r, r), radius, width)
+
+    def burst(self, center, radius, angle, color, rays=8, width=2):
+        '''Rays of length radius, the first at angle degrees.'''
+        key = ('burst', radius, angle, rays, width, tuple(color[:3]))
+        if key not in self.sprites:
+            r = radius + self.padding
+            sprite = self.canvas((radius * 2, radius * 2))
+            for i in range(rays):
+                a = math.radians(angle + i * 360 / rays)
+                end = (r + int(radius * math.cos(a)), r + int(radius * math.sin(a)))
+                pygame.draw.line(sprite, color, (r, r), end, width)
+            self.sprites[key] = self.soften(sprite)
+        self.queue_at(self.sprites[key], center)
+
+    def queue_sprite(self, key, center, size, paint, *args, **kwargs):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = self.canvas(size)
+            paint(sprite, *args, **kwargs)
+            sprite = self.sprites[key] = self.soften(sprite)
+        self.queue_at(sprite, center)
+
+    def queue_at(self, sprite, center):
+        w, h = sprite.get_size()
+        self.queue.append((sprite, (center[0] - w // 2, center[1] - h // 2),
+                           None, pygame.BLEND_RGB_ADD))
+
+    def canvas(self, size):
+        # Black adds nothing, so sprites need no alpha channel
+        surf = pygame.Surface((size[0] + self.padding * 2, size[1] + self.padding * 2))
+        surf.fill((0, 0, 0))
+        return surf
+
+    @staticmethod
+    def soften(surf):
+        # Downscale and back: a cheap blur, paid once per sprite
+        w, h = surf.get_size()
+        small = pygame.transform.smoothscale(surf, (max(1, w // 2), max(1, h // 2)))
+        return pygame.transform.smoothscale(small, (w, h))
+
+    def flush(self, target):
+        target.blits(self.queue, doreturn=False)
+        self.queue = []
+
+
+class CyberGrid:
+    '''
+    The menu's animated grid. Line colors are baked for `phases` steps of the
+    2*pi second cycle, all up front or (eager=False) each on first use;
+    drawing a frame is one fill of a 1px-wide rect per line.
+    '''
+    def __init__(self, width, height, spacing=40, phases=None, eager=True):
+        self.phases = phases or Settings.GRID_PHASES
+        xs = range(0, width, spacing)
+        ys = range(0, height, spacing)
+        self.lines = ([pygame.Rect(x, 0, 1, height) for x in xs] +
+                      [pygame.Rect(0, y, width, 1) for y in ys])
+        self.offsets = [x / 50 for x in xs] + [y / 50 for y in ys]
+
+        self.palettes = [None] * self.phases
+        if eager:
+            for p in range(self.phases):
+                self.palette(p)
+
+    def palette(self, p):
+        palette = self.palettes[p]
+        if palette is None:
+            t = 2 * math.pi * p / self.phases
+            palette = self.palettes[p] = []
+            for offset in self.offsets:
+                intensity = int(20 + 10 * math.sin(offset + t))
+                palette.append((intensity, int(intensity * 1.5), intensity * 2))
+        return palette
+
+    def draw(self, target, current_time):
+        phase = int(current_time / (2 * math.pi) * self.phases) % self.phases
+        for color, line in zip(self.palette(phase), self.lines):
+            target.fill(color, line)
@@ -5,173 +5,103 @@ Autore: ChatGPT
 Dipendenze: pygame (pip install pygame)
 Esegui: python gioco.py
 '''
+import argparse
 import pygame
 import random
 import os
 import math
+import sys
+import threading
 import time
-from collections import deque
-
-
-class Settings:
-    GRID_SIZE = 20
-    GRID_W = 30
-    GRID_H = 30
-    WIDTH = GRID_SIZE * GRID_W
-    HEIGHT = GRID_SIZE * GRID_H + 60  # Space for HUD
-    FPS_EASY = 6
-    FPS_MEDIUM = 8
-    FPS_HARD = 12
-    MAX_FPS = 25
-    COLORS = {
-        'bg': (10, 10, 25),  # Darker blue background
-        'grid': (20, 35, 45),  # More visible grid
-        'snake_head': (0, 255, 255),
-        'snake_body': (0, 200, 200),
-        'food': (0, 255, 128),
-        'power': (255, 0, 255),
-        'obst': (255, 64, 64),
-        'portal': (128, 0, 255),
-        'mine': (255, 215, 0),
-        'shield': (64, 224, 208),
-        'hud': (200, 200, 200),
-        'menu_bg': (15, 15, 35),
-        'menu_select': (0, 255, 255),
-        'menu_text': (220, 220, 220),
-        'particle': (255, 255, 255, 150),  # Semi-transparent white for particles
-        'bg_glow': (20, 40, 80, 50),  # Background glow effect
-        'title_glow': (0, 180, 255),  # Glowing title effect
-    }
-    FONT_NAME = 'freesansbold.ttf'
-    HIGHSCORE_FILE = 'highscore.txt'
-    DIFFICULTY_OBSTACLES = {
-        'easy': 3,
-        'medium': 8,
-        'hard': 15
-    }
-    DIFFICULTY_MINE_CHANCE = {
-        'easy': 0.0,
-        'medium': 0.1,
-        'hard': 0.2
-    }
-    DIFFICULTY_PORTAL_COUNT = {
-        'easy': 0,
-        'medium': 1,
-        'hard': 2
-    }
-    
-    # Sound settings
-    SOUNDS = {
-        'eat': 'eat.wav',
-        'game_over': 'game_over.wav',
-        'teleport': 'teleport.wav',
-        'shield': 'shield.wav',
-        'explosion': 'explosion.wav',
-        'menu_select': 'menu_select.wav',
-        'menu_confirm': 'menu_confirm.wav',
-    }
-    MUSIC = 'background_music.mp3'
-    
-    # Visual effects settings
-    PARTICLE_COUNT = 50
-    PARTICLE_SPEED = 1.5
-    PARTICLE_LIFETIME = 200
-    
-    # Menu animations
-    MENU_PULSE_SPEED = 0.02
-    TITLE_GLOW_SPEED = 0.03
-    
-    # Background effects
-    BG_STARS_COUNT = 100
-    BG_NEBULA_COUNT = 3
-
-
-class Snake:
-    def __init__(self):
-        self.reset()
 
-    def reset(self):
-        self.positions = deque([(Settings.GRID_W // 2, Settings.GRID_H // 2)])
-        self.direction = random.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
-        self.grow_pending = 2
-        self.shield_active = False
-        self.shield_timer = 0
-
-    def head(self):
-        return self.positions[0]
-
-    def turn(self, dir):
-        # Prevent reverse movement
-        if (dir[0] * -1, dir[1] * -1) == self.direction:
+import engine
+from autopilot import Autopilot
+from camera import Camera, ChunkGrid
+from engine import OBSTACLE, Settings
+from gfx import CyberGrid, GlowSprites, GradientSprites, TextCache
+from leaderboard import BackgroundWriter, Leaderboard
+from pacing import FixedStep, FramePacer, ticks
+from profiler import Profiler
+from replay import Replay
+from rewind import Rewind
+import verify
+from particles import create_particle_system
+
+
+class Snake(engine.Snake):
+    def draw(self, surf, glow, camera, motion=None, blend=1.0):
+        segments = self.visible_segments(camera) if camera.scrolling else self.positions[1:]
+        for pos in segments:
+            self.draw_segment(surf, glow, pos, False, camera)
+        self.draw_ends(surf, glow, camera, motion, blend)
+
+    def visible_segments(self, camera):
+        # Body cells in view, read off the per-cell counts row by row: the cost
+        # follows the size of the view, not the length of the snake
+        body = self.positions
+        counts, width = body.counts, body.width
+        head = body.head()
+        x0, y0, cols, rows = camera.visible_cells()
+        runs = [(x0, min(x0 + cols, width))]
+        if x0 + cols > width:  # Across the wrap
+            runs.append((0, x0 + cols - width))
+        segments = []
+        for j in range(rows):
+            y = (y0 + j) % camera.grid_h
+            row = y * width
+            for start, end in runs:
+                cells = counts[row + start:row + end]
+                if cells.count(0) == len(cells):
+                    continue
+                for i, n in enumerate(cells):
+                    if n and (start + i, y) != head:
+                        segments.append((start + i, y))
+        return segments
+
+    def draw_ends(self, surf, glow, camera, motion=None, blend=1.0):
+        # Head and the tail cell it freed, slid blend of the way through the last tick.
+        # motion is (head, tail) before that tick; jumps (portals, wrapping) are not slid.
+        head = self.head()
+        if motion is not None:
+            old_head, old_tail = motion
+            tail = self.positions[-1]
+            if old_tail not in self.positions and self.adjacent(old_tail, tail):
+                self.draw_segment(surf, glow, self.lerp(old_tail, tail, blend), False, camera)
+            if self.adjacent(old_head, head):
+                head = self.lerp(old_head, head, blend)
+        self.draw_segment(surf, glow, head, True, camera)
+
+    @staticmethod
+    def adjacent(a, b):
+        return abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1
+
+    @staticmethod
+    def lerp(a, b, t):
+        return (a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t)
+
+    def draw_segment(self, surf, glow, pos, is_head, camera):
+        at = camera.to_screen(pos)
+        if at is None:
             return
-        self.direction = dir
-
-    def move(self):
-        x, y = self.head()
-        dx, dy = self.direction
-        new_head = ((x + dx) % Settings.GRID_W, (y + dy) % Settings.GRID_H)
-        if self.grow_pending:
-            self.grow_pending -= 1
-        else:
-            self.positions.pop()
-        self.positions.appendleft(new_head)
-
-        # Update shield timer
-        if self.shield_active:
-            self.shield_timer -= 1
-            if self.shield_timer <= 0:
-                self.shield_active = False
-
-    def grow(self, n=1):
-        self.grow_pending += n
-
-    def activate_shield(self, duration=150):
-        self.shield_active = True
-        self.shield_timer = duration
-
-    def collides_self(self):
-        return self.head() in list(self.positions)[1:]
-
-    def draw(self, surf, glow_layer):
-        for i, pos in enumerate(self.positions):
-            px, py = pos
-            rect = pygame.Rect(px * Settings.GRID_SIZE, py * Settings.GRID_SIZE,
-                               Settings.GRID_SIZE, Settings.GRID_SIZE)
-            color = Settings.COLORS['snake_head'] if i == 0 else Settings.COLORS['snake_body']
-            pygame.draw.rect(surf, color, rect)
-            
-            # Add shield effect if active
-            if i == 0 and self.shield_active:
-                shield_rect = rect.inflate(8, 8)
-                pygame.draw.rect(surf, Settings.COLORS['shield'], shield_rect, 2, border_radius=6)
-                pygame.draw.rect(glow_layer, Settings.COLORS['shield'], shield_rect.inflate(4, 4), 3, border_radius=8)
-            
-            pygame.draw.rect(glow_layer, color, rect.inflate(6, 6), border_radius=8)
+        rect = pygame.Rect(at[0], at[1], Settings.GRID_SIZE, Settings.GRID_SIZE)
+        color = Settings.COLORS['snake_head'] if is_head else Settings.COLORS['snake_body']
+        pygame.draw.rect(surf, color, rect)
+        
+        # Add shield effect if active
+        if is_head and self.shield_active:
+            shield_rect = rect.inflate(8, 8)
+            pygame.draw.rect(surf, Settings.COLORS['shield'], shield_rect, 2, border_radius=6)
+            glow.rect(shield_rect.inflate(4, 4), Settings.COLORS['shield'], 3, border_radius=8)
+        
+        glow.rect(rect.inflate(6, 6), color, border_radius=8)
 
 
-class Food:
+class Food(engine.Food):
     def __init__(self, power=False, shield=False):
-        self.power = power
-        self.shield = shield
-        
-        if shield:
-            self.color = Settings.COLORS['shield']
-        elif power:
-            self.color = Settings.COLORS['power']
-        else:
-            self.color = Settings.COLORS['food']
-            
-        self.position = (0, 0)
+        super().__init__(power, shield)
         self.pulse = 0
         self.pulse_dir = 1
 
-    def randomize(self, occupied):
-        while True:
-            p = (random.randint(0, Settings.GRID_W - 1), random.randint(0, Settings.GRID_H - 1))
-            if p not in occupied:
-                self.position = p
-                break
-
     def update(self):
         # Pulsating effect
         self.pulse += 0.1 * self.pulse_dir
@@ -180,208 +110,90 @@ class Food:
         elif self.pulse <= 0.0:
             self.pulse_dir = 1
 
-    def draw(self, surf, glow_layer):
-        px, py = self.position
-        rect = pygame.Rect(px * Settings.GRID_SIZE, py * Settings.GRID_SIZE,
-                           Settings.GRID_SIZE, Settings.GRID_SIZE)
+    def draw(self, surf, glow, camera):
+        if self.position is None:  # Board full, nowhere to put food
+            return
+        at = camera.to_screen(self.position)
+        if at is None:
+            return
+        rect = pygame.Rect(at[0], at[1], Settings.GRID_SIZE, Settings.GRID_SIZE)
         pygame.draw.rect(surf, self.color, rect)
         
-        # Add pulsating glow effect
-        pulse_size = 6 + int(4 * self.pulse)
-        pygame.draw.rect(glow_layer, self.color, rect.inflate(pulse_size, pulse_size), border_radius=8)
-
-
-class Mine:
-    def __init__(self):
-        self.position = (0, 0)
-        self.timer = 0
-        self.active = False
-        self.explosion_radius = 1
-        self.explosion_timer = 0
-
-    def randomize(self, occupied):
-        while True:
-            p = (random.randint(0, Settings.GRID_W - 1), random.randint(0, Settings.GRID_H - 1))
-            if p not in occupied:
-                self.position = p
-                self.timer = random.randint(100, 200)  # Random timer before activation
-                self.active = False
-                self.explosion_timer = 0
-                break
-
-    def update(self):
-        if not self.active and self.timer > 0:
-            self.timer -= 1
-            if self.timer <= 0:
-                self.active = True
-        
-        if self.explosion_timer > 0:
-            self.explosion_timer -= 1
+        # Add pulsating glow effect, in three sizes so each has one cached sprite
+        pulse_size = 6 + 2 * round(2 * self.pulse)
+        glow.rect(rect.inflate(pulse_size, pulse_size), self.color, border_radius=8)
 
-    def explode(self):
-        self.explosion_timer = 20  # Duration of explosion animation
-        return self.get_explosion_cells()
-    
-    def get_explosion_cells(self):
-        cells = []
-        x, y = self.position
-        radius = self.explosion_radius
-        
-        for dx in range(-radius, radius + 1):
-            for dy in range(-radius, radius + 1):
-                if dx * dx + dy * dy <= radius * radius + radius:  # Circle-ish shape
-                    nx, ny = (x + dx) % Settings.GRID_W, (y + dy) % Settings.GRID_H
-                    cells.append((nx, ny))
-        
-        return cells
 
-    def draw(self, surf, glow_layer):
-        px, py = self.position
-        rect = pygame.Rect(px * Settings.GRID_SIZE, py * Settings.GRID_SIZE,
-                          Settings.GRID_SIZE, Settings.GRID_SIZE)
-        
+class Mine(engine.Mine):
+    def draw(self, surf, glow, camera):
         if self.explosion_timer > 0:
             # Draw explosion
             explosion_cells = self.get_explosion_cells()
             for cell in explosion_cells:
-                ex, ey = cell
-                explosion_rect = pygame.Rect(ex * Settings.GRID_SIZE, ey * Settings.GRID_SIZE,
-                                           Settings.GRID_SIZE, Settings.GRID_SIZE)
+                at = camera.to_screen(cell)
+                if at is None:
+                    continue
+                explosion_rect = pygame.Rect(at[0], at[1], Settings.GRID_SIZE, Settings.GRID_SIZE)
                 intensity = min(255, 100 + 155 * (self.explosion_timer / 20))
                 color = (intensity, intensity * 0.6, 0)
                 pygame.draw.rect(surf, color, explosion_rect)
-                pygame.draw.rect(glow_layer, (255, 200, 0), explosion_rect.inflate(10, 10), border_radius=8)
+                glow.rect(explosion_rect.inflate(10, 10), (255, 200, 0), border_radius=8)
         else:
+            at = camera.to_screen(self.position)
+            if at is None:
+                return
+            rect = pygame.Rect(at[0], at[1], Settings.GRID_SIZE, Settings.GRID_SIZE)
+
             # Draw mine
             color = Settings.COLORS['mine']
             if self.active:
                 # Blinking effect when active
-                if pygame.time.get_ticks() % 1000 < 500:
+                if ticks() % 1000 < 500:
                     color = (255, 0, 0)
             
             pygame.draw.rect(surf, color, rect)
-            pygame.draw.rect(glow_layer, color, rect.inflate(6, 6), border_radius=8)
+            glow.rect(rect.inflate(6, 6), color, border_radius=8)
             
             # Draw X shape inside mine
             pygame.draw.line(surf, (20, 20, 20), 
-                           (px * Settings.GRID_SIZE + 5, py * Settings.GRID_SIZE + 5),
-                           (px * Settings.GRID_SIZE + Settings.GRID_SIZE - 5, 
-                            py * Settings.GRID_SIZE + Settings.GRID_SIZE - 5), 2)
+                           (rect.left + 5, rect.top + 5), (rect.right - 5, rect.bottom - 5), 2)
             pygame.draw.line(surf, (20, 20, 20), 
-                           (px * Settings.GRID_SIZE + Settings.GRID_SIZE - 5, py * Settings.GRID_SIZE + 5),
-                           (px * Settings.GRID_SIZE + 5, 
-                            py * Settings.GRID_SIZE + Settings.GRID_SIZE - 5), 2)
+                           (rect.right - 5, rect.top + 5), (rect.left + 5, rect.bottom - 5), 2)
 
 
-class Portal:
+class Portal(engine.Portal):
     def __init__(self, id=0):
-        self.id = id
-        self.position = (0, 0)
-        self.pair_position = (0, 0)
-        self.color = Settings.COLORS['portal']
+        super().__init__(id)
         self.angle = 0
 
-    def randomize(self, occupied):
-        while True:
-            p1 = (random.randint(0, Settings.GRID_W - 1), random.randint(0, Settings.GRID_H - 1))
-            if p1 not in occupied:
-                self.position = p1
-                occupied.add(p1)
-                break
-                
-        while True:
-            p2 = (random.randint(0, Settings.GRID_W - 1), random.randint(0, Settings.GRID_H - 1))
-            if p2 not in occupied and p2 != self.position:
-                self.pair_position = p2
-                break
-
     def update(self):
         self.angle = (self.angle + 3) % 360
 
-    def draw(self, surf, glow_layer):
+    def draw(self, surf, glow, camera):
         for pos in [self.position, self.pair_position]:
-            px, py = pos
-            rect = pygame.Rect(px * Settings.GRID_SIZE, py * Settings.GRID_SIZE,
-                              Settings.GRID_SIZE, Settings.GRID_SIZE)
-            
-            # Draw portal
-            center = rect.center
-            radius = Settings.GRID_SIZE // 2
-            pygame.draw.circle(surf, self.color, center, radius)
-            
-            # Draw rotating dots inside portal
-            dot_count = 4
-            for i in range(dot_count):
-                angle = math.radians(self.angle + (360 / dot_count) * i)
-                dot_x = center[0] + int(radius * 0.6 * math.cos(angle))
-                dot_y = center[1] + int(radius * 0.6 * math.sin(angle))
-                pygame.draw.circle(surf, (255, 255, 255), (dot_x, dot_y), 2)
-            
-            # Add glow effect
-            pygame.draw.circle(glow_layer, self.color, center, radius + 4)
-
-
-class Particle:
-    def __init__(self, x, y, color, size=2, lifetime=None, speed=None, direction=None):
-        self.x = x
-        self.y = y
-        self.color = color
-        self.size = size
-        self.lifetime = lifetime or random.randint(50, Settings.PARTICLE_LIFETIME)
-        self.max_lifetime = self.lifetime
-        self.speed = speed or random.uniform(0.5, Settings.PARTICLE_SPEED)
-        
-        # Random direction if none provided
-        if direction is None:
-            angle = random.uniform(0, math.pi * 2)
-            self.dx = math.cos(angle) * self.speed
-            self.dy = math.sin(angle) * self.speed
-        else:
-            self.dx = direction[0] * self.speed
-            self.dy = direction[1] * self.speed
-            
-        # For some visual variations
-        self.pulse_rate = random.uniform(0.03, 0.08)
-        self.pulse = random.uniform(0, 1)
-        self.pulse_dir = 1
-
-    def update(self):
-        self.lifetime -= 1
-        self.x += self.dx
-        self.y += self.dy
-        
-        # Slow down over time
-        self.dx *= 0.98
-        self.dy *= 0.98
-        
-        # Pulsate size
-        self.pulse += self.pulse_rate * self.pulse_dir
-        if self.pulse >= 1:
-            self.pulse_dir = -1
-        elif self.pulse <= 0:
-            self.pulse_dir = 1
-        
-        return self.lifetime > 0
+            self.draw_end(surf, glow, pos, camera)
 
-    def draw(self, surface):
-        # Get alpha based on remaining lifetime
-        alpha = int(255 * (self.lifetime / self.max_lifetime))
+    def draw_end(self, surf, glow, pos, camera):
+        at = camera.to_screen(pos)
+        if at is None:
+            return
+        rect = pygame.Rect(at[0], at[1], Settings.GRID_SIZE, Settings.GRID_SIZE)
         
-        # Get size with pulse effect
-        current_size = self.size * (0.8 + 0.4 * self.pulse) 
+        # Draw portal
+        center = rect.center
+        radius = Settings.GRID_SIZE // 2
+        pygame.draw.circle(surf, self.color, center, radius)
         
-        # Create a surface for this particle with alpha
-        if isinstance(self.color, tuple) and len(self.color) == 4:
-            # If color already has alpha
-            particle_color = (self.color[0], self.color[1], self.color[2], 
-                             min(self.color[3], alpha))
-        else:
-            # Add alpha to the color
-            particle_color = (*self.color[:3], alpha)
+        # Draw rotating dots inside portal
+        dot_count = 4
+        for i in range(dot_count):
+            angle = math.radians(self.angle + (360 / dot_count) * i)
+            dot_x = center[0] + int(radius * 0.6 * math.cos(angle))
+            dot_y = center[1] + int(radius * 0.6 * math.sin(angle))
+            pygame.draw.circle(surf, (255, 255, 255), (dot_x, dot_y), 2)
         
-        # Draw on surface
-        pygame.draw.circle(surface, particle_color, 
-                         (int(self.x), int(self.y)), int(current_size))
+        # Add glow effect
+        glow.circle(center, radius + 4, self.color)
 
 
 class BackgroundStar:
@@ -404,7 +216,8 @@ class BackgroundStar:
 
     def draw(self, surface):
         # Calculate current brightness
-        current_brightness = 0.3 + 0.7 * self.brightness * self.pulse
+        # The pulse overshoots 1 by up to one step before turning back
+        current_brightness = min(1.0, 0.3 + 0.7 * self.brightness * self.pulse)
         color = (int(255 * current_brightness), 
                 int(255 * current_brightness), 
                 int(255 * current_brightness))
@@ -414,13 +227,21 @@ class BackgroundStar:
 
 
 class SoundManager:
-    def __init__(self):
-        # Initialize mixer
-        pygame.mixer.init()
+    def __init__(self, load=True):
         self.sounds = {}
+        self.ready = False  # Until load() is done, sounds are skipped and music is deferred
+        self.music_pending = None
+        self.lock = threading.Lock()  # load() may run on another thread
         self.music_playing = False
         self.sound_enabled = True
         self.music_enabled = True
+        if load:
+            self.load()
+
+    def load(self):
+        # Initialize mixer
+        pygame.mixer.init()
+        sounds = {}
         
         # Try to load sounds
         try:
@@ -428,7 +249,7 @@ class SoundManager:
                 try:
                     sound_path = os.path.join('sounds', file)
                     if os.path.exists(sound_path):
-                        self.sounds[name] = pygame.mixer.Sound(sound_path)
+                        sounds[name] = pygame.mixer.Sound(sound_path)
                 except:
                     print(f"Could not load sound: {file}")
             
@@ -438,6 +259,12 @@ class SoundManager:
                 pygame.mixer.music.load(music_path)
         except:
             print("Error initializing sound system")
+        with self.lock:
+            self.sounds = sounds
+            self.ready = True
+            pending, self.music_pending = self.music_pending, None
+        if pending is not None:
+            self.play_music(*pending)
     
     def play(self, sound_name, volume=1.0):
         if not self.sound_enabled or sound_name not in self.sounds:
@@ -449,6 +276,11 @@ class SoundManager:
     def play_music(self, volume=0.5, loop=-1):
         if not self.music_enabled:
             return
+        with self.lock:
+            if not self.ready:
+                self.music_pending = (volume, loop)
+                self.music_playing = True  # As far as the game is concerned
+                return
             
         try:
             pygame.mixer.music.set_volume(volume)
@@ -458,7 +290,9 @@ class SoundManager:
             print("Could not play music")
     
     def stop_music(self):
-        pygame.mixer.music.stop()
+        self.music_pending = None
+        if self.ready:
+            pygame.mixer.music.stop()
         self.music_playing = False
     
     def toggle_sound(self):
@@ -474,34 +308,75 @@ class SoundManager:
         return self.music_enabled
 
 
+class GameEngine(engine.Engine):
+    snake_class = Snake
+    food_class = Food
+    mine_class = Mine
+    portal_class = Portal
+
+
 class Game:
-    def __init__(self):
-        pygame.init()
+    def __init__(self, profile_csv=None, profile_trace=None, lazy=Settings.LAZY_STARTUP, demo=False):
+        # Lazy startup brings up only what the first menu frame needs; audio
+        # loads on a thread and the nebula sprites are baked on first use
+        if lazy:
+            pygame.display.init()
+            pygame.font.init()
+        else:
+            pygame.init()
         self.screen = pygame.display.set_mode((Settings.WIDTH, Settings.HEIGHT))
         pygame.display.set_caption('CyberSnake')
-        self.clock = pygame.time.Clock()
-        self.font = pygame.font.Font(Settings.FONT_NAME, 24)
-        self.medium_font = pygame.font.Font(Settings.FONT_NAME, 32)
-        self.big_font = pygame.font.Font(Settings.FONT_NAME, 48)
+        # Rendering runs at its own paced rate; ticks and animations are fixed steps
+        self.pacer = FramePacer(Settings.RENDER_FPS)
+        self.frame_stats = None
+        self.show_frame_stats = False
+        self.tick_blend = 1.0  # How far rendering is into the current tick
+        self.frame_blend = 1.0  # How far rendering is into the current animation step
+        # Per-phase timings: F4 shows them, the files get them on quit
+        self.profiler = Profiler()
+        self.profile_csv, self.profile_trace = profile_csv, profile_trace
+        self.profiler.enabled = bool(profile_csv or profile_trace)
+        self.show_profile = False
+        self.profile_overlay = None
+        # Fonts and rendered text are cached, nothing is rebuilt per frame
+        self.text = TextCache()
+        self.font = self.text.font(24)
 
         # Create directory for sounds if it doesn't exist
         os.makedirs('sounds', exist_ok=True)
 
         # Initialize sound system
-        self.sound_manager = SoundManager()
+        self.sound_manager = SoundManager(load=not lazy)
+        self.loader = None  # Started by run() once the first frame is up
         
-        # Create surfaces
-        self.grid_surface = pygame.Surface((Settings.WIDTH, Settings.HEIGHT - 60))
+        # The window shows VIEW_W x VIEW_H cells; a bigger board scrolls under it
+        self.camera = Camera(Settings.VIEW_W, Settings.VIEW_H, Settings.GRID_W, Settings.GRID_H,
+                             Settings.GRID_SIZE)
+        self.chunks = ChunkGrid(Settings.GRID_W, Settings.GRID_H)  # What to draw, by board area
+        self.chunk_counts = None  # Obstacles and mines in chunks, None to rebuild
+
+        # Create surfaces, the grid one cell larger to scroll under the camera
+        self.grid_surface = pygame.Surface((Settings.WIDTH + Settings.GRID_SIZE,
+                                            Settings.HEIGHT - 60 + Settings.GRID_SIZE))
         self.grid_surface.set_alpha(80)
         self.create_grid()
 
-        self.glow_layer = pygame.Surface((Settings.WIDTH, Settings.HEIGHT - 60), pygame.SRCALPHA)
+        # Entity glow is queued as baked halos and added in one batch
+        self.glow = GlowSprites()
+
+        # Dirty-rectangle rendering: a frozen background and the cells to recompose
+        self.render_mode = Settings.RENDER_MODE
+        self.static_layer = pygame.Surface((Settings.WIDTH, Settings.HEIGHT - 60))
+        self.dirty_cells = set()
+        self.prev_volatile_cells = set()
+        self.dirty_all = True
         
-        # Background layer for stars and nebulae
-        self.bg_layer = pygame.Surface((Settings.WIDTH, Settings.HEIGHT), pygame.SRCALPHA)
+        # Periodic background animations, baked instead of redrawn every frame
+        self.gradients = GradientSprites()
+        self.bake_animations(Settings.BAKE_AT_STARTUP and not lazy)
         
-        # Initialize particles list
-        self.particles = []
+        # Initialize particle pool
+        self.particles = create_particle_system()
         
         # Initialize background stars
         self.stars = [BackgroundStar(Settings.WIDTH, Settings.HEIGHT) 
@@ -512,102 +387,104 @@ class Game:
         self.title_pulse_dir = 1
         self.menu_time = 0
         
-        # Load highscore and initialize game
-        self.load_highscore()
+        # Scores and replays are written on a background thread, never from the loop
+        self.writer = BackgroundWriter()
+        self.leaderboard = Leaderboard(Settings.LEADERBOARD_FILE, Settings.LEADERBOARD_SIZE,
+                                       self.writer, legacy_path=Settings.HIGHSCORE_FILE)
+        # F5 hands the snake to the autopilot; demo mode plays game after game with it
+        self.autopilot = Autopilot()
+        self.demo = demo
+        self.game_over_at = 0
         self.difficulty = 'medium'
-        self.state = 'menu'  # Always start with menu
         self.menu_option = 0
         self.reset()
-
-    def load_highscore(self):
-        try:
-            with open(Settings.HIGHSCORE_FILE, 'r') as f:
-                self.highscore = int(f.read())
-        except Exception:
-            self.highscore = 0
-
-    def save_highscore(self):
-        with open(Settings.HIGHSCORE_FILE, 'w') as f:
-            f.write(str(self.highscore))
+        # Always start with menu, reset() having left a game ready behind it; demo mode plays at once
+        self.state = 'running' if demo else 'menu'
+
+    def start_loading(self):
+        # pygame holds the GIL through the mixer setup: after the first flip, it
+        # only delays a menu frame instead of the window coming up
+        if not self.sound_manager.ready and self.loader is None:
+            self.loader = threading.Thread(target=self.load_assets, name='assets', daemon=True)
+            self.loader.start()
+
+    def load_assets(self):
+        start = time.perf_counter()
+        self.sound_manager.load()
+        print(f'Loaded {len(self.sound_manager.sounds)} sounds in the background in '
+              f'{(time.perf_counter() - start) * 1000:.0f} ms')
+
+    def record_score(self):
+        # Queue the replay and the leaderboard entry that points to it
+        self.replay.ticks = self.engine.tick
+        self.replay.score = self.engine.score
+        name = (f"{time.strftime('%Y%m%d-%H%M%S')}-{self.difficulty}-"
+                f"{self.engine.score}-{self.engine.seed:08x}.replay")
+        self.writer.write(os.path.join(Settings.REPLAY_DIR, name), self.replay.to_bytes)
+        self.leaderboard.add(self.difficulty, self.engine.score, self.engine.tick, name)
+        self.highscore = self.leaderboard.best(self.difficulty)
+
+    @staticmethod
+    def nebula_color(i):
+        color = list(Settings.COLORS['bg_glow'])
+        color[0] = (color[0] + i * 40) % 255
+        color[1] = (color[1] + i * 30) % 255
+        return color
+
+    def bake_animations(self, eager=True):
+        start = time.perf_counter()
+        self.cyber_grid = CyberGrid(Settings.WIDTH, Settings.HEIGHT, eager=eager)
+        self.menu_bg = pygame.Surface((Settings.WIDTH, Settings.HEIGHT))
+        self.menu_bg.fill(Settings.COLORS['menu_bg'])
+        self.menu_bg.set_alpha(200)
+        if eager:
+            # Every radius the menu and gameplay nebulae can take; otherwise baked on first use
+            step = self.gradients.radius_step
+            for i in range(Settings.BG_NEBULA_COUNT):
+                for radius in range(80, 121, step):
+                    self.gradients.get(radius, self.nebula_color(i), 150, 100)
+            for radius in range(120, 181, step):
+                self.gradients.get(radius, self.nebula_color(0), 40, 30)
+        self.bake_time = time.perf_counter() - start
+        if eager:
+            print(f'Baked {len(self.gradients.sprites)} nebula sprites '
+                  f'({self.gradients.memory / 1024 / 1024:.1f} MB) and {self.cyber_grid.phases} '
+                  f'grid phases in {self.bake_time * 1000:.0f} ms')
 
     def create_grid(self):
         self.grid_surface.fill((0, 0, 0))
-        for x in range(0, Settings.WIDTH, Settings.GRID_SIZE):
-            pygame.draw.line(self.grid_surface, Settings.COLORS['grid'],
-                             (x, 0), (x, Settings.HEIGHT - 60))
-        for y in range(0, Settings.HEIGHT - 60, Settings.GRID_SIZE):
-            pygame.draw.line(self.grid_surface, Settings.COLORS['grid'],
-                             (0, y), (Settings.WIDTH, y))
-
-    def reset(self):
-        self.snake = Snake()
-        self.obstacles = []
-        self.mines = []
-        self.portals = []
-        self.explosion_cells = []
-        self.score = 0
-        
-        # Set initial speed based on difficulty
-        if self.difficulty == 'easy':
-            self.speed = Settings.FPS_EASY
-        elif self.difficulty == 'medium':
-            self.speed = Settings.FPS_MEDIUM
+        width, height = self.grid_surface.get_size()
+        for x in range(0, width, Settings.GRID_SIZE):
+            pygame.draw.line(self.grid_surface, Settings.COLORS['grid'], (x, 0), (x, height))
+        for y in range(0, height, Settings.GRID_SIZE):
+            pygame.draw.line(self.grid_surface, Settings.COLORS['grid'], (0, y), (width, y))
+
+    def reset(self, seed=None):
+        # Rule state (snake, food, obstacles, mines, portals, timers) lives in the engine
+        if hasattr(self, 'engine'):
+            self.engine.reset(self.difficulty, seed)
         else:
-            self.speed = Settings.FPS_HARD
-            
-        # Generate initial obstacles based on difficulty
-        for _ in range(Settings.DIFFICULTY_OBSTACLES[self.difficulty]):
-            self.spawn_obstacle()
-            
-        # Generate portals based on difficulty
-        for i in range(Settings.DIFFICULTY_PORTAL_COUNT[self.difficulty]):
-            self.spawn_portal(i)
-            
-        self.food = Food()
-        self.food.randomize(self.get_occupied_positions())
-        self.power_timer = 0
-        self.shield_food_active = False
+            self.engine = GameEngine(self.difficulty, seed)
+        # Every game is recorded: its seed and turns are enough to replay it
+        self.replay = Replay(self.engine.seed, self.difficulty)
+        # Backspace takes the last seconds back, which makes it a practice game
+        self.rewind = Rewind(self.engine, Settings.REWIND_SECONDS, Settings.REWIND_MEMORY_KB,
+                             Settings.REWIND_SNAPSHOT_TICKS)
+        self.practice = self.demo
+        self.autopilot_on = self.demo
+        self.autopilot.reset()
+        self.chunk_counts = None
+        self.highscore = self.leaderboard.best(self.difficulty)
         self.state = 'running'
-        self.combo_counter = 0
-        self.combo_timer = 0
-        self.last_direction_change = pygame.time.get_ticks()
         self.effects = []  # For visual effects
-
-    def get_occupied_positions(self):
-        occupied = set(self.snake.positions) | set(self.obstacles)
-        for mine in self.mines:
-            occupied.add(mine.position)
-        for portal in self.portals:
-            occupied.add(portal.position)
-            occupied.add(portal.pair_position)
-        if hasattr(self, 'food'):
-            occupied.add(self.food.position)
-        return occupied
-
-    def spawn_obstacle(self):
-        occupied = self.get_occupied_positions()
-        while True:
-            p = (random.randint(0, Settings.GRID_W - 1), random.randint(0, Settings.GRID_H - 1))
-            if p not in occupied:
-                self.obstacles.append(p)
-                break
-
-    def spawn_mine(self):
-        mine = Mine()
-        mine.randomize(self.get_occupied_positions())
-        self.mines.append(mine)
-
-    def spawn_portal(self, id=0):
-        portal = Portal(id)
-        portal.randomize(self.get_occupied_positions())
-        self.portals.append(portal)
+        self.motion = None  # Snake (head, tail) before the last tick, to interpolate from
+        self.dirty_all = True
 
     def handle_menu(self):
         options = ['Easy', 'Medium', 'Hard', 'Start Game']
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                pygame.quit()
-                exit()
+                self.quit()
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_UP:
                     self.menu_option = (self.menu_option - 1) % len(options)
@@ -615,11 +492,8 @@ class Game:
                     
                     # Add some particles around the new selected option
                     y_pos = Settings.HEIGHT // 2 + self.menu_option * 50
-                    for _ in range(10):
-                        x = Settings.WIDTH // 2 + random.randint(-100, 100)
-                        self.particles.append(Particle(
-                            x, y_pos, Settings.COLORS['menu_select'], 
-                            random.uniform(1, 3), random.randint(20, 40)))
+                    self.particles.emit(10, (Settings.WIDTH // 2 - 100, Settings.WIDTH // 2 + 100), y_pos,
+                                        Settings.COLORS['menu_select'], (1, 3), (20, 40))
                         
                 elif event.key == pygame.K_DOWN:
                     self.menu_option = (self.menu_option + 1) % len(options)
@@ -627,22 +501,16 @@ class Game:
                     
                     # Add some particles around the new selected option
                     y_pos = Settings.HEIGHT // 2 + self.menu_option * 50
-                    for _ in range(10):
-                        x = Settings.WIDTH // 2 + random.randint(-100, 100)
-                        self.particles.append(Particle(
-                            x, y_pos, Settings.COLORS['menu_select'], 
-                            random.uniform(1, 3), random.randint(20, 40)))
+                    self.particles.emit(10, (Settings.WIDTH // 2 - 100, Settings.WIDTH // 2 + 100), y_pos,
+                                        Settings.COLORS['menu_select'], (1, 3), (20, 40))
                         
                 elif event.key in (pygame.K_RETURN, pygame.K_SPACE):
                     self.sound_manager.play('menu_confirm', 0.5)
                     
                     # Add explosion effect
                     y_pos = Settings.HEIGHT // 2 + self.menu_option * 50
-                    for _ in range(30):
-                        self.particles.append(Particle(
-                            Settings.WIDTH // 2, y_pos, 
-                            Settings.COLORS['menu_select'], 
-                            random.uniform(2, 5), random.randint(30, 60)))
+                    self.particles.emit(30, Settings.WIDTH // 2, y_pos,
+                                        Settings.COLORS['menu_select'], (2, 5), (30, 60))
                     
                     if self.menu_option < 3:  # Difficulty options
                         self.difficulty = options[self.menu_option].lower()
@@ -667,81 +535,28 @@ class Game:
 
     def draw_menu(self):
         options = ['Easy', 'Medium', 'Hard', 'Start Game']
-        current_time = pygame.time.get_ticks() / 1000  # Time in seconds
-        self.menu_time += 0.016  # Approximately 60 fps
-        
-        # Update title pulse effect
-        self.title_pulse += Settings.TITLE_GLOW_SPEED * self.title_pulse_dir
-        if self.title_pulse >= 1.0:
-            self.title_pulse_dir = -1
-        elif self.title_pulse <= 0.0:
-            self.title_pulse_dir = 1
-        
-        # Update background stars
-        for star in self.stars:
-            star.update()
-        
-        # Update particles in menu
-        self.particles = [p for p in self.particles if p.update()]
-        
-        # Add new particles occasionally
-        if random.random() < 0.05:
-            for _ in range(3):
-                x = random.randint(0, Settings.WIDTH)
-                y = random.randint(0, Settings.HEIGHT - 100)
-                size = random.uniform(1.5, 3.0)
-                color = random.choice([
-                    Settings.COLORS['snake_head'],
-                    Settings.COLORS['portal'],
-                    Settings.COLORS['food'],
-                    Settings.COLORS['power']
-                ])
-                self.particles.append(Particle(x, y, color, size))
+        current_time = ticks() / 1000  # Time in seconds
         
         # Clear screen with black
         self.screen.fill((0, 0, 0))
         
-        # Draw animated background layer
-        self.bg_layer.fill((0, 0, 0, 0))
-        
-        # Draw stars
+        # Draw stars: they are opaque, no need for a layer of their own
         for star in self.stars:
-            star.draw(self.bg_layer)
+            star.draw(self.screen)
             
-        # Draw nebula-like effects
+        # Draw nebula-like effects from the baked gradient sprites
         for i in range(Settings.BG_NEBULA_COUNT):
             center_x = Settings.WIDTH // 2 + int(math.sin(current_time * 0.3 + i * 2) * 100)
             center_y = Settings.HEIGHT // 2 + int(math.cos(current_time * 0.2 + i * 3) * 80)
             radius = 100 + int(math.sin(current_time * 0.5 + i) * 20)
-            color = list(Settings.COLORS['bg_glow'])
-            color[0] = (color[0] + i * 40) % 255
-            color[1] = (color[1] + i * 30) % 255
-            
-            # Create radial gradient
-            for r in range(radius, 0, -20):
-                alpha = max(0, min(150, int(100 * (r / radius))))
-                pygame.draw.circle(self.bg_layer, (*color[:3], alpha), 
-                                 (center_x, center_y), r)
-        
-        # Blit background onto screen
-        self.screen.blit(self.bg_layer, (0, 0))
+            self.gradients.draw(self.screen, (center_x, center_y), radius,
+                                self.nebula_color(i), 150, 100)
         
         # Draw grid lines for cyber effect
-        for x in range(0, Settings.WIDTH, 40):
-            intensity = int(20 + 10 * math.sin(x / 50 + current_time))
-            pygame.draw.line(self.screen, (intensity, intensity * 1.5, intensity * 2), 
-                           (x, 0), (x, Settings.HEIGHT), 1)
-        
-        for y in range(0, Settings.HEIGHT, 40):
-            intensity = int(20 + 10 * math.sin(y / 50 + current_time))
-            pygame.draw.line(self.screen, (intensity, intensity * 1.5, intensity * 2), 
-                           (0, y), (Settings.WIDTH, y), 1)
+        self.cyber_grid.draw(self.screen, current_time)
         
         # Draw semi-transparent background for menu
-        menu_bg = pygame.Surface((Settings.WIDTH, Settings.HEIGHT))
-        menu_bg.fill(Settings.COLORS['menu_bg'])
-        menu_bg.set_alpha(200)
-        self.screen.blit(menu_bg, (0, 0))
+        self.screen.blit(self.menu_bg, (0, 0))
         
         # Draw title with glow effect
         glow_size = 10 + int(20 * self.title_pulse)
@@ -750,13 +565,12 @@ class Game:
         # Draw multiple layers for glow effect
         for size_offset in range(glow_size, 0, -2):
             alpha = int(200 * (1 - size_offset / glow_size))
-            glow_font = pygame.font.Font(Settings.FONT_NAME, 48 + size_offset)
-            glow_title = glow_font.render('CYBERSNAKE', True, (*title_color[:3], alpha))
+            glow_title = self.text.render('CYBERSNAKE', 48 + size_offset, (*title_color[:3], alpha))
             glow_rect = glow_title.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT // 4))
             self.screen.blit(glow_title, glow_rect)
         
         # Draw actual title
-        title = self.big_font.render('CYBERSNAKE', True, Settings.COLORS['menu_select'])
+        title = self.text.render('CYBERSNAKE', 48, Settings.COLORS['menu_select'])
         title_rect = title.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT // 4))
         self.screen.blit(title, title_rect)
         
@@ -769,7 +583,7 @@ class Game:
         x_offset = 0
         for i, char in enumerate(subtitle):
             char_y = math.sin(current_time * 3 + i * 0.2) * 5
-            char_surf = self.font.render(char, True, Settings.COLORS['menu_text'])
+            char_surf = self.text.render(char, 24, Settings.COLORS['menu_text'])
             subtitle_surface.blit(char_surf, (x_offset, char_y + 15))
             x_offset += char_surf.get_width()
         
@@ -777,8 +591,7 @@ class Game:
         self.screen.blit(subtitle_surface, subtitle_rect)
         
         # Draw particles
-        for particle in self.particles:
-            particle.draw(self.screen)
+        self.particles.draw(self.screen, self.frame_blend)
         
         # Draw options with animation
         for i, option in enumerate(options):
@@ -798,8 +611,7 @@ class Game:
                 for j, char in enumerate(prefix_chars):
                     pulse = 0.5 + 0.5 * math.sin(current_time * 5 + j)
                     char_size = 32 + int(4 * pulse)
-                    char_font = pygame.font.Font(Settings.FONT_NAME, char_size)
-                    char_surf = char_font.render(char, True, color)
+                    char_surf = self.text.render(char, char_size, color)
                     prefix_surface.blit(char_surf, (x_offset, 0))
                     x_offset += char_surf.get_width()
                 
@@ -814,7 +626,7 @@ class Game:
                 x_offset = 0
                 for j, char in enumerate(option):
                     char_y = math.sin(current_time * 4 + j * 0.3) * 3
-                    char_surf = self.medium_font.render(char, True, color)
+                    char_surf = self.text.render(char, 32, color)
                     option_surface.blit(char_surf, (x_offset, char_y))
                     x_offset += char_surf.get_width()
                 
@@ -822,7 +634,7 @@ class Game:
                 self.screen.blit(option_surface, option_rect)
             else:
                 # Draw normal text for non-selected options
-                text = self.medium_font.render(option, True, color)
+                text = self.text.render(option, 32, color)
                 text_rect = text.get_rect(center=(Settings.WIDTH // 2, y_pos))
                 self.screen.blit(text, text_rect)
             
@@ -840,15 +652,15 @@ class Game:
         sound_text = "Sound: " + ("ON" if self.sound_manager.sound_enabled else "OFF")
         music_text = "Music: " + ("ON" if self.sound_manager.music_enabled else "OFF")
         
-        sound_surf = self.font.render(sound_text, True, Settings.COLORS['menu_text'])
-        music_surf = self.font.render(music_text, True, Settings.COLORS['menu_text'])
+        sound_surf = self.text.render(sound_text, 24, Settings.COLORS['menu_text'])
+        music_surf = self.text.render(music_text, 24, Settings.COLORS['menu_text'])
         
         self.screen.blit(sound_surf, (20, Settings.HEIGHT - 60))
         self.screen.blit(music_surf, (20, Settings.HEIGHT - 30))
         
         # Draw controls hint
         controls_text = "Arrow keys: Navigate | Enter/Space: Select | S: Toggle Sound | M: Toggle Music"
-        controls_surf = self.font.render(controls_text, True, Settings.COLORS['menu_text'])
+        controls_surf = self.text.render(controls_text, 24, Settings.COLORS['menu_text'])
         controls_rect = controls_surf.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT - 30))
         self.screen.blit(controls_surf, controls_rect)
 
@@ -869,289 +681,221 @@ class Game:
         }
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                pygame.quit()
-                exit()
+                self.quit()
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_p:
                     self.state = 'pause' if self.state == 'running' else 'running'
+                elif event.key == pygame.K_F2:
+                    # Switch between full redraw and dirty rectangles
+                    self.render_mode = 'dirty' if self.render_mode == 'full' else 'full'
+                    self.dirty_all = True
+                elif event.key == pygame.K_F3:
+                    self.show_frame_stats = not self.show_frame_stats
+                elif event.key == pygame.K_F4:
+                    self.show_profile = not self.show_profile
+                    self.profile_overlay = None
+                    if not (self.profile_csv or self.profile_trace):
+                        self.profiler.toggle()
+                    self.dirty_all = True
+                elif event.key == pygame.K_F5 and self.state in ('running', 'pause'):
+                    # Autopilot games set no records, like rewound ones
+                    self.autopilot_on = not self.autopilot_on
+                    self.practice = True
                 elif event.key == pygame.K_ESCAPE:
                     self.state = 'menu' if self.state != 'menu' else 'running'
+                elif event.key == pygame.K_BACKSPACE:
+                    self.rewind_game()
                 if self.state != 'running':
                     continue
                 if event.key in dir_map:
-                    self.snake.turn(dir_map[event.key])
-                    # Add combo system: fast direction changes score more
-                    now = pygame.time.get_ticks()
-                    if now - self.last_direction_change < 500:  # If changed direction within 0.5s
-                        self.combo_counter += 1
-                        self.combo_timer = 100  # Reset combo timer
-                    else:
-                        self.combo_counter = 1
-                    self.last_direction_change = now
+                    self.autopilot_on = False  # The player takes the snake back
+                    self.steer(dir_map[event.key])
                 elif event.key == pygame.K_r and self.state == 'gameover':
                     self.reset()
 
-    def check_portal_collision(self):
-        head = self.snake.head()
-        for portal in self.portals:
-            if head == portal.position:
-                # Teleport to the paired portal
-                exit_pos = portal.pair_position
-                
-                # Apply snake's direction to new position
-                self.snake.positions[0] = exit_pos
-                
-                # Add teleport effect
-                self.effects.append({
-                    'type': 'teleport',
-                    'pos': exit_pos,
-                    'timer': 20
-                })
-                
-                return True
-            elif head == portal.pair_position:
-                # Teleport to the entry portal
-                exit_pos = portal.position
-                
-                # Apply snake's direction to new position
-                self.snake.positions[0] = exit_pos
-                
-                # Add teleport effect
-                self.effects.append({
-                    'type': 'teleport',
-                    'pos': exit_pos,
-                    'timer': 20
-                })
-                
-                return True
-        return False
+    def steer(self, direction):
+        self.replay.record(self.engine.tick, direction)
+        self.rewind.turn(direction)
+
+    def rewind_game(self):
+        # Go back in time, then wait paused for the player to pick it up again
+        tick = self.rewind.rewind(Settings.REWIND_SECONDS)
+        self.replay.turns = [turn for turn in self.replay.turns if turn[0] < tick]
+        self.practice = True
+        self.chunk_counts = None
+        self.effects = []
+        self.motion = None
+        self.dirty_all = True
+        self.state = 'pause'
 
     def update(self):
         if self.state != 'running':
             return
-            
-        # Update effects
-        self.effects = [effect for effect in self.effects if effect['timer'] > 0]
-        for effect in self.effects:
-            effect['timer'] -= 1
-            
-        # Update food animation
-        self.food.update()
-        
-        # Update portals
-        for portal in self.portals:
-            portal.update()
-            
-        # Update mines
-        for mine in self.mines:
-            mine.update()
-            
-            # Add warning particles around active mines
+
+        # Advance the rules by one tick, then render what happened
+        snake = self.engine.snake
+        old_head, old_tail = snake.head(), snake.positions[-1]
+        obstacle_count, mine_count = len(self.engine.obstacles), len(self.engine.mines)
+        profiler = self.profiler
+        if self.autopilot_on:
+            with profiler.phase('autopilot'):
+                direction = self.autopilot.choose(self.engine)
+            if direction != snake.direction:
+                self.steer(direction)
+        with profiler.phase('engine'):
+            events = self.rewind.step()
+        self.motion = (old_head, old_tail)
+        with profiler.phase('events'):
+            for event in events:
+                self.handle_engine_event(event)
+
+        # Cells the dirty renderer has to recompose
+        for pos in (old_head, old_tail, self.engine.snake.head()):
+            self.mark_dirty(pos)
+        for pos in self.engine.obstacles[obstacle_count:]:
+            self.mark_dirty(pos)
+        for mine in self.engine.mines[mine_count:]:
+            self.mark_dirty(mine.position)
+        if self.engine.game_over:
+            return
+        with profiler.phase('particles'):
+            self.emit_tick_particles()
+
+    def emit_tick_particles(self):
+        # Add warning particles around active mines, those in view on a scrolling board
+        mines = self.engine.mines
+        if self.camera.scrolling:
+            self.sync_chunks()
+            mines = [entity for entity, _ in self.chunks.query(self.camera) if isinstance(entity, Mine)]
+        for mine in mines:
             if mine.active and random.random() < 0.1:
                 px, py = mine.position
                 x = px * Settings.GRID_SIZE + Settings.GRID_SIZE // 2
                 y = py * Settings.GRID_SIZE + Settings.GRID_SIZE // 2
                 
                 # Create warning particles
-                for _ in range(3):
-                    angle = random.uniform(0, math.pi * 2)
-                    distance = random.uniform(5, 15)
-                    dx = math.cos(angle) * distance
-                    dy = math.sin(angle) * distance
-                    
-                    self.particles.append(Particle(
-                        x + dx, y + dy, 
-                        (255, 0, 0) if pygame.time.get_ticks() % 1000 < 500 else Settings.COLORS['mine'],
-                        random.uniform(1, 2), random.randint(10, 30)))
-            
-        # Update combo timer
-        if self.combo_timer > 0:
-            self.combo_timer -= 1
-        else:
-            self.combo_counter = 0
-            
-        # Move snake
-        self.snake.move()
+                self.particles.emit(
+                    3, x, y, (255, 0, 0) if ticks() % 1000 < 500 else Settings.COLORS['mine'],
+                    (1, 2), (10, 30), ring=(5, 15))
         
         # Create trail particles behind snake
         if random.random() < 0.1:
-            for pos in list(self.snake.positions)[1:4]:  # Only a few positions for performance
+            for pos in self.engine.snake.positions[1:4]:  # Only a few positions for performance
                 if random.random() < 0.3:  # Not every position
                     px, py = pos
                     x = px * Settings.GRID_SIZE + Settings.GRID_SIZE // 2
                     y = py * Settings.GRID_SIZE + Settings.GRID_SIZE // 2
                     
-                    self.particles.append(Particle(
-                        x, y, Settings.COLORS['snake_body'], 
-                        random.uniform(1, 3), random.randint(15, 40)))
-        
-        # Check portal teleportation
-        teleported = self.check_portal_collision()
-        if teleported:
-            # Play teleport sound
+                    self.particles.emit(1, x, y, Settings.COLORS['snake_body'], (1, 3), (15, 40))
+
+        # Add slow-motion particles occasionally
+        if self.engine.power_timer and random.random() < 0.05:
+            px, py = self.engine.snake.head()
+            x = px * Settings.GRID_SIZE + Settings.GRID_SIZE // 2
+            y = py * Settings.GRID_SIZE + Settings.GRID_SIZE // 2
+            
+            self.particles.emit(2, x, y, Settings.COLORS['power'], (1, 2), (20, 40), box=(20, 20))
+
+    def animate(self):
+        # One fixed animation step, independent of the tick rate
+        with self.profiler.phase('stars'):
+            for star in self.stars:
+                star.update()
+        with self.profiler.phase('particles'):
+            self.particles.update()
+
+        if self.state == 'menu':
+            self.menu_time += 1 / Settings.ANIMATION_FPS
+
+            # Update title pulse effect
+            self.title_pulse += Settings.TITLE_GLOW_SPEED * self.title_pulse_dir
+            if self.title_pulse >= 1.0:
+                self.title_pulse_dir = -1
+            elif self.title_pulse <= 0.0:
+                self.title_pulse_dir = 1
+
+            # Add new particles occasionally
+            if random.random() < 0.05:
+                self.particles.emit(3, (0, Settings.WIDTH), (0, Settings.HEIGHT - 100), [
+                    Settings.COLORS['snake_head'],
+                    Settings.COLORS['portal'],
+                    Settings.COLORS['food'],
+                    Settings.COLORS['power']
+                ], (1.5, 3.0), (50, Settings.PARTICLE_LIFETIME))
+            return
+        if self.state != 'running':
+            return
+
+        # Update effects
+        self.effects = [effect for effect in self.effects if effect['timer'] > 0]
+        for effect in self.effects:
+            effect['timer'] -= 1
+
+        # Update food animation
+        self.engine.food.update()
+
+        # Update portals
+        for portal in self.engine.portals:
+            portal.update()
+
+    def handle_engine_event(self, event):
+        kind = event['type']
+        if kind == 'teleport':
             self.sound_manager.play('teleport', 0.4)
-        
-        # Check collisions
-        if not teleported:
-            # Check for collisions with mines
-            for mine in self.mines:
-                if self.snake.head() == mine.position and mine.explosion_timer == 0:
-                    if self.snake.shield_active:
-                        # Shield protects from mines
-                        self.snake.shield_active = False
-                        self.effects.append({
-                            'type': 'shield_break',
-                            'pos': self.snake.head(),
-                            'timer': 20
-                        })
-                        self.sound_manager.play('shield', 0.5)
-                    else:
-                        # Mine explosion
-                        self.explosion_cells = mine.explode()
-                        self.sound_manager.play('explosion', 0.6)
-                        
-                        # Add explosion particles
-                        px, py = mine.position
-                        center_x = px * Settings.GRID_SIZE + Settings.GRID_SIZE // 2
-                        center_y = py * Settings.GRID_SIZE + Settings.GRID_SIZE // 2
-                        
-                        for _ in range(50):
-                            distance = random.uniform(0, 30)
-                            angle = random.uniform(0, math.pi * 2)
-                            speed = random.uniform(1, 4)
-                            
-                            dx = math.cos(angle) * distance
-                            dy = math.sin(angle) * distance
-                            
-                            # Particles fly outward from explosion center
-                            direction = (math.cos(angle), math.sin(angle))
-                            
-                            self.particles.append(Particle(
-                                center_x + dx, center_y + dy,
-                                (255, random.randint(100, 200), 0),
-                                random.uniform(2, 4), random.randint(20, 60),
-                                speed, direction))
-                        
-                        # Check if snake is in explosion radius
-                        if self.snake.head() in self.explosion_cells:
-                            self.state = 'gameover'
-                            self.sound_manager.play('game_over', 0.7)
-                            if self.score > self.highscore:
-                                self.highscore = self.score
-                                self.save_highscore()
-                            return
+            self.effects.append({
+                'type': 'teleport',
+                'pos': event['pos'],
+                'timer': 20
+            })
             
-            # Check for collision with explosion cells
-            for cell in self.explosion_cells:
-                if self.snake.head() == cell and not self.snake.shield_active:
-                    self.state = 'gameover'
-                    self.sound_manager.play('game_over', 0.7)
-                    if self.score > self.highscore:
-                        self.highscore = self.score
-                        self.save_highscore()
-                    return
+        elif kind == 'shield_break':
+            self.sound_manager.play('shield', 0.5)
+            self.effects.append({
+                'type': 'shield_break',
+                'pos': event['pos'],
+                'timer': 20
+            })
             
-            # Check for self collision or obstacle collision
-            if (self.snake.collides_self() or 
-                self.snake.head() in self.obstacles) and not self.snake.shield_active:
-                self.state = 'gameover'
-                self.sound_manager.play('game_over', 0.7)
-                if self.score > self.highscore:
-                    self.highscore = self.score
-                    self.save_highscore()
-                return
-
-        # Food collision
-        if self.snake.head() == self.food.position:
-            # Play eating sound
-            self.sound_manager.play('eat', 0.4)
+        elif kind == 'explosion':
+            self.sound_manager.play('explosion', 0.6)
             
-            self.snake.grow()
+            # Add explosion particles
+            px, py = event['pos']
+            center_x = px * Settings.GRID_SIZE + Settings.GRID_SIZE // 2
+            center_y = py * Settings.GRID_SIZE + Settings.GRID_SIZE // 2
+            
+            # Particles fly outward from explosion center
+            self.particles.emit(50, center_x, center_y, [(255, g, 0) for g in range(100, 201, 10)],
+                                (2, 4), (20, 60), speed=(1, 4), ring=(0, 30), outward=True)
+                    
+        elif kind == 'ate':
+            food = event['food']
+            self.sound_manager.play('eat', 0.4)
+            if food.shield:
+                self.sound_manager.play('shield', 0.5)
             
             # Add particles for eating effect
-            px, py = self.food.position
+            px, py = food.position
             x = px * Settings.GRID_SIZE + Settings.GRID_SIZE // 2
             y = py * Settings.GRID_SIZE + Settings.GRID_SIZE // 2
             
-            for _ in range(20):
-                self.particles.append(Particle(
-                    x, y, self.food.color, 
-                    random.uniform(1, 3), random.randint(20, 60)))
-            
-            # Calculate score with combo multiplier
-            combo_multiplier = min(5, max(1, self.combo_counter))
-            base_points = 2 if self.food.power else 1
-            if self.food.shield:
-                base_points = 3
-                self.snake.activate_shield()
-                self.sound_manager.play('shield', 0.5)
-                
-            gained = base_points * combo_multiplier
-            self.score += gained
+            self.particles.emit(20, x, y, food.color, (1, 3), (20, 60))
             
             # Show score effect
             self.effects.append({
                 'type': 'score',
-                'pos': self.snake.head(),
-                'value': gained,
+                'pos': event['pos'],
+                'value': event['gained'],
                 'timer': 40
             })
             
-            # Spawn obstacles based on score
-            if self.score % 5 == 0 and len(self.obstacles) < 30:
-                self.spawn_obstacle()
-                
-            # Maybe spawn a mine based on difficulty
-            if random.random() < Settings.DIFFICULTY_MINE_CHANCE[self.difficulty]:
-                self.spawn_mine()
-                
-            # Adjust speed based on score and difficulty
-            if self.difficulty == 'easy':
-                self.speed = min(Settings.FPS_EASY + self.score // 8, Settings.MAX_FPS)
-            elif self.difficulty == 'medium':
-                self.speed = min(Settings.FPS_MEDIUM + self.score // 6, Settings.MAX_FPS)
-            else:
-                self.speed = min(Settings.FPS_HARD + self.score // 4, Settings.MAX_FPS)
-                
-            # Decide what kind of food to spawn next
-            power = random.random() < 0.15
-            shield = random.random() < 0.1
-            
-            if shield:
-                self.food = Food(power=False, shield=True)
-            else:
-                self.food = Food(power=power, shield=False)
-                
-            self.food.randomize(self.get_occupied_positions())
-            
-            if power:
-                self.power_timer = 120  # ~3-4 seconds
-                self.speed = max(self.speed - 5, 5)
-
-        # Power timer
-        if self.power_timer:
-            self.power_timer -= 1
-            
-            # Add slow-motion particles occasionally
-            if random.random() < 0.05:
-                px, py = self.snake.head()
-                x = px * Settings.GRID_SIZE + Settings.GRID_SIZE // 2
-                y = py * Settings.GRID_SIZE + Settings.GRID_SIZE // 2
-                
-                for _ in range(2):
-                    self.particles.append(Particle(
-                        x + random.uniform(-20, 20), 
-                        y + random.uniform(-20, 20), 
-                        Settings.COLORS['power'], 
-                        random.uniform(1, 2), random.randint(20, 40)))
-                
-            if self.power_timer == 0:
-                if self.difficulty == 'easy':
-                    self.speed = min(Settings.FPS_EASY + self.score // 8, Settings.MAX_FPS)
-                elif self.difficulty == 'medium':
-                    self.speed = min(Settings.FPS_MEDIUM + self.score // 6, Settings.MAX_FPS)
-                else:
-                    self.speed = min(Settings.FPS_HARD + self.score // 4, Settings.MAX_FPS)
+        elif kind == 'died':
+            self.state = 'gameover'
+            self.game_over_at = time.perf_counter()
+            self.sound_manager.play('game_over', 0.7)
+            if self.practice or Settings.ARENA:
+                return  # Rewound games and arena boards set no records
+            self.record_score()
 
     def draw_hud(self):
         hud_rect = pygame.Rect(0, Settings.HEIGHT - 60, Settings.WIDTH, 60)
@@ -1159,58 +903,118 @@ class Game:
         
         # Draw difficulty 
         diff_text = f'Difficulty: {self.difficulty.capitalize()}'
-        diff_surf = self.font.render(diff_text, True, Settings.COLORS['hud'])
+        diff_surf = self.text.render(diff_text, 24, Settings.COLORS['hud'])
         diff_rect = diff_surf.get_rect(topleft=(20, Settings.HEIGHT - 55))
         self.screen.blit(diff_surf, diff_rect)
         
         # Draw score, highscore and speed
-        text = f'Score: {self.score}   High Score: {self.highscore}   Speed: {self.speed}'
-        surf = self.font.render(text, True, Settings.COLORS['hud'])
+        text = f'Score: {self.engine.score}   High Score: {self.highscore}   Speed: {self.engine.speed}'
+        surf = self.text.render(text, 24, Settings.COLORS['hud'])
         self.screen.blit(surf, (20, Settings.HEIGHT - 30))
         
         # Draw combo counter if active
-        if self.combo_counter > 1:
-            combo_text = f'Combo: x{min(5, self.combo_counter)}'
+        if self.engine.combo_counter > 1:
+            combo_text = f'Combo: x{min(5, self.engine.combo_counter)}'
             combo_color = (255, 255, 0)  # Yellow for combo
-            combo_surf = self.font.render(combo_text, True, combo_color)
+            combo_surf = self.text.render(combo_text, 24, combo_color)
             self.screen.blit(combo_surf, (Settings.WIDTH - 150, Settings.HEIGHT - 30))
             
         # Draw shield indicator if active
-        if self.snake.shield_active:
+        if self.engine.snake.shield_active:
             shield_text = "SHIELD ACTIVE"
-            shield_surf = self.font.render(shield_text, True, Settings.COLORS['shield'])
+            shield_surf = self.text.render(shield_text, 24, Settings.COLORS['shield'])
             self.screen.blit(shield_surf, (Settings.WIDTH - 200, Settings.HEIGHT - 55))
+        elif self.practice:
+            label = 'AUTO' if self.autopilot_on else 'PRATICA'
+            practice_surf = self.text.render(label, 24, Settings.COLORS['hud'])
+            self.screen.blit(practice_surf, (Settings.WIDTH - 120, Settings.HEIGHT - 55))
+
+        # Frame pacing statistics (F3)
+        if self.show_frame_stats and self.frame_stats:
+            stats = self.frame_stats
+            stats_text = (f"{1000 / stats['mean_ms']:.0f} fps  jitter {stats['jitter_ms']:.2f} ms  "
+                          f"p99 {stats['p99_ms']:.1f} ms")
+            stats_surf = self.text.render(stats_text, 20, Settings.COLORS['hud'])
+            self.screen.blit(stats_surf, (250, Settings.HEIGHT - 53))
+
+    def draw_entities(self):
+        camera = self.camera
+        if camera.scrolling:
+            # Only what lies in the chunks under the view
+            self.sync_chunks()
+            for entity, pos in self.chunks.query(camera):
+                if entity is OBSTACLE:
+                    self.draw_obstacle(pos)
+                elif isinstance(entity, Portal):
+                    entity.draw_end(self.screen, self.glow, pos, camera)
+                else:
+                    entity.draw(self.screen, self.glow, camera)
+        else:
+            self.draw_obstacles()
+            for mine in self.engine.mines:
+                mine.draw(self.screen, self.glow, camera)
+            for portal in self.engine.portals:
+                portal.draw(self.screen, self.glow, camera)
+        self.engine.food.draw(self.screen, self.glow, camera)
+        self.engine.snake.draw(self.screen, self.glow, camera, self.motion, self.tick_blend)
+
+    def sync_chunks(self):
+        # Obstacles and mines are only ever appended during a game: new ones are
+        # added as they come, and reset() and rewinds have the chunks rebuilt
+        engine = self.engine
+        if self.chunk_counts is None:
+            self.chunks.clear()
+            self.chunk_counts = (0, 0)
+            for portal in engine.portals:
+                for pos in (portal.position, portal.pair_position):
+                    self.chunks.add(pos, (portal, pos))
+        obstacles, mines = self.chunk_counts
+        for p in engine.obstacles[obstacles:]:
+            self.chunks.add(p, (OBSTACLE, p))
+        for mine in engine.mines[mines:]:
+            self.chunks.add(mine.position, (mine, mine.position))
+        self.chunk_counts = (len(engine.obstacles), len(engine.mines))
+
+    def follow_head(self):
+        # Centered on the head as drawn, sliding with it between ticks
+        snake = self.engine.snake
+        head = snake.head()
+        if self.motion is not None and snake.adjacent(self.motion[0], head):
+            head = snake.lerp(self.motion[0], head, self.tick_blend)
+        self.camera.follow(head)
 
     def draw_obstacles(self):
-        for p in self.obstacles:
-            rect = pygame.Rect(p[0] * Settings.GRID_SIZE, p[1] * Settings.GRID_SIZE,
-                               Settings.GRID_SIZE, Settings.GRID_SIZE)
-            pygame.draw.rect(self.screen, Settings.COLORS['obst'], rect)
-            pygame.draw.rect(self.glow_layer, Settings.COLORS['obst'], rect.inflate(6, 6), border_radius=8)
+        for p in self.engine.obstacles:
+            self.draw_obstacle(p)
+
+    def draw_obstacle(self, p):
+        at = self.camera.to_screen(p)
+        if at is None:
+            return
+        rect = pygame.Rect(at[0], at[1], Settings.GRID_SIZE, Settings.GRID_SIZE)
+        pygame.draw.rect(self.screen, Settings.COLORS['obst'], rect)
+        self.glow.rect(rect.inflate(6, 6), Settings.COLORS['obst'], border_radius=8)
 
     def draw_effects(self):
         for effect in self.effects:
+            at = self.camera.to_screen(effect['pos'])
+            if at is None:
+                continue
             if effect['type'] == 'teleport':
-                x, y = effect['pos']
-                rect = pygame.Rect(x * Settings.GRID_SIZE, y * Settings.GRID_SIZE,
-                                 Settings.GRID_SIZE, Settings.GRID_SIZE)
+                rect = pygame.Rect(at[0], at[1], Settings.GRID_SIZE, Settings.GRID_SIZE)
                 
                 # Draw expanding circles
                 max_radius = 30
                 progress = 1 - (effect['timer'] / 20)
                 radius = int(max_radius * progress)
                 
-                pygame.draw.circle(self.glow_layer, Settings.COLORS['portal'], 
-                                  rect.center, radius, 2)
-                pygame.draw.circle(self.glow_layer, Settings.COLORS['portal'], 
-                                  rect.center, radius // 2, 2)
+                self.glow.circle(rect.center, radius, Settings.COLORS['portal'], 2)
+                self.glow.circle(rect.center, radius // 2, Settings.COLORS['portal'], 2)
                                   
             elif effect['type'] == 'score':
-                x, y = effect['pos']
                 # Move effect upward as timer decreases
                 y_offset = 20 * (1 - effect['timer'] / 40)
-                pos = (x * Settings.GRID_SIZE + Settings.GRID_SIZE // 2, 
-                     y * Settings.GRID_SIZE - y_offset)
+                pos = (at[0] + Settings.GRID_SIZE // 2, at[1] - y_offset)
                 
                 # Fade out text as timer decreases
                 alpha = min(255, 255 * (effect['timer'] / 40))
@@ -1233,86 +1037,206 @@ class Game:
                 self.screen.blit(score_surf, score_rect)
                 
             elif effect['type'] == 'shield_break':
-                x, y = effect['pos']
-                rect = pygame.Rect(x * Settings.GRID_SIZE, y * Settings.GRID_SIZE,
-                                 Settings.GRID_SIZE, Settings.GRID_SIZE)
+                rect = pygame.Rect(at[0], at[1], Settings.GRID_SIZE, Settings.GRID_SIZE)
                 
                 # Draw breaking shield effect
                 max_radius = 25
                 progress = 1 - (effect['timer'] / 20)
                 radius = int(max_radius * progress)
                 
-                for i in range(8):
-                    angle = math.radians(i * 45 + progress * 90)
-                    end_x = rect.centerx + int(radius * math.cos(angle))
-                    end_y = rect.centery + int(radius * math.sin(angle))
-                    pygame.draw.line(self.glow_layer, Settings.COLORS['shield'],
-                                   rect.center, (end_x, end_y), 2)
+                self.glow.burst(rect.center, radius, progress * 90, Settings.COLORS['shield'])
 
-    def render(self):
-        if self.state == 'menu':
-            self.draw_menu()
-            pygame.display.flip()
-            return
-        
-        current_time = pygame.time.get_ticks() / 1000  # Time in seconds
-            
-        # Update background stars
-        for star in self.stars:
-            star.update()
-        
-        # Update particles
-        self.particles = [p for p in self.particles if p.update()]
-            
+    def draw_background(self, surface, current_time):
         # Draw background
-        self.screen.fill(Settings.COLORS['bg'])
+        surface.fill(Settings.COLORS['bg'])
         
         # Draw stars
-        self.bg_layer.fill((0, 0, 0, 0))
-        for star in self.stars:
-            star.draw(self.bg_layer)
+        with self.profiler.phase('stars'):
+            for star in self.stars:
+                star.draw(surface)
         
         # Draw some nebula effects in background
-        for i in range(1):  # Just one subtle nebula in gameplay
-            center_x = Settings.WIDTH // 2 + int(math.sin(current_time * 0.1 + i * 2) * 100)
-            center_y = Settings.HEIGHT // 2 + int(math.cos(current_time * 0.08 + i * 3) * 80)
-            radius = 150 + int(math.sin(current_time * 0.3 + i) * 30)
-            color = list(Settings.COLORS['bg_glow'])
-            color[0] = (color[0] + i * 40) % 255
-            color[1] = (color[1] + i * 30) % 255
-            
-            # Create radial gradient with lower opacity for gameplay
-            for r in range(radius, 0, -20):
-                alpha = max(0, min(40, int(30 * (r / radius))))
-                pygame.draw.circle(self.bg_layer, (*color[:3], alpha), 
-                                 (center_x, center_y), r)
+        with self.profiler.phase('nebula'):
+            for i in range(1):  # Just one subtle nebula in gameplay
+                center_x = Settings.WIDTH // 2 + int(math.sin(current_time * 0.1 + i * 2) * 100)
+                center_y = Settings.HEIGHT // 2 + int(math.cos(current_time * 0.08 + i * 3) * 80)
+                radius = 150 + int(math.sin(current_time * 0.3 + i) * 30)
+                
+                # Radial gradient with lower opacity for gameplay
+                self.gradients.draw(surface, (center_x, center_y), radius, self.nebula_color(i), 40, 30)
         
-        self.screen.blit(self.bg_layer, (0, 0))
-        self.screen.blit(self.grid_surface, (0, 0))
-        self.glow_layer.fill((0, 0, 0, 0))
+        with self.profiler.phase('grid'):
+            g = Settings.GRID_SIZE
+            view = (self.camera.x % g, self.camera.y % g, Settings.WIDTH, Settings.HEIGHT - 60)
+            surface.blit(self.grid_surface, (0, 0), view)
+
+    def mark_dirty(self, pos, radius=1, cells=None):
+        # A cell plus the neighbours its glow can spill into
+        cells = self.dirty_cells if cells is None else cells
+        x, y = pos
+        for cy in range(max(0, y - radius), min(Settings.GRID_H, y + radius + 1)):
+            for cx in range(max(0, x - radius), min(Settings.GRID_W, x + radius + 1)):
+                cells.add((cx, cy))
+
+    def mark_dirty_rect(self, rect, cells):
+        g = Settings.GRID_SIZE
+        for cy in range(max(0, rect.top // g), min(Settings.GRID_H, (rect.bottom - 1) // g + 1)):
+            for cx in range(max(0, rect.left // g), min(Settings.GRID_W, (rect.right - 1) // g + 1)):
+                cells.add((cx, cy))
+
+    def volatile_cells(self):
+        # Cells that animate on their own and change every frame
+        cells = set()
+        if self.engine.food.position is not None:
+            self.mark_dirty(self.engine.food.position, 1, cells)
+        for portal in self.engine.portals:
+            self.mark_dirty(portal.position, 1, cells)
+            self.mark_dirty(portal.pair_position, 1, cells)
+        for mine in self.engine.mines:
+            if mine.explosion_timer > 0:
+                self.mark_dirty(mine.position, 2, cells)
+            elif mine.active:
+                self.mark_dirty(mine.position, 1, cells)
+        if self.engine.snake.shield_active:
+            self.mark_dirty(self.engine.snake.head(), 1, cells)
+        if self.motion is not None and self.tick_blend < 1.0:
+            # The sliding head and tail
+            for pos in (*self.motion, self.engine.snake.head(), self.engine.snake.positions[-1]):
+                self.mark_dirty(pos, 1, cells)
+        for effect in self.effects:
+            self.mark_dirty(effect['pos'], 2, cells)
+            if effect['type'] == 'score':
+                self.mark_dirty((effect['pos'][0], effect['pos'][1] - 1), 2, cells)
+        cells |= self.particles.covered_cells(Settings.GRID_SIZE, Settings.GRID_W, Settings.GRID_H)
+        if self.show_profile and self.profile_overlay is not None:
+            self.mark_dirty_rect(self.profile_overlay.get_rect(topleft=(8, 8)), cells)
+        return cells
+
+    @staticmethod
+    def cells_to_rects(cells):
+        # Runs of cells along rows, then runs with the same span stacked into rects
+        g = Settings.GRID_SIZE
+        spans = {}
+        for y in sorted({y for _, y in cells}):
+            xs = sorted(x for x, cy in cells if cy == y)
+            start = prev = xs[0]
+            for x in xs[1:] + [None]:
+                if x is not None and x == prev + 1:
+                    prev = x
+                    continue
+                key = (start, prev)
+                if key in spans and spans[key][-1][1] == y - 1:
+                    spans[key][-1][1] = y
+                else:
+                    spans.setdefault(key, []).append([y, y])
+                if x is not None:
+                    start = prev = x
+        return [pygame.Rect(x0 * g, y0 * g, (x1 - x0 + 1) * g, (y1 - y0 + 1) * g)
+                for (x0, x1), runs in spans.items() for y0, y1 in runs]
+
+    def draw_region(self, rect):
+        # Everything whose drawing (glow included) can reach into rect
+        g = Settings.GRID_SIZE
+        x0, x1 = max(0, rect.left // g - 1), min(Settings.GRID_W, rect.right // g + 1)
+        y0, y1 = max(0, rect.top // g - 1), min(Settings.GRID_H, rect.bottom // g + 1)
+        near = pygame.Rect(x0, y0, x1 - x0, y1 - y0)
+
+        for p in self.engine.obstacles:
+            if near.collidepoint(p):
+                self.draw_obstacle(p)
+        camera = self.camera
+        for mine in self.engine.mines:
+            reach = 2 if mine.explosion_timer > 0 else 0
+            if near.inflate(reach * 2, reach * 2).collidepoint(mine.position):
+                mine.draw(self.screen, self.glow, camera)
+        for portal in self.engine.portals:
+            if near.collidepoint(portal.position) or near.collidepoint(portal.pair_position):
+                portal.draw(self.screen, self.glow, camera)
+        food = self.engine.food
+        if food.position is not None and near.collidepoint(food.position):
+            food.draw(self.screen, self.glow, camera)
+        snake = self.engine.snake
+        head = snake.head()
+        for y in range(y0, y1):
+            for x in range(x0, x1):
+                if (x, y) != head and (x, y) in snake.positions:
+                    snake.draw_segment(self.screen, self.glow, (x, y), False, camera)
+        snake.draw_ends(self.screen, self.glow, camera, self.motion, self.tick_blend)
+        self.draw_effects()
+
+    def render_dirty(self):
+        profiler = self.profiler
+        game_area = pygame.Rect(0, 0, Settings.WIDTH, Settings.HEIGHT - 60)
+        if self.dirty_all:
+            # Freeze the animated background once, then recompose everything from it
+            with profiler.phase('background'):
+                self.draw_background(self.static_layer, ticks() / 1000)
+            rects = [game_area]
+            self.dirty_all = False
+        else:
+            with profiler.phase('dirty cells'):
+                volatile = self.volatile_cells()
+                dirty = self.dirty_cells | volatile | self.prev_volatile_cells
+                self.prev_volatile_cells = volatile
+                rects = self.cells_to_rects(dirty) if dirty else []
+        self.dirty_cells = set()
+
+        with profiler.phase('regions'):
+            for rect in rects:
+                self.screen.set_clip(rect)
+                self.screen.blit(self.static_layer, rect, rect)
+                self.draw_region(rect)
+                self.glow.flush(self.screen)
+            self.screen.set_clip(None)
+
+        # Particles only ever cover dirty cells, this frame's or last frame's
+        with profiler.phase('particles'):
+            self.particles.draw(self.screen, self.frame_blend, self.camera)
+        with profiler.phase('hud'):
+            self.draw_hud()
+        self.draw_profile()
+        with profiler.phase('flip'):
+            pygame.display.update(rects + [pygame.Rect(0, Settings.HEIGHT - 60, Settings.WIDTH, 60)])
 
-        self.draw_obstacles()
+    def render(self):
+        profiler = self.profiler
+        if self.state == 'menu':
+            with profiler.phase('menu'):
+                self.draw_menu()
+            with profiler.phase('flip'):
+                pygame.display.flip()
+            self.dirty_all = True
+            return
+        if self.camera.scrolling:
+            self.follow_head()
+        # A scrolling view moves every pixel: it is always redrawn in full
+        if self.render_mode == 'dirty' and self.state == 'running' and not self.camera.scrolling:
+            self.render_dirty()
+            return
+        self.dirty_all = True
+        self.dirty_cells = set()
         
-        # Draw mines
-        for mine in self.mines:
-            mine.draw(self.screen, self.glow_layer)
+        current_time = ticks() / 1000  # Time in seconds
             
-        # Draw portals
-        for portal in self.portals:
-            portal.draw(self.screen, self.glow_layer)
-            
-        self.food.draw(self.screen, self.glow_layer)
-        self.snake.draw(self.screen, self.glow_layer)
+        with profiler.phase('background'):
+            self.draw_background(self.screen, current_time)
+
+        with profiler.phase('entities'):
+            self.draw_entities()
         
         # Draw effects
-        self.draw_effects()
+        with profiler.phase('effects'):
+            self.draw_effects()
+        
+        with profiler.phase('glow'):
+            self.glow.flush(self.screen)
         
         # Draw particles
-        for particle in self.particles:
-            particle.draw(self.screen)
+        with profiler.phase('particles'):
+            self.particles.draw(self.screen, self.frame_blend, self.camera)
 
-        self.screen.blit(self.glow_layer, (0, 0), special_flags=pygame.BLEND_RGB_ADD)
-        self.draw_hud()
+        with profiler.phase('hud'):
+            self.draw_hud()
 
         if self.state == 'pause':
             # Create a semi-transparent overlay
@@ -1329,16 +1253,15 @@ class Game:
             for offset in range(20, 0, -4):
                 alpha = 255 - offset * 10
                 size = 48 + offset + size_offset
-                pause_font = pygame.font.Font(Settings.FONT_NAME, size)
-                pause_text = pause_font.render('PAUSA', True, (*Settings.COLORS['title_glow'], alpha))
+                pause_text = self.text.render('PAUSA', size, (*Settings.COLORS['title_glow'], alpha))
                 text_rect = pause_text.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT // 2))
                 self.screen.blit(pause_text, text_rect)
                 
             # Draw main pause text
-            self.draw_center_text('PAUSA', self.big_font)
+            self.draw_center_text('PAUSA', 48)
             
             # Draw additional instructions
-            instructions = self.font.render('Premi ESC per tornare al menu', True, Settings.COLORS['hud'])
+            instructions = self.text.render('Premi ESC per tornare al menu', 24, Settings.COLORS['hud'])
             instr_rect = instructions.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT // 2 + 60))
             self.screen.blit(instructions, instr_rect)
             
@@ -1354,13 +1277,12 @@ class Game:
             for offset in range(20, 0, -4):
                 alpha = 255 - offset * 10
                 size = 48 + offset
-                font = pygame.font.Font(Settings.FONT_NAME, size)
-                text = font.render('GAME OVER', True, (*glow_color, alpha))
+                text = self.text.render('GAME OVER', size, (*glow_color, alpha))
                 text_rect = text.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT // 2 - 30))
                 self.screen.blit(text, text_rect)
             
             # Main game over text
-            game_over = self.big_font.render('GAME OVER', True, (255, 50, 50))
+            game_over = self.text.render('GAME OVER', 48, (255, 50, 50))
             game_over_rect = game_over.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT // 2 - 30))
             self.screen.blit(game_over, game_over_rect)
             
@@ -1372,7 +1294,7 @@ class Game:
             
             for i, char in enumerate(restart_text):
                 char_y = math.sin(current_time * 4 + i * 0.3) * 3
-                char_surf = self.font.render(char, True, Settings.COLORS['hud'])
+                char_surf = self.text.render(char, 24, Settings.COLORS['hud'])
                 text_surface.blit(char_surf, (x_offset, char_y))
                 x_offset += char_surf.get_width()
             
@@ -1380,24 +1302,113 @@ class Game:
             self.screen.blit(text_surface, text_rect)
             
             # Menu option
-            menu_text = self.font.render("Premi ESC per tornare al menu", True, Settings.COLORS['hud'])
+            menu_text = self.text.render("Premi ESC per tornare al menu", 24, Settings.COLORS['hud'])
             menu_rect = menu_text.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT // 2 + 70))
             self.screen.blit(menu_text, menu_rect)
 
-        pygame.display.flip()
+        self.draw_profile()
+        with profiler.phase('flip'):
+            pygame.display.flip()
 
-    def draw_center_text(self, text, font):
-        surf = font.render(text, True, Settings.COLORS['hud'])
+    def draw_profile(self):
+        # The F4 overlay: rolling percentiles per phase, redrawn once a second
+        if not self.show_profile:
+            return
+        if self.profile_overlay is None or self.pacer.frames % Settings.RENDER_FPS == 0:
+            rows = self.profiler.percentiles()
+            lines = [f"{'ms':<22}{'p50':>7}{'p95':>7}{'p99':>7}"]
+            lines += [f'{path:<22}{p50:7.2f}{p95:7.2f}{p99:7.2f}' for path, p50, p95, p99 in rows]
+            line_height = 16
+            overlay = pygame.Surface((300, line_height * len(lines) + 8), pygame.SRCALPHA)
+            overlay.fill((0, 0, 0, 180))
+            for i, line in enumerate(lines):
+                # Each line only changes once a second: not worth a text cache slot
+                overlay.blit(self.text.font(14).render(line, True, Settings.COLORS['hud']),
+                             (6, 4 + i * line_height))
+            self.profile_overlay = overlay
+        self.screen.blit(self.profile_overlay, (8, 8))
+
+    def draw_center_text(self, text, size):
+        surf = self.text.render(text, size, Settings.COLORS['hud'])
         rect = surf.get_rect(center=(Settings.WIDTH // 2, Settings.HEIGHT // 2))
         self.screen.blit(surf, rect)
 
+    def quit(self):
+        stats = self.pacer.stats()
+        if stats:
+            print(f"Frames: {stats['frames']} at {stats['target_ms']:.2f} ms target, "
+                  f"mean {stats['mean_ms']:.2f} ms, jitter {stats['jitter_ms']:.3f} ms, "
+                  f"p99 {stats['p99_ms']:.2f} ms, max {stats['max_ms']:.2f} ms, {stats['late']} late")
+        if self.profile_csv:
+            self.profiler.write_csv(self.profile_csv)
+            print(f'Wrote {len(self.profiler.frames)} profiled frames to {self.profile_csv}')
+        if self.profile_trace:
+            self.profiler.write_trace(self.profile_trace)
+            print(f'Wrote {len(self.profiler.frames)} profiled frames to {self.profile_trace}')
+        self.writer.close()  # Let queued scores and replays reach the disk
+        pygame.quit()
+        exit()
+
     def run(self):
+        ticks = FixedStep(self.engine.speed)
+        frames = FixedStep(Settings.ANIMATION_FPS)
+        profiler = self.profiler
         while True:
-            self.handle_events()
-            self.update()
-            self.render()
-            self.clock.tick(self.speed if self.state == 'running' else 30)
+            dt = self.pacer.wait()
+            # Input is sampled every rendered frame, not every tick
+            with profiler.phase('input'):
+                self.handle_events()
+            with profiler.phase('update'):
+                if self.state == 'running':
+                    ticks.rate = self.engine.speed
+                    for _ in range(ticks.advance(dt)):
+                        self.update()
+                        if self.state != 'running':
+                            break
+                else:
+                    ticks.reset()
+                    if (self.demo and self.state == 'gameover'
+                            and (time.perf_counter() - self.game_over_at) * 1000 > Settings.DEMO_RESTART_MS):
+                        self.reset()
+            with profiler.phase('animate'):
+                for _ in range(frames.advance(dt)):
+                    self.animate()
+            self.tick_blend = ticks.blend if self.state == 'running' else 1.0
+            self.frame_blend = frames.blend
+            if self.pacer.frames % Settings.RENDER_FPS == 0:
+                self.frame_stats = self.pacer.stats()
+            with profiler.phase('render'):
+                self.render()
+            profiler.end_frame()
+            if self.loader is None:
+                self.start_loading()
 
 
 if __name__ == '__main__':
-    Game().run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='CyberSnake')
+    parser.add_argument('--verify', metavar='DIR',
+                        help='re-simulate the replays in DIR and check their scores instead of playing')
+    parser.add_argument('--workers', type=int, help='processes for --verify (default: one per CPU)')
+    parser.add_argument('--profile-csv', metavar='FILE',
+                        help='profile every frame and write per-phase timings to FILE on quit')
+    parser.add_argument('--profile-trace', metavar='FILE',
+                        help='profile every frame and write a Chrome trace-event JSON to FILE on quit')
+    parser.add_argument('--grid', metavar='N|WxH',
+                        help=f'play an arena board of N x N (or W x H) cells, up to '
+                             f'{Settings.ARENA_MAX}, scrolled under the window')
+    parser.add_argument('--demo', action='store_true',
+                        help='let the autopilot play, starting a new game after each game over')
+    args = parser.parse_args()
+    if args.verify:
+        sys.exit(verify.main(args.verify, args.workers))
+    if args.grid:
+        try:
+            w, _, h = args.grid.lower().partition('x')
+            w, h = int(w), int(h or w)
+        except ValueError:
+            parser.error(f'--grid: expected N or WxH, got {args.grid!r}')
+        if not (Settings.VIEW_W <= w <= Settings.ARENA_MAX and Settings.VIEW_H <= h <= Settings.ARENA_MAX):
+            parser.error(f'--grid: sides go from {Settings.VIEW_W} to {Settings.ARENA_MAX}')
+        Settings.GRID_W, Settings.GRID_H = w, h
+        Settings.ARENA = (w, h) != (Settings.VIEW_W, Settings.VIEW_H)
+    Game(args.profile_csv, args.profile_trace, demo=args.demo).run()
\ No newline at end of file
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+'''
+CyberSnake - Leaderboards and background saving.
+Leaderboard keeps the best Settings.LEADERBOARD_SIZE games of each
+difficulty as (score, ticks, timestamp, replay file name) tuples, best
+first, and stores them in one JSON file: rows of plain lists rather than
+objects, so that thousands of entries load in a few milliseconds.
+Nothing is written from the game loop: BackgroundWriter hands the writes to
+a thread, which writes a temporary file next to the target, fsyncs it and
+renames it over the target. A crash leaves the old file or the new one,
+never half of one. Writes queued for the same path coalesce into the last.
+'''
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+FIELDS = ('score', 'ticks', 'time', 'replay')
+
+
+def atomic_write(path, data):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class BackgroundWriter:
+    '''
+    write(path, data) returns at once; data is bytes, or a function
+    returning them, called on the writer thread (to keep encoding off the
+    game loop too). close() waits for everything queued; writing after
+    that raises RuntimeError rather than queue data nothing would write.
+    '''
+    def __init__(self):
+        self.pending = {}  # path -> data, oldest first
+        self.condition = threading.Condition()
+        self.closing = False
+        self.thread = None
+        self.written = 0
+
+    def write(self, path, data):
+        with self.condition:
+            if self.closing:
+                raise RuntimeError(f'writer closed, {path} not saved')
+            self.pending.pop(path, None)  # The newer data goes to the back of the line
+            self.pending[path] = data
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='writer', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closing:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                path = next(iter(self.pending))
+                data = self.pending.pop(path)
+            try:
+                atomic_write(path, data() if callable(data) else data)
+                self.written += 1
+            except OSError as e:
+                print(f'Could not save {path}: {e}')
+
+    def close(self, timeout=5.0):
+        with self.condition:
+            self.closing = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+
+class Leaderboard:
+    '''
+    Per-difficulty top-size lists, saved through writer on every change.
+    When path does not exist yet, the single score of legacy_path (the old
+    highscore.txt) is carried over as a medium entry.
+    '''
+    def __init__(self, path, size, writer=None, legacy_path=None):
+        self.path = path
+        self.size = size
+        self.writer = writer or BackgroundWriter()
+        self.entries = {difficulty: [] for difficulty in DIFFICULTIES}
+        self.load(legacy_path)
+
+    def load(self, legacy_path=None):
+        try:
+            with open(self.path, 'rb') as f:
+                data = json.loads(f.read())
+        except FileNotFoundError:
+            self.import_legacy(legacy_path)
+            return
+        except (OSError, ValueError) as e:
+            print(f'Could not read {self.path}: {e}')
+            return
+        for difficulty in DIFFICULTIES:
+            rows = data.get(difficulty, [])
+            self.entries[difficulty] = [tuple(row) for row in rows[:self.size]]
+
+    def import_legacy(self, legacy_path):
+        if not legacy_path:
+            return
+        try:
+            with open(legacy_path) as f:
+                score = int(f.read())
+            stamp = os.path.getmtime(legacy_path)
+        except (OSError, ValueError):
+            return
+        if score > 0:
+            self.entries['medium'].append((score, 0, stamp, None))
+            self.save()
+
+    def best(self, difficulty):
+        entries = self.entries[difficulty]
+        return entries[0][0] if entries else 0
+
+    def top(self, difficulty, n=10):
+        return [dict(zip(FIELDS, entry)) for entry in self.entries[difficulty][:n]]
+
+    def add(self, difficulty, score, ticks, replay=None, stamp=None):
+        '''
+        Record a finished game; returns its rank (0 = best), or None when it
+        did not make the list.
+        '''
+        entry = (score, ticks, time.time() if stamp is None else stamp, replay)
+        entries = self.entries[difficulty]
+        # Higher scores first, the earlier game first on a tie
+        rank = bisect_right(entries, (-entry[0], entry[2]), key=lambda e: (-e[0], e[2]))
+        if rank >= self.size:
+            return None
+        entries.insert(rank, entry)
+        del entries[self.size:]
+        self.save()
+        return rank
+
+    def save(self):
+        # Shallow copies of lists of tuples: cheap here, encoded on the writer thread
+        snapshot = {difficulty: list(entries) for difficulty, entries in self.entries.items()}
+
+        def encode():
+            return json.dumps({'fields': FIELDS, **snapshot}, separators=(',', ':')).encode()
+        self.writer.write(self.path, encode)
+
+    def close(self):
+        self.writer.close()
@@ -0,0 +1,527 @@
+#!/usr/bin/env python3
+'''
+CyberSnake - LAN server with delta snapshots.
+Server runs the rules on asyncio at a fixed tick (Settings.SERVER_TICK_RATE):
+every connected player has a board of their own on the server, all of them
+advanced once per tick with the turns the players sent since the last one.
+After each tick every client gets only what changed on its board; the
+whole board goes out once, as deltas from an empty one, when a game starts.
+Mirror rebuilds the board on the client side from the deltas, inside an
+engine instance that is never stepped, so the game's drawing code can render
+it (python netplay.py --connect HOST:PORT) and bots can read it as they
+would a real engine.
+
+Frames, both ways: a varint length then the payload. Client to server: b'J'
+and a difficulty index to join, b'R' to start a new game after a game over,
+one byte 0-3 per turn (engine.DIRECTIONS); a client frame longer than
+MAX_FRAME closes the connection. Server to client: one frame per
+tick, a list of records, each an opcode byte and its varint arguments:
+  0-3 d    head moved one cell in direction d, the tail followed
+  4-7 d    head moved in direction d - 4, the snake grew
+  TELEPORT cell         the head came out of a portal at cell
+  OBSTACLE cell, MINE cell timer, PORTAL id cell cell, FOOD cell+1 kind
+                        spawns (food cell 0: no room left for food)
+  EAT gained            the food under the head was eaten
+  ARMED index, EXPLOSION index          mine timers
+  SHIELD ticks (0: off), SPEED fps, COMBO count, SCORE points
+  DIED cause            the game is over
+  RESET tick, SNAKE count cells..., DIRECTION d   a new game, from empty
+A tick where only the snake moved is one opcode in a two-byte frame. Cells
+are y * width + x. Mine arming timers, explosion and shield durations count
+down on the client as they do on the server; the records above settle
+every transition.
+Run: python netplay.py --serve [--port 5555] | --connect HOST:PORT [--difficulty hard]
+'''
+import argparse
+import asyncio
+import time
+from collections import deque
+
+from engine import DIRECTIONS, OBSTACLE, Engine, Settings, SnakeBody
+from replay import DIFFICULTIES, read_varint, write_varint
+
+# Record opcodes after the eight moves
+(TELEPORT, OBSTACLE_SPAWN, MINE_SPAWN, PORTAL_SPAWN, FOOD_SPAWN, EAT, ARMED, EXPLOSION,
+ SHIELD, SPEED, COMBO, SCORE, DIED, RESET, SNAKE, DIRECTION) = range(8, 24)
+GROW = 4  # Added to a move opcode when the tail stayed
+CAUSES = ('explosion', 'self', 'obstacle')
+MAX_FRAME = 2  # Longest frame the server takes from a client: a join
+
+
+def frame(payload):
+    out = bytearray()
+    write_varint(out, len(payload))
+    out += payload
+    return out
+
+
+def food_kind(food):
+    return 2 if food.shield else 1 if food.power else 0
+
+
+class Player:
+    '''One connection and its board, plus what the last delta left it at.'''
+    def __init__(self, writer, difficulty):
+        self.writer = writer
+        self.engine = Engine(difficulty)
+        self.turns = deque()
+        self.bytes_sent = 0
+        self.snapshot()
+
+    def snapshot(self):
+        engine, snake = self.engine, self.engine.snake
+        self.length = len(snake.positions)
+        self.obstacles, self.mines = len(engine.obstacles), len(engine.mines)
+        self.food = engine.food
+        self.shield = snake.shield_timer if snake.shield_active else 0
+        self.speed, self.combo = engine.speed, engine.combo_counter
+
+    def cell(self, pos):
+        return pos[1] * Settings.GRID_W + pos[0]
+
+    def spawns(self, out):
+        # Obstacles, mines and food added since the last delta
+        engine = self.engine
+        for pos in engine.obstacles[self.obstacles:]:
+            out.append(OBSTACLE_SPAWN)
+            write_varint(out, self.cell(pos))
+        for mine in engine.mines[self.mines:]:
+            out.append(MINE_SPAWN)
+            write_varint(out, self.cell(mine.position))
+            write_varint(out, mine.timer)
+            if mine.active:
+                out.append(ARMED)
+                write_varint(out, engine.mines.index(mine))
+        if engine.food is not self.food:
+            out.append(FOOD_SPAWN)
+            food = engine.food
+            write_varint(out, 0 if food.position is None else self.cell(food.position) + 1)
+            out.append(food_kind(food))
+
+    def timers(self, out):
+        engine, snake = self.engine, self.engine.snake
+        shield = snake.shield_timer if snake.shield_active else 0
+        # A shield counts down by one a tick, on both sides; anything else is news
+        if shield != max(self.shield - 1, 0):
+            out.append(SHIELD)
+            write_varint(out, shield)
+        if engine.speed != self.speed:
+            out.append(SPEED)
+            write_varint(out, engine.speed)
+        if engine.combo_counter != self.combo:
+            out.append(COMBO)
+            write_varint(out, engine.combo_counter)
+
+    def start(self):
+        '''The whole board, as deltas from an empty one.'''
+        engine = self.engine
+        out = bytearray([RESET])
+        write_varint(out, engine.tick)
+        out.append(SNAKE)
+        write_varint(out, len(engine.snake.positions))
+        for pos in engine.snake.positions:
+            write_varint(out, self.cell(pos))
+        out += bytes([DIRECTION, DIRECTIONS.index(engine.snake.direction)])
+        for portal in engine.portals:
+            out.append(PORTAL_SPAWN)
+            for n in (portal.id, self.cell(portal.position), self.cell(portal.pair_position)):
+                write_varint(out, n)
+        self.obstacles = self.mines = 0
+        self.food = None
+        self.spawns(out)
+        out.append(SCORE)
+        write_varint(out, engine.score)
+        self.shield, self.speed, self.combo = 0, None, 0
+        self.timers(out)
+        self.snapshot()
+        return out
+
+    def step(self):
+        '''Apply the queued turns, advance one tick and return its delta.'''
+        engine = self.engine
+        while self.turns:
+            direction = self.turns.popleft()
+            if direction != engine.snake.direction:
+                engine.turn(direction)
+        arming = [mine for mine in engine.ticking.values() if not mine.active]
+        events = engine.step()
+        snake = engine.snake
+
+        d = DIRECTIONS.index(snake.direction)
+        grew = len(snake.positions) > self.length
+        out = bytearray([d + GROW if grew else d])
+        for mine in arming:
+            if mine.active:
+                out.append(ARMED)
+                write_varint(out, engine.mines.index(mine))
+        died = None
+        for event in events:
+            kind = event['type']
+            if kind == 'teleport':
+                out.append(TELEPORT)
+                write_varint(out, self.cell(event['pos']))
+            elif kind == 'ate':
+                out.append(EAT)
+                write_varint(out, event['gained'])
+            elif kind == 'explosion':
+                out.append(EXPLOSION)
+                write_varint(out, engine.mines.index(engine.hazards[event['pos']]))
+            elif kind == 'died':
+                died = CAUSES.index(event['cause'])
+        self.spawns(out)
+        self.timers(out)
+        if died is not None:
+            out += bytes([DIED, died])
+        self.snapshot()
+        return out
+
+
+class Server:
+    '''
+    Accepts players on host:port and ticks every board at tick_rate. Frames
+    are queued on each connection's transport without waiting; a client
+    whose unsent backlog passes Settings.SERVER_MAX_BACKLOG bytes is
+    dropped, since a delta stream cannot skip ticks.
+    tick_times keeps the time each of the recent ticks took to run.
+    '''
+    def __init__(self, host='127.0.0.1', port=0, tick_rate=None):
+        self.host, self.port = host, port
+        self.period = 1 / (tick_rate or Settings.SERVER_TICK_RATE)
+        self.players = {}
+        self.tick_times = deque(maxlen=10000)
+        self.ticks = 0
+        self.dropped = 0
+        self.server = None
+        self.connections = {}  # Writer -> the task reading from it
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve(self):
+        '''Tick until cancelled.'''
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            start = time.perf_counter()
+            self.tick()
+            self.tick_times.append(time.perf_counter() - start)
+            deadline += self.period
+            # Late ticks are not made up for: the next one starts right away
+            deadline = max(deadline, loop.time())
+            await asyncio.sleep(deadline - loop.time())
+
+    def tick(self):
+        self.ticks += 1
+        for player in list(self.players.values()):
+            if player.engine.game_over:
+                continue
+            self.send(player, player.step())
+
+    def send(self, player, payload):
+        writer = player.writer
+        if writer.transport.get_write_buffer_size() > Settings.SERVER_MAX_BACKLOG:
+            self.dropped += 1
+            self.players.pop(writer, None)
+            writer.close()
+            return
+        data = frame(payload)
+        writer.write(data)
+        player.bytes_sent += len(data)
+
+    async def handle(self, reader, writer):
+        self.connections[writer] = asyncio.current_task()
+        try:
+            async for payload in frames(reader, MAX_FRAME):
+                player = self.players.get(writer)
+                if player is None:
+                    if payload[:1] != b'J' or len(payload) != 2 or payload[1] >= len(DIFFICULTIES):
+                        break
+                    player = self.players[writer] = Player(writer, DIFFICULTIES[payload[1]])
+                    self.send(player, player.start())
+                elif payload == b'R' and player.engine.game_over:
+                    player.engine.reset()
+                    player.turns.clear()
+                    self.send(player, player.start())
+                elif len(payload) == 1 and payload[0] < len(DIRECTIONS):
+                    player.turns.append(DIRECTIONS[payload[0]])
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self.players.pop(writer, None)
+            self.connections.pop(writer, None)
+            writer.close()
+
+    async def close(self):
+        # Closed connections end their readers, which then clean up after themselves
+        readers = list(self.connections.values())
+        for writer in self.connections:
+            writer.close()
+        await asyncio.gather(*readers, return_exceptions=True)
+        self.server.close()
+        await self.server.wait_closed()
+
+
+async def frames(reader, limit=None):
+    '''The payloads of the frames on reader, until it closes; ValueError past limit bytes.'''
+    while True:
+        head = bytearray()
+        while True:
+            byte = await reader.read(1)
+            if not byte:
+                return
+            head += byte
+            if byte[0] < 0x80:
+                break
+            if limit is not None and 1 << 7 * len(head) > limit:  # Needs another byte
+                raise ValueError('frame too long')
+        size, _ = read_varint(head, 0)
+        if limit is not None and size > limit:
+            raise ValueError(f'frame of {size} bytes, at most {limit} taken')
+        try:
+            yield await reader.readexactly(size)
+        except asyncio.IncompleteReadError:
+            return
+
+
+class Mirror:
+    '''
+    A board rebuilt from the server's deltas, in an engine of engine_class
+    (gioco.GameEngine to draw it) whose step() is never called.
+    '''
+    def __init__(self, engine_class=Engine, difficulty='medium'):
+        self.engine = engine_class(difficulty, 0)
+        self.clear(0)
+
+    def clear(self, tick):
+        engine = self.engine
+        engine.tick = tick
+        engine.score = engine.combo_counter = 0
+        engine.game_over, engine.death_cause = False, None
+        engine.obstacles, engine.mines, engine.portals = [], [], []
+        engine.hazards, engine.ticking = {}, {}
+        engine.explosion_cells = []
+        snake = engine.snake
+        snake.positions = SnakeBody(Settings.GRID_W, Settings.GRID_H)
+        snake.grow_pending = 0
+        snake.shield_active, snake.shield_timer = False, 0
+        engine.food.position = None
+
+    def pos(self, cell):
+        return (cell % Settings.GRID_W, cell // Settings.GRID_W)
+
+    def apply(self, payload):
+        '''Apply one tick's frame; returns the list of opcodes it held.'''
+        engine = self.engine
+        snake = engine.snake
+        if payload[0] != RESET:
+            engine.tick += 1
+            # Timers run on both sides; the records settle every change
+            for mine in engine.mines:
+                if not mine.active and mine.timer > 0:
+                    mine.timer -= 1
+                if mine.explosion_timer > 0:
+                    mine.explosion_timer -= 1
+            if snake.shield_active:
+                snake.shield_timer -= 1
+                snake.shield_active = snake.shield_timer > 0
+        ops = []
+        i = 0
+        while i < len(payload):
+            op = payload[i]
+            i += 1
+            ops.append(op)
+            if op < 8:
+                d = DIRECTIONS[op % GROW]
+                x, y = snake.head()
+                if op < GROW:
+                    snake.positions.pop()
+                snake.positions.appendleft(((x + d[0]) % Settings.GRID_W, (y + d[1]) % Settings.GRID_H))
+                snake.direction = d
+            elif op == TELEPORT:
+                cell, i = read_varint(payload, i)
+                snake.positions[0] = self.pos(cell)
+            elif op == OBSTACLE_SPAWN:
+                cell, i = read_varint(payload, i)
+                engine.obstacles.append(self.pos(cell))
+                engine.hazards[self.pos(cell)] = OBSTACLE
+            elif op == MINE_SPAWN:
+                cell, i = read_varint(payload, i)
+                mine = engine.mine_class()
+                mine.position = self.pos(cell)
+                mine.timer, i = read_varint(payload, i)
+                engine.mines.append(mine)
+                engine.hazards[mine.position] = mine
+            elif op == PORTAL_SPAWN:
+                portal_id, i = read_varint(payload, i)
+                portal = engine.portal_class(portal_id)
+                cell, i = read_varint(payload, i)
+                portal.position = self.pos(cell)
+                cell, i = read_varint(payload, i)
+                portal.pair_position = self.pos(cell)
+                engine.portals.append(portal)
+                engine.hazards[portal.position] = engine.hazards[portal.pair_position] = portal
+            elif op == FOOD_SPAWN:
+                cell, i = read_varint(payload, i)
+                kind = payload[i]
+                i += 1
+                engine.food = engine.food_class(power=kind == 1, shield=kind == 2)
+                engine.food.position = self.pos(cell - 1) if cell else None
+            elif op == EAT:
+                gained, i = read_varint(payload, i)
+                engine.score += gained
+            elif op == ARMED:
+                index, i = read_varint(payload, i)
+                engine.mines[index].active = True
+                engine.mines[index].timer = 0
+            elif op == EXPLOSION:
+                index, i = read_varint(payload, i)
+                engine.explosion_cells = engine.mines[index].explode()
+            elif op == SHIELD:
+                ticks, i = read_varint(payload, i)
+                snake.shield_active = ticks > 0
+                if ticks:
+                    snake.shield_timer = ticks
+            elif op in (SPEED, COMBO, SCORE):
+                value, i = read_varint(payload, i)
+                setattr(engine, {SPEED: 'speed', COMBO: 'combo_counter', SCORE: 'score'}[op], value)
+            elif op == DIED:
+                engine.game_over, engine.death_cause = True, CAUSES[payload[i]]
+                i += 1
+            elif op == RESET:
+                tick, i = read_varint(payload, i)
+                self.clear(tick)
+            elif op == SNAKE:
+                count, i = read_varint(payload, i)
+                for _ in range(count):
+                    cell, i = read_varint(payload, i)
+                    snake.positions.append(self.pos(cell))
+            elif op == DIRECTION:
+                snake.direction = DIRECTIONS[payload[i]]
+                i += 1
+            else:
+                raise ValueError(f'unknown record {op} in a server frame')
+        return ops
+
+    def differences(self, engine):
+        '''What the mirror shows differently from the server's engine (empty when in sync).'''
+        mine, theirs = self.engine, engine
+
+        def view(e):
+            snake = e.snake
+            return {
+                'tick': e.tick, 'score': e.score, 'speed': e.speed, 'combo': e.combo_counter,
+                'over': (e.game_over, e.death_cause), 'snake': list(snake.positions),
+                'direction': snake.direction,
+                'shield': snake.shield_timer if snake.shield_active else 0,
+                'food': (e.food.position, food_kind(e.food)), 'obstacles': e.obstacles,
+                'mines': [(m.position, m.timer, m.active, m.explosion_timer) for m in e.mines],
+                'portals': [(p.id, p.position, p.pair_position) for p in e.portals],
+                'blast': e.blast,
+            }
+        a, b = view(mine), view(theirs)
+        return [key for key in a if a[key] != b[key]]
+
+
+class Client:
+    '''A loopback or LAN connection: join(), then turn() and next_tick().'''
+    def __init__(self, engine_class=Engine):
+        self.engine_class = engine_class
+        self.mirror = None
+        self.bytes_received = 0
+
+    async def connect(self, host, port, difficulty='medium'):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.frames = frames(self.reader)
+        self.mirror = Mirror(self.engine_class, difficulty)
+        self.send(bytes([ord('J'), DIFFICULTIES.index(difficulty)]))
+        await self.next_tick()  # The starting board
+        return self
+
+    def send(self, payload):
+        self.writer.write(frame(payload))
+
+    def turn(self, direction):
+        self.send(bytes([DIRECTIONS.index(direction)]))
+
+    def restart(self):
+        self.send(b'R')
+
+    async def next_tick(self):
+        '''Wait for the next frame and apply it; returns its opcodes, None once disconnected.'''
+        try:
+            payload = await self.frames.__anext__()
+        except StopAsyncIteration:
+            return None
+        self.bytes_received += len(frame(payload))
+        return self.mirror.apply(payload)
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def serve(host, port):
+    server = await Server(host, port).start()
+    print(f'Serving on {host}:{server.port} at {1 / server.period:.0f} ticks/s')
+    await server.serve()
+
+
+async def watch(host, port, difficulty):
+    # The game's window and drawing, fed by a mirror instead of the rules
+    import pygame
+    from gioco import Game, GameEngine
+
+    client = await Client(GameEngine).connect(host, port, difficulty)
+    game = Game()
+    game.difficulty = difficulty
+    game.engine = client.mirror.engine
+    game.practice = True  # No records from here
+    keys = {pygame.K_UP: (0, -1), pygame.K_DOWN: (0, 1), pygame.K_LEFT: (-1, 0), pygame.K_RIGHT: (1, 0),
+            pygame.K_w: (0, -1), pygame.K_s: (0, 1), pygame.K_a: (-1, 0), pygame.K_d: (1, 0)}
+    ticks = asyncio.ensure_future(client.next_tick())
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                await client.close()
+                pygame.quit()
+                return
+            if event.type == pygame.KEYDOWN:
+                if event.key in keys:
+                    client.turn(keys[event.key])
+                elif event.key == pygame.K_r:
+                    client.restart()
+        if ticks.done():
+            if ticks.result() is None:
+                print('Disconnected')
+                pygame.quit()
+                return
+            ticks = asyncio.ensure_future(client.next_tick())
+        game.state = 'gameover' if game.engine.game_over else 'running'
+        game.render()
+        await asyncio.sleep(1 / Settings.RENDER_FPS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--serve', action='store_true', help='run a server')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5555)
+    parser.add_argument('--connect', metavar='HOST:PORT', help='play on a server')
+    parser.add_argument('--difficulty', default='medium', choices=DIFFICULTIES)
+    args = parser.parse_args()
+    if args.serve:
+        asyncio.run(serve(args.host, args.port))
+    elif args.connect:
+        host, _, port = args.connect.rpartition(':')
+        asyncio.run(watch(host, int(port), args.difficulty))
+    else:
+        parser.error('--serve or --connect HOST:PORT')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+'''
+CyberSnake - Frame pacing and fixed-rate stepping.
+FramePacer holds the render loop to a target frame rate with deadlines
+kept on time.perf_counter(): it sleeps for the bulk of the wait and spins
+through the last stretch, which OS sleeps are too coarse for. It keeps the
+recent frame intervals for jitter statistics.
+FixedStep turns the variable frame times into whole simulation steps of a
+fixed length and tells the renderer how far it is into the next one.
+ticks() is the clock the animations read: milliseconds like
+pygame.time.get_ticks(), which stays at 0 unless pygame.init() ran, and
+lazy startup leaves that out.
+'''
+import statistics
+import time
+from collections import deque
+
+START = time.perf_counter()
+
+
+def ticks():
+    '''Milliseconds since this module was loaded.'''
+    return int((time.perf_counter() - START) * 1000)
+
+
+class FramePacer:
+    def __init__(self, fps, spin=0.002, history=600):
+        self.period = 1 / fps
+        self.spin = spin  # Seconds before the deadline to stop sleeping and spin
+        self.intervals = deque(maxlen=history)
+        self.frames = 0
+        self.last = None
+        self.deadline = None
+
+    def wait(self):
+        '''Block until the next frame is due; returns the seconds since the previous one.'''
+        now = time.perf_counter()
+        if self.deadline is None:
+            self.last = self.deadline = now
+            return 0.0
+        self.deadline += self.period
+        if self.deadline < now - self.period:
+            # More than a frame behind: drop the missed deadlines instead of rushing through them
+            self.deadline = now
+        remaining = self.deadline - now - self.spin
+        if remaining > 0:
+            time.sleep(remaining)
+        while time.perf_counter() < self.deadline:
+            pass
+        now = time.perf_counter()
+        dt, self.last = now - self.last, now
+        self.intervals.append(dt)
+        self.frames += 1
+        return dt
+
+    def stats(self):
+        '''Frame interval statistics in milliseconds over the recent history.'''
+        intervals = sorted(self.intervals)
+        if len(intervals) < 2:
+            return None
+        target = self.period * 1000
+        ms = [i * 1000 for i in intervals]
+        mean = statistics.fmean(ms)
+        return {
+            'frames': len(ms),
+            'target_ms': target,
+            'mean_ms': mean,
+            'jitter_ms': statistics.pstdev(ms),  # Standard deviation of the intervals
+            'p99_ms': ms[min(len(ms) - 1, int(len(ms) * 0.99))],
+            'max_ms': ms[-1],
+            'late': sum(1 for i in ms if i > target * 1.5),
+        }
+
+
+class FixedStep:
+    '''
+    Accumulates frame time and hands it out in steps of 1/rate seconds. The
+    rate may change between frames (the snake speeds up); at most max_steps
+    are run per frame so a stall does not snowball into a burst of steps.
+    '''
+    def __init__(self, rate, max_steps=5):
+        self.rate = rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+
+    def advance(self, dt):
+        '''Add dt seconds; returns the number of steps now due.'''
+        step = 1 / self.rate
+        self.accumulator += dt
+        steps = int(self.accumulator / step)
+        if steps > self.max_steps:
+            steps = self.max_steps
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= steps * step
+        return steps
+
+    def reset(self):
+        self.accumulator = 0.0
+
+    @property
+    def blend(self):
+        '''Fraction of the next step already elapsed, for interpolation.'''
+        return min(1.0, self.accumulator * self.rate)
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+'''
+CyberSnake - Particle engine.
+ParticleSystem keeps every particle in preallocated NumPy arrays (position,
+velocity, life, pulse, color), updates them with vectorized operations,
+recycles dead slots through a free list and never holds more than its
+budget. Drawing alpha-blends all particles straight into the target surface
+through pygame.surfarray, one batch per particle radius; surfaces that are
+not 32-bit get one circle per particle instead, as ParticleList draws them.
+Both keep the previous update's positions so draw() can interpolate
+between updates when rendering runs faster than the particles are stepped.
+Without numpy, ParticleList offers the same interface over Particle objects.
+'''
+import math
+import random
+
+import pygame
+
+from engine import Settings
+
+try:
+    import numpy as np
+except ImportError:  # Fall back to ParticleList
+    np = None
+
+
+class Particle:
+    def __init__(self, x, y, color, size=2, lifetime=None, speed=None, direction=None):
+        self.x = self.prev_x = x
+        self.y = self.prev_y = y
+        self.color = color
+        self.size = size
+        self.lifetime = lifetime or random.randint(50, Settings.PARTICLE_LIFETIME)
+        self.max_lifetime = self.lifetime
+        self.speed = speed or random.uniform(0.5, Settings.PARTICLE_SPEED)
+
+        # Random direction if none provided
+        if direction is None:
+            angle = random.uniform(0, math.pi * 2)
+            self.dx = math.cos(angle) * self.speed
+            self.dy = math.sin(angle) * self.speed
+        else:
+            self.dx = direction[0] * self.speed
+            self.dy = direction[1] * self.speed
+
+        # For some visual variations
+        self.pulse_rate = random.uniform(0.03, 0.08)
+        self.pulse = random.uniform(0, 1)
+        self.pulse_dir = 1
+
+    def update(self):
+        self.lifetime -= 1
+        self.prev_x, self.prev_y = self.x, self.y
+        self.x += self.dx
+        self.y += self.dy
+
+        # Slow down over time
+        self.dx *= 0.98
+        self.dy *= 0.98
+
+        # Pulsate size
+        self.pulse += self.pulse_rate * self.pulse_dir
+        if self.pulse >= 1:
+            self.pulse_dir = -1
+        elif self.pulse <= 0:
+            self.pulse_dir = 1
+
+        return self.lifetime > 0
+
+    def draw(self, surface, blend=1.0, camera=None):
+        # Position interpolated blend of the way from the previous update
+        x = self.prev_x + (self.x - self.prev_x) * blend
+        y = self.prev_y + (self.y - self.prev_y) * blend
+        if camera is not None:
+            x, y = camera.project_x(x), camera.project_y(y)
+            width, height = surface.get_size()
+            r = self.size * 2
+            if not (-r < x < width + r and -r < y < height + r):
+                return
+
+        # Get alpha based on remaining lifetime
+        alpha = int(255 * (self.lifetime / self.max_lifetime))
+
+        # Get size with pulse effect
+        current_size = self.size * (0.8 + 0.4 * self.pulse)
+
+        # Create a surface for this particle with alpha
+        if isinstance(self.color, tuple) and len(self.color) == 4:
+            # If color already has alpha
+            particle_color = (self.color[0], self.color[1], self.color[2],
+                             min(self.color[3], alpha))
+        else:
+            # Add alpha to the color
+            particle_color = (*self.color[:3], alpha)
+
+        # Draw on surface
+        pygame.draw.circle(surface, particle_color,
+                         (int(x), int(y)), int(current_size))
+
+
+def _uniform(bounds):
+    return random.uniform(*bounds) if isinstance(bounds, tuple) else bounds
+
+
+class ParticleList:
+    '''
+    One Particle object per particle, drawn one circle at a time.
+    emit() arguments are documented on ParticleSystem.emit.
+    '''
+    def __init__(self, budget=None):
+        self.budget = budget or Settings.PARTICLE_BUDGET
+        self.particles = []
+
+    def __len__(self):
+        return len(self.particles)
+
+    def clear(self):
+        self.particles = []
+
+    def emit(self, count, x, y, color, size, lifetime, speed=None,
+             box=(0, 0), ring=None, outward=False):
+        count = min(count, self.budget - len(self.particles))
+        for _ in range(count):
+            px = _uniform(x) + random.uniform(-box[0], box[0])
+            py = _uniform(y) + random.uniform(-box[1], box[1])
+            direction = None
+            if ring is not None:
+                angle = random.uniform(0, math.pi * 2)
+                distance = random.uniform(*ring)
+                px += math.cos(angle) * distance
+                py += math.sin(angle) * distance
+                if outward:
+                    direction = (math.cos(angle), math.sin(angle))
+            self.particles.append(Particle(
+                px, py, random.choice(color) if isinstance(color, list) else color,
+                random.uniform(*size), random.randint(*lifetime),
+                _uniform(speed), direction))
+
+    def update(self):
+        self.particles = [p for p in self.particles if p.update()]
+
+    def draw(self, surface, blend=1.0, camera=None):
+        for particle in self.particles:
+            particle.draw(surface, blend, camera)
+
+    def covered_cells(self, cell_size, cols, rows):
+        cells = set()
+        for p in self.particles:
+            r = p.size * 1.2 + 1
+            x0, x1 = min(p.x, p.prev_x) - r, max(p.x, p.prev_x) + r
+            y0, y1 = min(p.y, p.prev_y) - r, max(p.y, p.prev_y) + r
+            for cx in {int(x0 // cell_size), int(x1 // cell_size)}:
+                for cy in {int(y0 // cell_size), int(y1 // cell_size)}:
+                    if 0 <= cx < cols and 0 <= cy < rows:
+                        cells.add((cx, cy))
+        return cells
+
+
+class ParticleSystem:
+    '''
+    Structure-of-arrays particle pool with a fixed budget.
+    Live particles are flagged in alive[]; free slots are a stack, so emitting
+    and retiring particles never allocates. Emissions beyond the budget are
+    dropped.
+    '''
+    def __init__(self, budget=None, seed=None):
+        self.budget = budget = budget or Settings.PARTICLE_BUDGET
+        self.rng = np.random.default_rng(seed)
+        self.x = np.zeros(budget, np.float32)
+        self.y = np.zeros(budget, np.float32)
+        self.prev_x = np.zeros(budget, np.float32)  # Positions before the last update
+        self.prev_y = np.zeros(budget, np.float32)
+        self.dx = np.zeros(budget, np.float32)
+        self.dy = np.zeros(budget, np.float32)
+        self.life = np.zeros(budget, np.int32)
+        self.max_life = np.ones(budget, np.int32)
+        self.size = np.zeros(budget, np.float32)
+        self.pulse = np.zeros(budget, np.float32)
+        self.pulse_rate = np.zeros(budget, np.float32)  # Signed: the sign is the pulse direction
+        self.color = np.zeros((budget, 3), np.int16)
+        self.alive = np.zeros(budget, bool)
+        self.free = np.arange(budget)[::-1].copy()  # Stack of free slots
+        self.free_top = budget
+        self.stamps = {}  # Pixel offsets of a filled circle, per radius
+
+    def __len__(self):
+        return self.budget - self.free_top
+
+    def clear(self):
+        self.alive[:] = False
+        self.free = np.arange(self.budget)[::-1].copy()
+        self.free_top = self.budget
+
+    def emit(self, count, x, y, color, size, lifetime, speed=None,
+             box=(0, 0), ring=None, outward=False):
+        '''
+        Spawn count particles around (x, y).
+        x, y, speed: a value or a (low, high) range sampled per particle
+        color: an RGB tuple, or a list of them to pick from per particle
+        size, lifetime: (low, high) ranges; lifetime is in updates, inclusive
+        speed: defaults to (0.5, Settings.PARTICLE_SPEED)
+        box: (half width, half height) of a uniform position jitter
+        ring: (min, max) distance of a polar offset at a random angle;
+              with outward=True particles fly away along that angle
+        Returns the number actually emitted, which the budget may cap.
+        '''
+        n = min(count, self.free_top)
+        if n <= 0:
+            return 0
+        rng = self.rng
+        slots = self.free[self.free_top - n:self.free_top]
+        self.free_top -= n
+
+        px = self._sample(x, n) + rng.uniform(-box[0], box[0], n)
+        py = self._sample(y, n) + rng.uniform(-box[1], box[1], n)
+        angle = rng.uniform(0, math.pi * 2, n)
+        if ring is not None:
+            distance = rng.uniform(ring[0], ring[1], n)
+            px += np.cos(angle) * distance
+            py += np.sin(angle) * distance
+            if not outward:
+                angle = rng.uniform(0, math.pi * 2, n)
+        velocity = self._sample(speed if speed is not None else (0.5, Settings.PARTICLE_SPEED), n)
+
+        self.x[slots] = self.prev_x[slots] = px
+        self.y[slots] = self.prev_y[slots] = py
+        self.dx[slots] = np.cos(angle) * velocity
+        self.dy[slots] = np.sin(angle) * velocity
+        self.life[slots] = self.max_life[slots] = rng.integers(lifetime[0], lifetime[1] + 1, n)
+        self.size[slots] = rng.uniform(size[0], size[1], n)
+        self.pulse[slots] = rng.uniform(0, 1, n)
+        self.pulse_rate[slots] = rng.uniform(0.03, 0.08, n)
+        if isinstance(color, list):
+            self.color[slots] = np.array(color)[rng.integers(0, len(color), n), :3]
+        else:
+            self.color[slots] = color[:3]
+        self.alive[slots] = True
+        return n
+
+    def _sample(self, value, n):
+        if isinstance(value, tuple):
+            return self.rng.uniform(value[0], value[1], n)
+        return np.full(n, value, np.float64)
+
+    def update(self):
+        if self.free_top == self.budget:
+            return
+        # Dead slots are updated too: cheaper than gathering the live ones
+        self.life -= 1
+        self.prev_x[:] = self.x
+        self.prev_y[:] = self.y
+        self.x += self.dx
+        self.y += self.dy
+
+        # Slow down over time
+        self.dx *= 0.98
+        self.dy *= 0.98
+
+        # Pulsate size, bouncing between 0 and 1
+        self.pulse += self.pulse_rate
+        flip = ((self.pulse >= 1) & (self.pulse_rate > 0)) | ((self.pulse <= 0) & (self.pulse_rate < 0))
+        self.pulse_rate[flip] *= -1
+
+        # Retire dead particles onto the free stack
+        dead = np.flatnonzero(self.alive & (self.life <= 0))
+        if len(dead):
+            self.alive[dead] = False
+            self.free[self.free_top:self.free_top + len(dead)] = dead
+            self.free_top += len(dead)
+
+    def covered_cells(self, cell_size, cols, rows):
+        '''Grid cells (x, y) that live particles can touch, for dirty-rectangle rendering.'''
+        live = np.flatnonzero(self.alive)
+        if not len(live):
+            return set()
+        r = self.size[live] * 1.2 + 1  # Upper bound of the drawn radius
+        x, prev_x = self.x[live], self.prev_x[live]
+        y, prev_y = self.y[live], self.prev_y[live]
+        cells = []
+        # Particles are drawn anywhere between their previous and current position
+        for px in (np.minimum(x, prev_x) - r, np.maximum(x, prev_x) + r):
+            for py in (np.minimum(y, prev_y) - r, np.maximum(y, prev_y) + r):
+                cx = (px // cell_size).astype(np.int64)
+                cy = (py // cell_size).astype(np.int64)
+                inside = (cx >= 0) & (cx < cols) & (cy >= 0) & (cy < rows)
+                cells.append(cy[inside] * cols + cx[inside])
+        return {(int(c) % cols, int(c) // cols) for c in np.unique(np.concatenate(cells))}
+
+    def stamp(self, radius):
+        if radius not in self.stamps:
+            r = np.arange(-radius, radius + 1)
+            ox, oy = np.meshgrid(r, r, indexing='ij')
+            inside = ox * ox + oy * oy <= radius * radius
+            self.stamps[radius] = (ox[inside], oy[inside])
+        return self.stamps[radius]
+
+    def draw(self, surface, blend=1.0, camera=None):
+        '''
+        Draw live particles blend of the way from their previous to their
+        current position. With a camera, positions are board pixels seen
+        through it, and particles out of the surface are culled up front.
+        '''
+        live = np.flatnonzero(self.alive)
+        if not len(live):
+            return
+        radius = (self.size[live] * (0.8 + 0.4 * self.pulse[live])).astype(np.int32)
+        if blend == 1.0:
+            x, y = self.x[live], self.y[live]
+        else:
+            prev_x, prev_y = self.prev_x[live], self.prev_y[live]
+            x = prev_x + (self.x[live] - prev_x) * blend
+            y = prev_y + (self.y[live] - prev_y) * blend
+        if camera is not None:
+            x, y = camera.project_x(x), camera.project_y(y)
+        cx, cy = x.astype(np.int32), y.astype(np.int32)
+        width, height = surface.get_size()
+        visible = ((radius > 0) & (cx + radius >= 0) & (cx - radius < width)
+                   & (cy + radius >= 0) & (cy - radius < height))
+        live, radius, cx, cy = live[visible], radius[visible], cx[visible], cy[visible]
+        if not len(live):
+            return
+        alpha = (self.life[live] * 255 // self.max_life[live]).astype(np.uint32)
+        color = self.color[live].astype(np.uint32)
+        if surface.get_bytesize() != 4:
+            # The packed-pixel blend below needs 32-bit pixels
+            for c, a, x, y, r in zip(color.tolist(), alpha.tolist(), cx.tolist(), cy.tolist(),
+                                     radius.tolist()):
+                pygame.draw.circle(surface, (*c, a), (x, y), r)
+            return
+        shifts = surface.get_shifts()[:3]
+
+        # Blend in the surface's own packed pixel format, one channel at a time
+        pixels = pygame.surfarray.pixels2d(surface)
+        # Rows are contiguous unless the surface is padded: index it flat then
+        flat = pixels.T.reshape(-1) if surface.get_pitch() == width * 4 else None
+        try:
+            for r in np.unique(radius):
+                group = np.flatnonzero(radius == r)
+                ox, oy = self.stamp(int(r))
+                px = (cx[group, None] + ox).ravel()
+                py = (cy[group, None] + oy).ravel()
+                inside = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+                owner = np.repeat(group, len(ox))[inside]
+                px, py = px[inside], py[inside]
+                a = alpha[owner]
+                if flat is not None:
+                    index = py * width + px
+                    dst = flat[index].astype(np.uint32)
+                else:
+                    dst = pixels[px, py].astype(np.uint32)
+                out = np.zeros_like(dst)
+                for channel, shift in enumerate(shifts):
+                    d = (dst >> shift) & 0xff
+                    c = color[owner, channel]
+                    out |= ((d * (255 - a) + c * a) // 255) << shift
+                if flat is not None:
+                    flat[index] = out
+                else:
+                    pixels[px, py] = out
+        finally:
+            del pixels, flat  # Unlock the surface
+
+
+def create_particle_system(budget=None):
+    if np is None:
+        return ParticleList(budget)
+    return ParticleSystem(budget)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+'''
+CyberSnake - Per-phase frame profiler.
+Code to measure is wrapped in `with profiler.phase('name'):` blocks, which
+nest: a phase opened inside 'render' is recorded as 'render/name'. Time
+spent in a phase is summed over each frame (a frame may run several ticks)
+and end_frame() pushes the sums into rolling windows for the p50/p95/p99
+shown by the overlay. The last frames are also kept for export as CSV (one
+row per frame, one column per phase) or as a Chrome trace-event JSON file
+(chrome://tracing, Perfetto).
+While disabled, phase() hands back one shared no-op context manager and
+end_frame() returns at once, so the instrumentation can stay in place.
+'''
+import csv
+import json
+import time
+from collections import deque
+from contextlib import nullcontext
+
+NULL_PHASE = nullcontext()
+
+
+class Phase:
+    __slots__ = ('profiler', 'name', 'path', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        stack = self.profiler.stack
+        self.path = f'{stack[-1].path}/{self.name}' if stack else self.name
+        stack.append(self)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        profiler = self.profiler
+        profiler.stack.pop()
+        totals = profiler.totals
+        totals[self.path] = totals.get(self.path, 0.0) + (end - self.start)
+        if profiler.keep:
+            profiler.spans.append((self.path, self.start, end - self.start))
+
+
+class Profiler:
+    '''
+    history frames feed the percentiles; keep frames (0 for none) are kept
+    with every span for write_csv() and write_trace().
+    '''
+    def __init__(self, history=600, keep=3600):
+        self.enabled = False
+        self.history = history
+        self.keep = keep
+        self.phases = {}  # name -> its reusable Phase
+        self.stack = []
+        self.reset()
+
+    def reset(self):
+        self.samples = {}  # path -> recent per-frame milliseconds, in first-seen order
+        self.frames = deque(maxlen=self.keep or 1)  # (frame start, {path: seconds}, spans)
+        self.totals = {}
+        self.spans = []
+        self.frame_start = time.perf_counter()
+        self.count = 0
+
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_PHASE
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = Phase(self, name)
+        return phase
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        totals, spans = self.totals, self.spans
+        for path in totals.keys() - self.samples.keys():
+            self.samples[path] = deque(maxlen=self.history)
+        for path, window in self.samples.items():
+            window.append(totals.get(path, 0.0) * 1000)
+        if self.keep:
+            self.frames.append((self.frame_start, totals, spans))
+        self.totals, self.spans = {}, []
+        self.frame_start = time.perf_counter()
+        self.count += 1
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        if self.enabled:
+            self.reset()
+        return self.enabled
+
+    def percentiles(self):
+        '''[(path, p50, p95, p99)] in milliseconds, parents before their children.'''
+        rows = []
+        for path in sorted(self.samples):
+            ms = sorted(self.samples[path])
+            n = len(ms) - 1
+            rows.append((path, ms[n // 2], ms[int(n * 0.95)], ms[int(n * 0.99)]))
+        return rows
+
+    def write_csv(self, path):
+        columns = sorted(self.samples)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'start_ms'] + [f'{c}_ms' for c in columns])
+            first = self.frames[0][0] if self.frames else 0.0
+            for i, (start, totals, _) in enumerate(self.frames):
+                writer.writerow([i, f'{(start - first) * 1000:.3f}']
+                                + [f'{totals.get(c, 0.0) * 1000:.4f}' for c in columns])
+
+    def write_trace(self, path):
+        # Complete ('X') events, timestamps and durations in microseconds
+        first = self.frames[0][0] if self.frames else 0.0
+        events = []
+        for start, _, spans in self.frames:
+            for name, begin, duration in spans:
+                events.append({'name': name.rsplit('/', 1)[-1], 'cat': name, 'ph': 'X',
+                               'ts': round((begin - first) * 1e6, 1),
+                               'dur': round(duration * 1e6, 1), 'pid': 1, 'tid': 1})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+'''
+CyberSnake - Input replays.
+A game is fully determined by its seed, its difficulty and the turns the
+player made, each tagged with the tick it came before (see engine.Engine).
+A replay stores exactly that:
+
+  magic b'CSNR', format version (1 byte), difficulty (1 byte),
+  seed, tick count, claimed score + 1 or 0 if none, turn count (varints),
+  one varint per turn: ticks since the previous turn << 2 | direction,
+  keyframe count, then per keyframe its tick, its size and its state
+
+Varints are unsigned LEB128. A turn costs one byte unless more than 31
+ticks passed since the one before. Replay.run() feeds the turns back into
+a fresh engine at the same ticks and reproduces the game frame for frame;
+verify.py checks the claimed score and death tick that way.
+
+Keyframes are optional snapshots of the whole engine state (zlib-packed,
+~4.5 KB each, mostly the random generator and free-cell order) every
+Settings.REPLAY_KEYFRAME_TICKS ticks. Replay.seek() restores the last one
+before the target and simulates at most that many ticks from there.
+They are a convenience for scrubbing, so games are saved without them:
+the first seek() builds them by playing the replay once. verify.py
+ignores them and re-simulates from the seed.
+'''
+import json
+import sys
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+
+from engine import DIRECTIONS, Engine, Settings
+
+MAGIC = b'CSNR'
+VERSION = 3  # 2 added the claimed score, 3 the keyframes
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+
+def write_varint(out, n):
+    while n >= 0x80:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def read_varint(data, pos):
+    '''Decode the varint at data[pos]; returns (value, position after it).'''
+    n = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError('truncated replay')
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _little_endian(a):
+    if sys.byteorder == 'big':
+        a.byteswap()
+    return a
+
+
+def pack_state(state):
+    '''Engine.get_state() as compact bytes: JSON for the scalars, raw arrays for the rest.'''
+    state = dict(state)
+    version, internal, gauss_next = state.pop('rng')
+    cells, counts, free = state.pop('free_cells')
+    typecode = 'H' if len(cells) <= 1 << 16 else 'i'  # Cell indices fit 16 bits on normal boards
+    meta = dict(state, rng=[version, gauss_next], free=free, cells=typecode)
+    meta = json.dumps(meta, separators=(',', ':')).encode()
+    out = bytearray()
+    write_varint(out, len(meta))
+    out += meta
+    out += _little_endian(array('I', internal)).tobytes()
+    out += _little_endian(array(typecode, cells)).tobytes()
+    out += counts
+    return zlib.compress(bytes(out))
+
+
+def unpack_state(blob):
+    data = zlib.decompress(blob)
+    size, pos = read_varint(data, 0)
+    state = json.loads(data[pos:pos + size])
+    pos += size
+    internal = array('I')
+    internal.frombytes(data[pos:pos + 625 * 4])  # 624 Mersenne Twister words and the index
+    pos += 625 * 4
+    cells = array(state.pop('cells'))
+    n = Settings.GRID_W * Settings.GRID_H * cells.itemsize
+    cells.frombytes(data[pos:pos + n])
+    counts = data[pos + n:]
+    version, gauss_next = state.pop('rng')
+    state['rng'] = (version, tuple(_little_endian(internal)), gauss_next)
+    state['free_cells'] = (array('i', _little_endian(cells)), counts, state.pop('free'))
+    return state
+
+
+class Replay:
+    '''
+    seed, difficulty, the number of ticks played and the turns as
+    (tick, direction) pairs, tick being engine.tick when the turn was made.
+    A recording game calls record() on every turn and sets ticks (and the
+    score it claims, if any) at the end. keyframes are (tick, packed
+    state) pairs, in tick order, built by the first seek() that lacks
+    them; they are only unpacked when seek() needs one.
+    '''
+    def __init__(self, seed, difficulty, turns=None, ticks=0, score=None, keyframes=None):
+        self.seed = seed
+        self.difficulty = difficulty
+        self.turns = turns if turns is not None else []
+        self.ticks = ticks
+        self.score = score
+        self.keyframes = keyframes if keyframes is not None else []
+
+    def record(self, tick, direction):
+        self.turns.append((tick, direction))
+
+    def add_keyframe(self, engine):
+        '''Snapshot engine as it is before the turns of engine.tick are applied.'''
+        self.keyframes.append((engine.tick, pack_state(engine.get_state())))
+
+    def build_keyframes(self, interval=None):
+        '''(Re)build the keyframes by simulating the game once.'''
+        interval = interval or Settings.REPLAY_KEYFRAME_TICKS
+        self.keyframes = []
+        engine = Engine(self.difficulty, self.seed)
+        for _ in self.advance(engine, self.ticks, interval):
+            pass
+
+    def to_bytes(self):
+        out = bytearray(MAGIC)
+        out += bytes((VERSION, DIFFICULTIES.index(self.difficulty)))
+        write_varint(out, self.seed)
+        write_varint(out, self.ticks)
+        write_varint(out, 0 if self.score is None else self.score + 1)
+        write_varint(out, len(self.turns))
+        previous = 0
+        for tick, direction in self.turns:
+            write_varint(out, (tick - previous) << 2 | DIRECTIONS.index(tuple(direction)))
+            previous = tick
+        write_varint(out, len(self.keyframes))
+        for tick, blob in self.keyframes:
+            write_varint(out, tick)
+            write_varint(out, len(blob))
+            out += blob
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:4] != MAGIC:
+            raise ValueError('not a CyberSnake replay')
+        version = data[4]
+        if not 1 <= version <= VERSION:
+            raise ValueError(f'unsupported replay version {version}')
+        difficulty = DIFFICULTIES[data[5]]
+        seed, pos = read_varint(data, 6)
+        ticks, pos = read_varint(data, pos)
+        score = None
+        if version >= 2:
+            score, pos = read_varint(data, pos)
+            score = score - 1 if score else None
+        count, pos = read_varint(data, pos)
+        turns = []
+        tick = 0
+        for _ in range(count):
+            packed, pos = read_varint(data, pos)
+            tick += packed >> 2
+            turns.append((tick, DIRECTIONS[packed & 3]))
+        keyframes = []
+        if version >= 3:
+            count, pos = read_varint(data, pos)
+            for _ in range(count):
+                tick, pos = read_varint(data, pos)
+                size, pos = read_varint(data, pos)
+                keyframes.append((tick, data[pos:pos + size]))
+                pos += size
+        return cls(seed, difficulty, turns, ticks, score, keyframes)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    def play(self, engine=None):
+        '''
+        Drive engine (a new Engine by default) through the recorded game,
+        yielding the events of every tick. The engine is reset to the
+        replay's seed and difficulty first.
+        '''
+        if engine is None:
+            engine = Engine(self.difficulty, self.seed)
+        else:
+            engine.reset(self.difficulty, self.seed)
+        yield from self.advance(engine, self.ticks)
+
+    def advance(self, engine, until, keyframe_interval=0):
+        '''
+        Step engine, which must be somewhere in this game, up to tick until
+        (or its death), yielding the events of every tick. With
+        keyframe_interval, a keyframe is added every that many ticks.
+        '''
+        turns = self.turns
+        i = bisect_left(turns, engine.tick, key=lambda turn: turn[0])
+        while engine.tick < until and not engine.game_over:
+            if keyframe_interval and engine.tick and engine.tick % keyframe_interval == 0:
+                self.add_keyframe(engine)
+            while i < len(turns) and turns[i][0] == engine.tick:
+                engine.turn(turns[i][1])
+                i += 1
+            yield engine.step()
+
+    def seek(self, tick, engine=None):
+        '''
+        The engine as it was at tick (before that tick's turns): restored
+        from the last keyframe at or before it, then simulated forward.
+        '''
+        if not self.keyframes and self.ticks > Settings.REPLAY_KEYFRAME_TICKS:
+            self.build_keyframes()
+        if engine is None:
+            engine = Engine(self.difficulty, self.seed)
+        k = bisect_right(self.keyframes, tick, key=lambda keyframe: keyframe[0])
+        if k:
+            engine.set_state(unpack_state(self.keyframes[k - 1][1]))
+        else:
+            engine.reset(self.difficulty, self.seed)
+        for _ in self.advance(engine, min(tick, self.ticks)):
+            pass
+        return engine
+
+    def run(self, engine=None):
+        '''Replay the whole game; returns the engine in its final state.'''
+        if engine is None:
+            engine = Engine(self.difficulty, self.seed)
+        for _ in self.play(engine):
+            pass
+        return engine
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        return Replay.from_bytes(f.read())
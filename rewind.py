@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+'''
+CyberSnake - Practice rewind.
+Rewind drives an engine.Engine and remembers how to take every tick back:
+per tick it keeps only what the tick changed (a Delta): the head it added
+and the tail it dropped, the free-cell swaps, how many obstacles and mines
+existed, the mines whose timers moved, the food and explosion it replaced,
+the random generator state when it was drawn from, and the scalars
+(score, speed, timers, direction...) as they were before the tick and its
+turns. Undoing a tick applies that back in O(delta).
+
+Every Settings.REWIND_SNAPSHOT_TICKS ticks a full Engine.get_state() is kept
+as well, with the turns made since: past the oldest delta (dropped to stay
+under Settings.REWIND_MEMORY_KB) a rewind restores a snapshot and replays
+the turns forward instead. Nothing older than Settings.REWIND_SECONDS of
+game time is kept. A snapshot grows with the board (the free-cell arrays):
+on arena boards where one would take more than a quarter of the budget,
+none are kept and the deltas alone reach back.
+'''
+from collections import deque
+
+ENGINE_FIELDS = ('tick', 'score', 'speed', 'game_over', 'death_cause', 'elapsed_ms',
+                 'last_direction_change', 'combo_counter', 'combo_timer', 'power_timer')
+SNAKE_FIELDS = ('direction', 'grow_pending', 'shield_active', 'shield_timer')
+
+# Rough CPython footprints used for the memory cap, in bytes
+DELTA_BYTES = 400  # The Delta, its scalar tuples and a few references
+LOG_ENTRY_BYTES = 100  # A free-cell journal entry: a 4-tuple of ints plus the list slot
+MINE_BYTES = 120  # A changed mine: index and its (timer, active, explosion_timer)
+RNG_BYTES = 5200  # Random.getstate(): 625 ints in a tuple
+SNAPSHOT_BYTES = 11500  # A full get_state() on top of its free-cell arrays
+CELL_BYTES = 5  # Per board cell in those arrays: a 4-byte index and a 1-byte count
+
+
+class Delta:
+    '''What one tick changed, enough to undo it.'''
+    __slots__ = ('scalars', 'snake', 'tail', 'length', 'obstacles', 'mines', 'mine_fields',
+                 'food', 'explosion_cells', 'rng', 'log', 'size')
+
+    def __init__(self):
+        self.tail = None
+        self.mine_fields = ()
+        self.food = None
+        self.explosion_cells = None
+        self.rng = None
+
+
+class Rewind:
+    '''
+    Wraps an engine: call turn() and step() instead of the engine's own, and
+    rewind() to go back. Deltas are pure data, so they survive the engine
+    being restored from a snapshot with new entity objects.
+    '''
+    def __init__(self, engine, seconds, memory_kb, snapshot_ticks):
+        self.engine = engine
+        self.window_ms = seconds * 1000
+        self.budget = memory_kb * 1024
+        self.snapshot_ticks = snapshot_ticks
+        self.reset()
+
+    def reset(self):
+        '''Forget everything; the engine's current state is the earliest reachable.'''
+        self.deltas = deque()  # Newest last; deltas[i] takes tick t back to t - 1
+        self.snapshots = deque()  # (tick, elapsed_ms, state), oldest first
+        self.turns = deque()  # (tick, direction) since the oldest snapshot
+        self.memory = 0
+        self.snapshot_bytes = SNAPSHOT_BYTES + CELL_BYTES * len(self.engine.free_cells.counts)
+        self.snapshotting = self.snapshot_bytes * 4 <= self.budget
+        self.scalars = self.capture()
+        self.rng_state = self.engine.rng.getstate()
+        self.snapshot()
+
+    def capture(self):
+        engine, snake = self.engine, self.engine.snake
+        return (tuple([getattr(engine, key) for key in ENGINE_FIELDS]),
+                tuple([getattr(snake, key) for key in SNAKE_FIELDS]))
+
+    def snapshot(self):
+        if not self.snapshotting:
+            return
+        self.snapshots.append((self.engine.tick, self.engine.elapsed_ms, self.engine.get_state()))
+        self.memory += self.snapshot_bytes
+
+    def turn(self, direction):
+        if self.snapshotting:  # Only replaying from a snapshot needs them
+            self.turns.append((self.engine.tick, direction))
+        self.engine.turn(direction)
+
+    def step(self):
+        '''engine.step(), remembering how to undo it. Returns its events.'''
+        engine = self.engine
+        if engine.game_over:
+            return []
+        snake = engine.snake
+        free_cells = engine.free_cells
+        delta = Delta()
+        delta.scalars, delta.snake = self.scalars
+        delta.length = len(snake.positions)
+        tail = snake.positions[-1]
+        delta.obstacles = len(engine.obstacles)
+        delta.mines = len(engine.mines)
+        # Only mines with running timers change, besides one blowing up
+        mine_fields = [(i, (m.timer, m.active, m.explosion_timer)) for i, m in engine.ticking.items()]
+        food, explosion_cells = engine.food, engine.explosion_cells
+
+        free_cells.log = delta.log = []
+        try:
+            events = engine.step()
+        finally:
+            free_cells.log = None
+
+        if len(snake.positions) <= delta.length:
+            delta.tail = tail
+        changed = []
+        for i, fields in mine_fields:
+            m = engine.mines[i]
+            if fields != (m.timer, m.active, m.explosion_timer):
+                changed.append((i, fields))
+        for event in events:
+            if event['type'] == 'explosion':
+                i = engine.mines.index(engine.hazards[event['pos']])
+                if i not in {j for j, _ in mine_fields}:
+                    # A settled mine: only its explosion timer moved, from 0
+                    m = engine.mines[i]
+                    changed.append((i, (m.timer, m.active, 0)))
+        if changed:
+            delta.mine_fields = changed
+        if engine.food is not food:
+            delta.food = food
+        if engine.explosion_cells is not explosion_cells:
+            delta.explosion_cells = explosion_cells
+        if delta.food is not None:
+            # Only eating draws from the generator
+            delta.rng = self.rng_state
+            self.rng_state = engine.rng.getstate()
+
+        delta.size = (DELTA_BYTES + LOG_ENTRY_BYTES * len(delta.log) + MINE_BYTES * len(changed)
+                      + (RNG_BYTES if delta.rng is not None else 0))
+        self.deltas.append(delta)
+        self.memory += delta.size
+        self.scalars = self.capture()
+        if engine.tick % self.snapshot_ticks == 0:
+            self.snapshot()
+        self.trim()
+        return events
+
+    def trim(self):
+        '''Drop what is older than the window, then the oldest deltas while over budget.'''
+        horizon = self.engine.elapsed_ms - self.window_ms
+        # Keep the newest snapshot at or before the horizon: the window starts after it
+        while len(self.snapshots) > 1 and self.snapshots[1][1] <= horizon:
+            self.snapshots.popleft()
+            self.memory -= self.snapshot_bytes
+        while self.deltas and self.deltas[0].scalars[5] < horizon:
+            self.memory -= self.deltas.popleft().size
+        while self.deltas and self.memory > self.budget:
+            self.memory -= self.deltas.popleft().size
+        if self.snapshots:
+            oldest = self.snapshots[0][0]
+            while self.turns and self.turns[0][0] < oldest:
+                self.turns.popleft()
+
+    def undo(self):
+        '''Take the last tick back.'''
+        delta = self.deltas.pop()
+        self.memory -= delta.size
+        engine = self.engine
+        snake = engine.snake
+        engine.free_cells.undo(delta.log)
+
+        # The free cells are already restored: move the body alone
+        body = snake.positions
+        body.free_cells = None
+        body.popleft()
+        if delta.tail is not None:
+            body.append(delta.tail)
+        body.free_cells = engine.free_cells
+
+        engine.drop_spawns(delta.obstacles, delta.mines)
+        for i, (timer, active, explosion_timer) in delta.mine_fields:
+            mine = engine.mines[i]
+            mine.timer, mine.active, mine.explosion_timer = timer, active, explosion_timer
+            # Every mine that ticked is in mine_fields: this restores engine.ticking too
+            if mine.ticking():
+                engine.ticking[i] = mine
+            else:
+                engine.ticking.pop(i, None)
+        if delta.food is not None:
+            engine.food = delta.food
+        if delta.explosion_cells is not None:
+            engine.explosion_cells = delta.explosion_cells
+        if delta.rng is not None:
+            engine.rng.setstate(delta.rng)
+            self.rng_state = delta.rng
+
+        self.apply((delta.scalars, delta.snake))
+
+    def apply(self, scalars):
+        engine_values, snake_values = self.scalars = scalars
+        for key, value in zip(ENGINE_FIELDS, engine_values):
+            setattr(self.engine, key, value)
+        for key, value in zip(SNAKE_FIELDS, snake_values):
+            setattr(self.engine.snake, key, value)
+
+    def earliest(self):
+        '''The earliest tick rewind_to() can reach.'''
+        oldest = self.snapshots[0][0] if self.snapshots else self.engine.tick
+        if self.deltas:
+            oldest = min(oldest, self.deltas[0].scalars[0])
+        return oldest
+
+    def rewind_to(self, tick):
+        '''
+        Put the engine back where it was at tick, before that tick's turns
+        (clamped to earliest()). Undoes deltas, or, past the oldest one,
+        restores the last snapshot at or before tick and replays forward.
+        Returns the tick reached.
+        '''
+        engine = self.engine
+        tick = max(tick, self.earliest())
+        reachable = self.deltas[0].scalars[0] if self.deltas else engine.tick
+        if tick < reachable:
+            self.restore([s for s in self.snapshots if s[0] <= tick][-1], tick)
+        while engine.tick > tick:
+            self.undo()
+        # Also takes back turns made since the last tick
+        self.apply(self.scalars)
+        # Turns at or after tick are undone, and so are snapshots past it
+        while self.turns and self.turns[-1][0] >= tick:
+            self.turns.pop()
+        while len(self.snapshots) > 1 and self.snapshots[-1][0] > tick:
+            self.snapshots.pop()
+            self.memory -= self.snapshot_bytes
+        return engine.tick
+
+    def restore(self, snapshot, tick):
+        engine = self.engine
+        start, _, state = snapshot
+        turns = [turn for turn in self.turns if start <= turn[0] < tick]
+        # Everything past the snapshot is about to be rebuilt
+        while self.deltas and self.deltas[-1].scalars[0] >= start:
+            self.memory -= self.deltas.pop().size
+        while self.snapshots[-1][0] > start:
+            self.snapshots.pop()
+            self.memory -= self.snapshot_bytes
+        engine.set_state(state)
+        self.scalars = self.capture()
+        self.rng_state = engine.rng.getstate()
+        i = 0
+        while engine.tick < tick and not engine.game_over:
+            while i < len(turns) and turns[i][0] == engine.tick:
+                engine.turn(turns[i][1])
+                i += 1
+            self.step()
+
+    def rewind(self, seconds):
+        '''Go back about seconds of game time; returns the tick reached.'''
+        horizon = self.engine.elapsed_ms - seconds * 1000
+        tick = self.engine.tick
+        for delta in reversed(self.deltas):
+            if delta.scalars[5] < horizon:
+                break
+            tick = delta.scalars[0]
+        else:
+            for start, elapsed, _ in reversed(self.snapshots):
+                if start < tick and elapsed >= horizon:
+                    tick = start
+        return self.rewind_to(tick)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+'''
+CyberSnake - Bot tournaments for balance studies.
+Plays M seeds x 3 difficulties x K bot policies headless on a process pool,
+for tuning Settings.DIFFICULTY_OBSTACLES, DIFFICULTY_MINE_CHANCE and the
+speed formula (Engine.base_speed). Work goes out in chunks of seeds of one
+difficulty and policy; each worker builds its engine and its policies once
+and resets them for every game. Results are folded into per difficulty and
+policy tallies as chunks come back, so memory does not grow with M.
+The report gives score percentiles, survival ticks, causes of death
+('timeout' past --max-ticks) and games per second per core, the worker CPU
+time included.
+Run: python tournament.py [--seeds 100] [--policies autopilot greedy random] [--workers N]
+'''
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from autopilot import Autopilot
+from bots import greedy_move, moves
+from engine import DIRECTIONS, Engine, Settings
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+
+class RandomPolicy:
+    '''Turns at random one tick in five, into any move that survives it.'''
+    def reset(self, seed):
+        self.rng = random.Random(seed)
+
+    def choose(self, engine):
+        snake = engine.snake
+        direction = snake.direction
+        if self.rng.random() < 0.2:
+            direction = self.rng.choice(DIRECTIONS)
+        options = [d for d, _ in moves(engine, snake)]
+        return direction if direction in options else self.rng.choice(options or [direction])
+
+
+class GreedyPolicy(RandomPolicy):
+    '''Takes the move that survives the tick and ends closest to the food.'''
+    def choose(self, engine):
+        food = engine.food.position
+        if food is None:
+            return engine.snake.direction
+        return greedy_move(engine, engine.snake, food, self.rng)
+
+
+class AutopilotPolicy(Autopilot):
+    def reset(self, seed=None):
+        super().reset()
+
+
+POLICIES = {
+    'autopilot': AutopilotPolicy,
+    'greedy': GreedyPolicy,
+    'random': RandomPolicy,
+}
+
+# Per worker process: one engine and one instance of each policy, built once
+_engine = None
+_policies = {}
+_max_ticks = 0
+
+
+def init_worker(policies, max_ticks, budget_us):
+    global _engine, _max_ticks
+    _engine = Engine(DIFFICULTIES[0], 0)
+    _max_ticks = max_ticks
+    for name in policies:
+        _policies[name] = AutopilotPolicy(budget_us) if name == 'autopilot' else POLICIES[name]()
+
+
+def play(engine, policy, difficulty, seed, max_ticks):
+    '''One game; returns (score, ticks, cause of death or 'timeout').'''
+    engine.reset(difficulty, seed)
+    policy.reset(seed)
+    snake = engine.snake
+    while not engine.game_over and engine.tick < max_ticks:
+        direction = policy.choose(engine)
+        if direction != snake.direction:
+            engine.turn(direction)
+        engine.step()
+    return engine.score, engine.tick, engine.death_cause or 'timeout'
+
+
+def play_chunk(task):
+    '''Every seed of one chunk; returns (difficulty, policy, results, CPU seconds).'''
+    difficulty, name, seeds = task
+    start = time.process_time()
+    policy = _policies[name]
+    results = [play(_engine, policy, difficulty, seed, _max_ticks) for seed in seeds]
+    return difficulty, name, results, time.process_time() - start
+
+
+class Tally:
+    '''Streaming totals for one difficulty and policy.'''
+    def __init__(self):
+        self.scores = Counter()
+        self.ticks = Counter()
+        self.causes = Counter()
+        self.games = 0
+        self.cpu = 0.0
+
+    def add(self, results, cpu):
+        for score, ticks, cause in results:
+            self.scores[score] += 1
+            self.ticks[ticks] += 1
+            self.causes[cause] += 1
+        self.games += len(results)
+        self.cpu += cpu
+
+    def summary(self):
+        return {'games': self.games,
+                'score': percentiles(self.scores), 'ticks': percentiles(self.ticks),
+                'causes': dict(self.causes.most_common()),
+                'games_per_cpu_s': self.games / self.cpu if self.cpu else 0.0}
+
+
+def percentiles(counts, points=(10, 50, 90)):
+    # Mean, percentiles and max of a value -> occurrences tally
+    total = sum(counts.values())
+    values = sorted(counts)
+    out = {'mean': sum(v * n for v, n in counts.items()) / total}
+    seen, i = 0, 0
+    for point in points:
+        rank = point / 100 * (total - 1)
+        while seen + counts[values[i]] <= rank:
+            seen += counts[values[i]]
+            i += 1
+        out[f'p{point}'] = values[i]
+    out['max'] = values[-1]
+    return out
+
+
+def run(seeds, policies, workers=None, chunk=None, max_ticks=5000, budget_us=None, progress=True):
+    '''Play the tournament; returns ({(difficulty, policy): Tally}, wall seconds, workers).'''
+    workers = workers or os.cpu_count() or 1
+    # A few chunks per worker and per pairing keeps the pool busy to the end
+    chunk = chunk or max(1, len(seeds) * len(DIFFICULTIES) * len(policies) // (workers * 16))
+    tasks = [(difficulty, name, seeds[i:i + chunk])
+             for difficulty in DIFFICULTIES for name in policies
+             for i in range(0, len(seeds), chunk)]
+    tallies = {(difficulty, name): Tally() for difficulty in DIFFICULTIES for name in policies}
+    total = len(seeds) * len(tallies)
+    done = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(workers, initializer=init_worker,
+                             initargs=(policies, max_ticks, budget_us)) as pool:
+        for future in as_completed([pool.submit(play_chunk, task) for task in tasks]):
+            difficulty, name, results, cpu = future.result()
+            tallies[difficulty, name].add(results, cpu)
+            done += len(results)
+            if progress:
+                elapsed = time.perf_counter() - start
+                print(f'\r{done}/{total} games, {done / elapsed:.1f}/s', end='', file=sys.stderr, flush=True)
+    if progress:
+        print(file=sys.stderr)
+    return tallies, time.perf_counter() - start, workers
+
+
+def report(tallies, elapsed, workers):
+    print(f"{'difficulty':<10} {'policy':<10} {'games':>6} {'score mean':>10} {'p10/p50/p90':>14} "
+          f"{'max':>6} {'ticks p50':>10} {'p90':>7}  deaths")
+    for (difficulty, name), tally in tallies.items():
+        s = tally.summary()
+        score, ticks = s['score'], s['ticks']
+        causes = ' '.join(f'{cause} {n / tally.games:.0%}' for cause, n in s['causes'].items())
+        print(f"{difficulty:<10} {name:<10} {tally.games:>6} {score['mean']:>10.1f} "
+              f"{score['p10']:>4}/{score['p50']:>4}/{score['p90']:<4} {score['max']:>6} "
+              f"{ticks['p50']:>10} {ticks['p90']:>7}  {causes}")
+    games = sum(t.games for t in tallies.values())
+    cpu = sum(t.cpu for t in tallies.values())
+    print(f'{games} games in {elapsed:.1f} s on {workers} workers: {games / elapsed:.1f} games/s, '
+          f'{games / elapsed / workers:.1f} games/s per core ({games / cpu:.1f} per CPU second in the workers)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seeds', type=int, default=100, help='games per difficulty and policy')
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--policies', nargs='+', default=list(POLICIES), choices=list(POLICIES))
+    parser.add_argument('--workers', type=int, help='processes (default: one per CPU)')
+    parser.add_argument('--chunk', type=int, help='seeds per task (default: about 16 tasks per worker)')
+    parser.add_argument('--max-ticks', type=int, default=5000, help='games still running are cut here')
+    parser.add_argument('--budget-us', type=int, default=Settings.AUTOPILOT_BUDGET_US,
+                        help='autopilot time per decision')
+    parser.add_argument('--out', help='also write the summaries to this JSON file')
+    args = parser.parse_args()
+
+    seeds = list(range(args.first_seed, args.first_seed + args.seeds))
+    tallies, elapsed, workers = run(seeds, args.policies, args.workers, args.chunk,
+                                    args.max_ticks, args.budget_us, progress=sys.stderr.isatty())
+    report(tallies, elapsed, workers)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'seeds': args.seeds, 'max_ticks': args.max_ticks, 'workers': workers,
+                       'elapsed_s': elapsed,
+                       'results': {f'{d}/{p}': t.summary() for (d, p), t in tallies.items()}},
+                      f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+'''
+CyberSnake - High score verification.
+Re-simulates replays headless (no pygame, no rendering, no sleeping) across
+a process pool and checks that each one ends, by death, at the tick and
+with the score it claims. Replays without a claimed score (version 1, or
+saved without one) are rejected, since nothing can be confirmed, and so
+are those claiming more than Settings.VERIFY_MAX_TICKS ticks: a snake
+that never eats can go on forever, so only the length bounds the work a
+replay costs. A replay is also rejected as soon as its claim can no
+longer come true: its score already passed the claim, or the claim is
+more than the remaining ticks could possibly score.
+Run: python gioco.py --verify replays/ [--workers N]
+'''
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import Engine, Settings
+from replay import load
+
+# Most a single tick can score: shield food (3 points) at the top combo (x5)
+MAX_GAIN_PER_TICK = 3 * 5
+
+
+def check(replay):
+    '''
+    Re-simulate replay against its claim.
+    Returns (reason, ticks simulated), reason being None when the claim holds.
+    '''
+    claim = replay.score
+    if claim is None:
+        return 'no claimed score', 0
+    if replay.ticks > Settings.VERIFY_MAX_TICKS:
+        return f'{replay.ticks} ticks, more than the {Settings.VERIFY_MAX_TICKS} verified', 0
+    if replay.turns and replay.turns[-1][0] >= replay.ticks:
+        return 'turns recorded after the claimed death', 0
+    engine = Engine(replay.difficulty, replay.seed)
+    for _ in replay.play(engine):
+        if engine.score > claim:
+            return f'score {engine.score} passed the claimed {claim} at tick {engine.tick}', engine.tick
+        if claim - engine.score > MAX_GAIN_PER_TICK * (replay.ticks - engine.tick):
+            return f'claimed score {claim} out of reach at tick {engine.tick}', engine.tick
+    if not engine.game_over:
+        return f'still alive at the claimed death tick {replay.ticks}', engine.tick
+    if engine.tick != replay.ticks:
+        return f'died at tick {engine.tick}, claimed {replay.ticks}', engine.tick
+    if engine.score != claim:
+        return f'scored {engine.score}, claimed {claim}', engine.tick
+    return None, engine.tick
+
+
+def verify_file(path):
+    '''Returns (path, reason, ticks simulated); reason is None for a valid replay.'''
+    try:
+        replay = load(path)
+    except (OSError, ValueError, IndexError) as e:
+        return path, f'unreadable: {e}', 0
+    reason, ticks = check(replay)
+    return path, reason, ticks
+
+
+def verify_dir(directory, workers=None):
+    '''
+    Verify every replay in directory on a pool of workers processes
+    (one per CPU by default). Returns (results, elapsed seconds).
+    '''
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                   if name.endswith('.replay'))
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    if workers == 1 or len(paths) < 2:
+        results = [verify_file(path) for path in paths]
+    else:
+        # Replays are tiny and quick: hand them out in batches to keep IPC out of the way
+        chunksize = max(1, len(paths) // (workers * 8))
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(verify_file, paths, chunksize=chunksize))
+    return results, time.perf_counter() - start
+
+
+def main(directory, workers=None):
+    results, elapsed = verify_dir(directory, workers)
+    rejected = [(path, reason) for path, reason, _ in results if reason is not None]
+    for path, reason in rejected:
+        print(f'REJECTED {path}: {reason}')
+    ticks = sum(t for _, _, t in results)
+    elapsed = max(elapsed, 1e-9)
+    print(f'{len(results)} replays, {len(results) - len(rejected)} valid, {len(rejected)} rejected '
+          f'in {elapsed:.2f} s: {len(results) / elapsed:,.0f} replays/s, {ticks / elapsed:,.0f} ticks/s')
+    return 1 if rejected else 0